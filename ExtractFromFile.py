@@ -1,8 +1,40 @@
 # rag_pipeline.py (versão otimizada)
 
+import hashlib
+import math
+import operator
 import os
+import re
 import requests  # Para fazer a chamada HTTP para o seu backend Node.js
-import google.generativeai as genai
+from app_logging import get_logger
+from metrics import CACHE_REQUESTS, Histogram, stage_timer
+from tracing import traced, inject_trace_headers
+from rate_limiter import EMBEDDING_LIMITER
+from circuit_breaker import GATEWAY_TIMEOUT, RAG_BREAKER, CircuitOpenError
+from deadline import timeout as deadline_timeout
+from date_parser import normalize
+from lexical_index import index_version, lexical_index_for, reciprocal_rank_fusion, tokenize
+
+logger = get_logger("rag_pipeline")
+
+# Chunks (no máximo) que vão para o prompt
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+# Candidatos de cada busca (vetorial e BM25) antes da fusão e da seleção
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "6"))
+# Validade do resultado da busca por hotel e pergunta (segundos; 0 desliga)
+RAG_RESULT_CACHE_TTL = int(os.getenv("RAG_RESULT_CACHE_TTL", "3600"))
+# Tokens (estimados) do contexto de RAG no prompt
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "800"))
+# Peso da relevância contra a redundância na seleção (MMR; 1 = só relevância)
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Sobreposição entre chunks vizinhos reconhecida na junção (caracteres; a fábrica usa 200)
+_MIN_OVERLAP, _MAX_OVERLAP = 40, 400
+
+RAG_CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens",
+    "Tokens (estimados) do contexto de RAG enviado ao modelo.",
+    buckets=(0, 100, 200, 400, 700, 1000, 1500, 2500),
+)
 
 # ==============================================================================
 #  MODIFICAÇÃO 1: REMOÇÃO DE FUNÇÕES DESNECESSÁRIAS
@@ -12,22 +44,26 @@ import google.generativeai as genai
 # ==============================================================================
 
 # A função generate_embeddings ainda é necessária, mas apenas para a pergunta do usuário.
+@traced("query_embedding")
 def generate_embeddings(text_chunks: list[str], task_type: str) -> list[list[float]]:
     """Gera embeddings para uma lista de textos (agora usada apenas para a pergunta)."""
-    print(f"Gerando embedding para 1 chunk (tarefa: {task_type})...")
+    logger.info("Gerando embedding para 1 chunk (tarefa: %s)...", task_type)
     if not text_chunks:
         return []
 
     embedding_model = "models/text-embedding-004"
     try:
-        result = genai.embed_content(
+        # Importado aqui: o pacote é pesado e só é usado nos embeddings
+        import google.generativeai as genai
+        result = EMBEDDING_LIMITER.call(genai.embed_content, 
             model=embedding_model,
             content=text_chunks,
-            task_type=task_type
+            task_type=task_type,
+            request_options={"timeout": deadline_timeout(GATEWAY_TIMEOUT)},
         )
         return result['embedding']
     except Exception as e:
-        print(f"ERRO ao gerar embedding para a pergunta: {e}")
+        logger.error("ERRO ao gerar embedding para a pergunta: %s", e)
         raise e # Lança o erro para a camada superior tratar
 
 # ==============================================================================
@@ -36,31 +72,207 @@ def generate_embeddings(text_chunks: list[str], task_type: str) -> list[list[flo
 #  ela orquestra a busca rápida dos chunks que já estão processados no banco.
 # ==============================================================================
 
-def process_rag_pipeline(user_id: str, user_question: str) -> str:
+def _find_relevant(gateway_api_url: str, payload: dict, auth_headers: dict):
+    response = requests.post(
+        f"{gateway_api_url}/document-chunks/find-relevant",
+        json=payload,
+        headers=inject_trace_headers(auth_headers),
+        timeout=deadline_timeout(GATEWAY_TIMEOUT),
+    )
+    response.raise_for_status() # Lança um erro se a resposta for 4xx ou 5xx
+    return response
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _lexical_version(user_id: str):
+    """Versão do índice BM25 do hotel, ou None se o Redis estiver indisponível."""
+    try:
+        return index_version(str(user_id))
+    except Exception as e:
+        logger.warning("⚠️ [RAG] Índice lexical indisponível: %s", e)
+        return None
+
+
+def _result_key(user_id: str, version: int, user_question: str) -> str:
+    # A versão do índice entra na chave: uma nova indexação invalida os resultados guardados
+    question = re.sub(r"\s+", " ", normalize(user_question)).strip()
+    digest = hashlib.sha256(question.encode("utf-8")).hexdigest()[:32]
+    return f"rag_result:{user_id}:{version}:{digest}"
+
+
+def _load_result(key: str):
+    try:
+        cached = _redis().get(key)
+    except Exception as e:
+        logger.warning("⚠️ [RAG] Cache de resultados indisponível: %s", e)
+        return None
+    CACHE_REQUESTS.inc(cache="rag_result", result="hit" if cached is not None else "miss")
+    return cached
+
+
+def _store_result(key: str, context: str):
+    try:
+        _redis().set(key, context, ex=RAG_RESULT_CACHE_TTL)
+    except Exception as e:
+        logger.warning("⚠️ [RAG] Falha ao guardar o resultado da busca: %s", e)
+
+
+def _lexical_search(user_id: str, version: int, user_question: str):
+    """Chunks do BM25 para a pergunta e os embeddings guardados dos chunks do hotel."""
+    if not version:
+        return [], {}
+    try:
+        with stage_timer("lexical_search"):
+            index = lexical_index_for(str(user_id), version)
+            return (index.search(user_question, RAG_CANDIDATES), index.embeddings) if index else ([], {})
+    except Exception as e:
+        logger.warning("⚠️ [RAG] Falha na busca lexical: %s", e)
+        return [], {}
+
+
+# ==============================================================================
+#  SELEÇÃO DO CONTEXTO
+#  Os chunks da fábrica se sobrepõem em 200 caracteres, e os melhores candidatos
+#  costumam repetir os mesmos parágrafos. Dos candidatos da fusão, a seleção
+#  escolhe por MMR (relevância menos a semelhança com o que já foi escolhido,
+#  pelos embeddings dos chunks ou, sem eles, pelos termos), junta chunks vizinhos
+#  num só trecho sem a parte repetida e para no orçamento de tokens.
+# ==============================================================================
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 caracteres por token em português
+    return len(text) // 4
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.hypot(*vector)
+    return [x / norm for x in vector] if norm else vector
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _join_overlap(first: str, second: str):
+    """first seguido de second sem o trecho repetido, se o fim de first é o começo de second."""
+    for size in range(min(len(first), len(second), _MAX_OVERLAP), _MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def _merge_spans(spans: list[str], chunk: str) -> list[str]:
+    """
+    Acrescenta o chunk aos trechos: se ele estiver contido em um trecho (ou o
+    contiver) ou se sobrepuser a ele, os dois viram um só, na posição do primeiro.
+    """
+    merged = spans + [chunk]
+    position = len(spans)
+    changed = True
+    while changed:
+        changed = False
+        current = merged[position]
+        for i, span in enumerate(merged):
+            if i == position:
+                continue
+            if current in span:
+                joined = span
+            elif span in current:
+                joined = current
+            else:
+                joined = _join_overlap(span, current) or _join_overlap(current, span)
+            if joined:
+                # O trecho maior pode agora encostar em outro: repete até não juntar mais
+                first, second = min(i, position), max(i, position)
+                merged[first] = joined
+                del merged[second]
+                position, changed = first, True
+                break
+    return merged
+
+
+def select_context(candidates: list[tuple[str, float]], embeddings: dict) -> list[str]:
+    """
+    Trechos do contexto a partir dos candidatos [(chunk, pontuação da fusão)]:
+    até RAG_TOP_K chunks escolhidos por MMR, com vizinhos juntados, dentro de
+    RAG_CONTEXT_TOKEN_BUDGET (o primeiro entra sempre).
+    """
+    if not candidates:
+        return []
+    chunks = [chunk for chunk, _ in candidates]
+    top_score = candidates[0][1] or 1.0
+    relevance = [score / top_score for _, score in candidates]
+    vectors = [embeddings.get(chunk) for chunk in chunks]
+    if all(vectors):
+        # Cosseno = produto escalar dos vetores normalizados
+        vectors = [_unit(vector) for vector in vectors]
+        similarity = lambda i, j: sum(map(operator.mul, vectors[i], vectors[j]))
+    else:
+        terms = [set(tokenize(chunk)) for chunk in chunks]
+        similarity = lambda i, j: _jaccard(terms[i], terms[j])
+
+    selected, spans = [], []
+    remaining = list(range(len(chunks)))
+    # Maior semelhança de cada candidato com os já escolhidos (atualizada a cada escolha)
+    redundancy = [0.0] * len(chunks)
+    while remaining and len(selected) < RAG_TOP_K:
+        best = max(remaining, key=lambda i: RAG_MMR_LAMBDA * relevance[i] - (1 - RAG_MMR_LAMBDA) * redundancy[i])
+        remaining.remove(best)
+        candidate_spans = _merge_spans(spans, chunks[best])
+        if selected and sum(_estimate_tokens(span) for span in candidate_spans) > RAG_CONTEXT_TOKEN_BUDGET:
+            # Não cabe; um candidato menor ou vizinho de um trecho escolhido ainda pode caber
+            continue
+        selected.append(best)
+        spans = candidate_spans
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], similarity(i, best))
+    return spans
+
+
+@traced()
+def process_rag_pipeline(user_id: str, user_question: str, query_embedding: list = None) -> str:
     """
     Orquestra o processo de RAG otimizado:
     1. Gera o embedding da pergunta do usuário.
     2. Busca os chunks pré-vetorizados mais relevantes no banco de dados (via Gateway Node.js).
-    3. Retorna o contexto final para o prompt do Gemini.
+    3. Busca os mesmos chunks no índice BM25 do hotel e combina as duas listas (RRF).
+    4. Seleciona os trechos sem redundância, dentro do orçamento de tokens.
+    5. Retorna o contexto final para o prompt do Gemini (guardado por hotel e pergunta).
 
     Args:
         user_id (str): ID do usuário para filtrar os documentos no banco.
         user_question (str): A pergunta do usuário.
+        query_embedding (list): Embedding da pergunta, se já calculado (ex: pelo portão do RAG).
 
     Returns:
         str: Uma string única contendo o contexto dos chunks mais relevantes.
     """
-    print("🚀 Iniciando pipeline de RAG (busca rápida no banco)...")
-    
-    # Passo 1: Gerar o embedding APENAS para a pergunta do usuário.
-    query_embedding_list = generate_embeddings([user_question], task_type="RETRIEVAL_QUERY")
-    if not query_embedding_list:
-        print("ERRO: Não foi possível gerar embedding para a pergunta.")
-        return ""
-    query_embedding = query_embedding_list[0]
+    logger.info("🚀 Iniciando pipeline de RAG (busca rápida no banco)...")
+
+    # Mesma pergunta no mesmo hotel (e mesma versão dos documentos): resultado guardado
+    version = _lexical_version(user_id)
+    cache_key = _result_key(user_id, version, user_question) if version is not None and RAG_RESULT_CACHE_TTL > 0 else None
+    if cache_key:
+        cached = _load_result(cache_key)
+        if cached is not None:
+            logger.info("✅ Contexto de RAG reaproveitado do cache.")
+            return cached
+
+    # Passo 1: Gerar o embedding APENAS para a pergunta do usuário (se ainda não veio calculado).
+    if query_embedding is None:
+        with stage_timer("query_embedding"):
+            query_embedding_list = generate_embeddings([user_question], task_type="RETRIEVAL_QUERY")
+        if not query_embedding_list:
+            logger.error("ERRO: Não foi possível gerar embedding para a pergunta.")
+            return ""
+        query_embedding = query_embedding_list[0]
 
     # Passo 2: Chamar seu Gateway Node.js para que ele faça a busca vetorial no Supabase.
-    print("📡 Chamando Gateway para busca de chunks por similaridade...")
+    logger.info("📡 Chamando Gateway para busca de chunks por similaridade...")
+    vector_error = None
     try:
         gateway_api_url = os.getenv("BACKEND_URL")
         if not gateway_api_url:
@@ -70,7 +282,7 @@ def process_rag_pipeline(user_id: str, user_question: str) -> str:
         payload = {
             "user_id": user_id,
             "query_embedding": query_embedding,
-            "top_k": 3 # O número de chunks que você quer de volta
+            "top_k": RAG_CANDIDATES # Candidatos para a fusão e a seleção do contexto
         }
         
         # Headers de autenticação para seu middleware no Node.js
@@ -80,29 +292,37 @@ def process_rag_pipeline(user_id: str, user_question: str) -> str:
         }
 
         # Faz a chamada POST para o novo endpoint que você criou no Node.js
-        response = requests.post(
-            f"{gateway_api_url}/document-chunks/find-relevant",
-            json=payload,
-            headers=auth_headers
-        )
-        response.raise_for_status() # Lança um erro se a resposta for 4xx ou 5xx
+        with stage_timer("gateway_find_relevant"):
+            response = RAG_BREAKER.call(_find_relevant, gateway_api_url, payload, auth_headers)
 
         # A resposta do Node.js conterá os textos dos chunks mais relevantes
-        relevant_chunks = response.json().get('data', [])
+        vector_chunks = response.json().get('data', [])
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ ERRO ao comunicar com o Gateway Node.js: {e}")
-        return "Desculpe, não consegui buscar informações relevantes no momento."
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        logger.error("❌ ERRO ao comunicar com o Gateway Node.js: %s", e)
+        vector_chunks, vector_error = [], "Desculpe, não consegui buscar informações relevantes no momento."
     except Exception as e:
-        print(f"❌ ERRO inesperado na busca de chunks: {e}")
-        return "Desculpe, ocorreu um problema interno ao buscar informações."
+        logger.error("❌ ERRO inesperado na busca de chunks: %s", e)
+        vector_chunks, vector_error = [], "Desculpe, ocorreu um problema interno ao buscar informações."
+
+    # Passo 3: Busca lexical (BM25) nos mesmos chunks e fusão das duas listas (RRF)
+    lexical_chunks, embeddings = _lexical_search(user_id, version, user_question)
+    if vector_error and not lexical_chunks:
+        return vector_error
+    candidates = reciprocal_rank_fusion([vector_chunks, lexical_chunks])
 
-    # Passo 3: Formatar o contexto final para o prompt do Gemini
-    if not relevant_chunks:
-        print("AVISO: Nenhuma informação relevante encontrada no banco de dados para esta pergunta.")
+    # Passo 4: Seleção sem redundância (MMR + junção de vizinhos) dentro do orçamento de tokens
+    with stage_timer("rag_context_selection"):
+        spans = select_context(candidates, embeddings)
+    if not spans:
+        logger.warning("AVISO: Nenhuma informação relevante encontrada no banco de dados para esta pergunta.")
         return ""
         
-    final_context = "\n\n---\n\n".join(relevant_chunks)
-    print("✅ Contexto de RAG (via busca no banco) finalizado e pronto para o prompt.")
+    final_context = "\n\n---\n\n".join(spans)
+    RAG_CONTEXT_TOKENS.observe(_estimate_tokens(final_context))
+    logger.info("✅ Contexto de RAG (%d trechos de %d candidatos) finalizado e pronto para o prompt.", len(spans), len(candidates))
+    # Com o Gateway fora, o resultado parcial (só BM25) não é guardado
+    if cache_key and not vector_error:
+        _store_result(cache_key, final_context)
     
-    return final_context
\ No newline at end of file
+    return final_context
@@ -1,25 +1,92 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, status, Depends
 from pydantic import BaseModel
 from typing import Optional, List, Dict
-from database import supabase
-from gemini import generate_response_with_gemini
+from database import SUPABASE_CONFIGURED
+from gemini import generate_response_with_gemini, get_session, warm_up
 from gemini import process_google_event
 from ExtractFromFile import process_rag_pipeline
 from knowledge_service import invalidate_cache_for_hotel, get_knowledge_for_hotel
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import requests
 import os
+import json
 from generateChunks import generate_vectorized_chunks
+from app_logging import get_logger, start_request_context
+from metrics import render_metrics, stage_timer
+from tracing import span
+from idempotency import idempotency_key, run_once
+from lead_queue import run_for_lead
+from index_jobs import QueueFullError, get_job, store_lexical_index, submit_index_job
+from index_jobs import shutdown as shutdown_index_jobs
+from lexical_index import delete_document_index
+from calendar_jobs import QueueFullError as CalendarQueueFullError
+from calendar_jobs import enqueue_events as enqueue_calendar_events, results_url as calendar_results_url
+from calendar_jobs import shutdown as shutdown_calendar_jobs
+from circuit_breaker import breaker_states
+from deadline import DEADLINE_SKIP_RAG_MS, record_outcome, restart_deadline, should_degrade, start_deadline
+from conversation_history import HISTORY_MAX_MESSAGES, append_messages, append_turn, load_conversation, turn_count
+from retrieval_gate import gate_retrieval, record_gate_reply
 
+logger = get_logger("api")
 
-app = FastAPI(title="WhatsApp AI Assistant", version="1.0.0")
+# Mensagens aceitas por chamada de /process_whatsapp_messages
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "200"))
+# Leads processados ao mesmo tempo dentro de um lote
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+# Resultado do aquecimento das dependências (exposto no /health)
+warm_up_status = {"done": False}
+
+async def _warm_up():
+    try:
+        warm_up_status.update(await run_in_threadpool(warm_up))
+        logger.info("🔥 Dependências aquecidas: %s", warm_up_status)
+    except Exception as e:
+        logger.error("❌ Erro no aquecimento das dependências: %s", e)
+    finally:
+        warm_up_status["done"] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # O aquecimento roda em segundo plano: o worker já atende enquanto ele termina,
+    # e o que não estiver pronto é criado no primeiro uso
+    warm_up_task = asyncio.create_task(_warm_up())
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+    # As requisições em andamento já terminaram; faltam as filas de indexação e do Calendar
+    await run_in_threadpool(shutdown_index_jobs)
+    await run_in_threadpool(shutdown_calendar_jobs)
+
+app = FastAPI(title="WhatsApp AI Assistant", version="1.0.0", lifespan=lifespan)
 
 API_SECRET_KEY = os.getenv("API_SECRET_KEY")
 
+@app.middleware("http")
+async def correlation_id_middleware(request: Request, call_next):
+    """
+    Define o ID de correlação dos logs (header x-request-id ou um novo), o prazo da
+    requisição (header x-deadline-ms ou o padrão) e abre o span raiz da requisição,
+    continuando o trace do Gateway se ele enviar 'traceparent'.
+    """
+    request_id = start_request_context(request.headers.get("x-request-id"))
+    start_deadline(request.headers.get("x-deadline-ms"))
+    with span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent"), request_id=request_id) as root:
+        response = await call_next(request)
+        if root is not None:
+            root.set_attribute("http.status_code", response.status_code)
+            response.headers["x-trace-id"] = root.trace_id
+    response.headers["x-request-id"] = request_id
+    return response
+
 async def verify_api_key(request: Request):
     api_key = request.headers.get("x-api-key")
     if not api_key or api_key != API_SECRET_KEY:
@@ -31,11 +98,21 @@ async def verify_api_key(request: Request):
 class WhatsAppMessage(BaseModel):
     user_id: str
     message: str
-    chat_history: Optional[str] = ""
+    chat_history: Optional[str] = ""  # Só é lido se o servidor ainda não tem o histórico do lead
     lead_whatsapp_number: Optional[str] = ""
+    message_id: Optional[str] = None  # ID da mensagem no WhatsApp, usado para deduplicar reenvios
+    message_timestamp: Optional[str] = None  # Horário da mensagem no WhatsApp; sem message_id, separa envios iguais
+
+class WhatsAppMessageBatch(BaseModel):
+    messages: List[WhatsAppMessage]
+    stream: bool = False  # True: devolve cada resultado assim que fica pronto (NDJSON)
 
 class DocumentToIndex(BaseModel):
     full_text: str
+    background: bool = False  # True: responde na hora com um job_id (ver GET /index-jobs/{id})
+    callback_url: Optional[str] = None  # Recebe o job finalizado via POST (implica background)
+    user_id: Optional[str] = None  # Hotel dono do documento: os chunks também entram no índice BM25 dele
+    document_id: Optional[str] = None  # Obrigatório com user_id: reindexar substitui a versão anterior no BM25
 
 def parse_chat_history(history_string: str) -> List[Dict[str, any]]:
     if not history_string:
@@ -47,10 +124,15 @@ def parse_chat_history(history_string: str) -> List[Dict[str, any]]:
     for line in lines:
         if line.startswith("Usuário: "):
             role = "user"
-            text = line.replace("Usuário: ", "").strip()
+            text = line[len("Usuário: "):].strip()
         elif line.startswith("Alfred: "):
             role = "model"
-            text = line.replace("Alfred: ", "").strip()
+            text = line[len("Alfred: "):].strip()
+        elif parsed_history:
+            # Continuação de uma mensagem com várias linhas
+            part = parsed_history[-1]["parts"][0]
+            part["text"] = f"{part['text']}\n{line}".rstrip()
+            continue
         else:
             continue # Ignora linhas mal formatadas
 
@@ -58,24 +140,155 @@ def parse_chat_history(history_string: str) -> List[Dict[str, any]]:
     
     return parsed_history
 
+def _load_chat_history(request: WhatsAppMessage):
+    """
+    Resumo e mensagens recentes guardados no servidor. Em conversas que ainda não
+    estão no Redis, usa o chat_history do Gateway (uma única vez) e semeia o
+    histórico com ele. Retorna (resumo ou None, mensagens).
+    """
+    lead = request.lead_whatsapp_number
+    if not lead:
+        return None, parse_chat_history(request.chat_history)
+    try:
+        summary, history = load_conversation(lead)
+        if history or summary:
+            return summary, history
+    except Exception as e:
+        logger.warning("⚠️ [HISTÓRICO] Redis indisponível, usando o chat_history da requisição: %s", e)
+        return None, parse_chat_history(request.chat_history)
+
+    parsed_history = parse_chat_history(request.chat_history)
+    try:
+        append_messages(lead, parsed_history[-HISTORY_MAX_MESSAGES:])
+    except Exception as e:
+        logger.warning("⚠️ [HISTÓRICO] Falha ao semear o histórico de %s: %s", lead, e)
+    return None, parsed_history
+
 @app.post("/process_whatsapp_message", dependencies=[Depends(verify_api_key)])
 async def process_whatsapp_message(request: WhatsAppMessage):
-    
+    return await _handle_message(request)
+
+@app.post("/process_whatsapp_messages", dependencies=[Depends(verify_api_key)])
+async def process_whatsapp_messages(batch: WhatsAppMessageBatch):
+    """
+    Processa várias mensagens (de um ou mais leads) numa só chamada, por exemplo
+    ao reenviar a fila do Gateway depois de uma queda. Mensagens do mesmo lead
+    seguem a ordem do lote; leads diferentes rodam em paralelo. Cada item tem
+    seu resultado ou erro, na ordem do lote ou, com stream=True, em NDJSON à
+    medida que ficam prontos.
+    """
+    if len(batch.messages) > BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"Lote com mais de {BATCH_MAX_MESSAGES} mensagens.")
+    logger.info("📦 [LOTE] %d mensagens recebidas", len(batch.messages))
+
+    if not batch.stream:
+        results = [None] * len(batch.messages)
+        async for result in _process_batch(batch.messages):
+            results[result["index"]] = result
+        return {"results": results}
+
+    async def ndjson():
+        async for result in _process_batch(batch.messages):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+async def _process_batch(messages: List[WhatsAppMessage]):
+    """Gera o resultado de cada mensagem do lote à medida que fica pronto."""
+    by_lead = {}
+    for index, message in enumerate(messages):
+        # Sem número de lead não há ordem a respeitar: cada mensagem é independente
+        by_lead.setdefault(message.lead_whatsapp_number or f"#{index}", []).append((index, message))
+
+    results = asyncio.Queue()
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def run_lead(items):
+        async with semaphore:
+            for index, message in items:
+                await results.put(await _batch_item(index, message))
+
+    tasks = [asyncio.create_task(run_lead(items)) for items in by_lead.values()]
     try:
-        knowledge = get_knowledge_for_hotel(str(request.user_id))
-        rag_context = process_rag_pipeline(request.user_id, request.message) 
-        
-        # Converte o histórico de string para o formato de lista do Gemini
-        parsed_chat_history = parse_chat_history(request.chat_history)
-        print(f"🔍 [DEBUG] request.lead_whatsapp_number: {request.lead_whatsapp_number}")
-        response_gemini = generate_response_with_gemini(
-            rag_context=rag_context,
-            user_question=request.message, 
-            chat_history=parsed_chat_history, # Passa o histórico parseado
-            knowledge=knowledge, 
-            hotel_id=request.user_id, 
-            lead_whatsapp_number=request.lead_whatsapp_number
-        )
+        for _ in messages:
+            yield await results.get()
+    finally:
+        # Cliente desconectou no meio do stream: não deixa turnos órfãos na fila
+        for task in tasks:
+            task.cancel()
+
+async def _batch_item(index: int, message: WhatsAppMessage) -> dict:
+    result = {"index": index, "message_id": message.message_id, "lead_whatsapp_number": message.lead_whatsapp_number}
+    # O prazo (x-deadline-ms ou o padrão) vale para cada mensagem, a partir do início dela
+    restart_deadline()
+    try:
+        result.update(status="ok", **await _handle_message(message))
+    except HTTPException as e:
+        result.update(status="error", status_code=e.status_code, error=e.detail)
+    except Exception as e:
+        logger.error("❌ [LOTE] Erro na mensagem %d do lote: %s", index, e)
+        result.update(status="error", status_code=500, error=f"Erro interno do servidor: {str(e)}")
+    return result
+
+def _lead_turn(request: WhatsAppMessage):
+    """Turno atual do lead no servidor, para a chave de idempotência sem message_id."""
+    if request.message_id or not request.lead_whatsapp_number:
+        return None
+    try:
+        return turn_count(request.lead_whatsapp_number)
+    except Exception as e:
+        logger.warning("⚠️ [IDEMPOTÊNCIA] Turno do lead %s indisponível: %s", request.lead_whatsapp_number, e)
+        return None
+
+async def _handle_message(request: WhatsAppMessage) -> dict:
+    # Reenvios da mesma mensagem reaproveitam o processamento em andamento ou já concluído
+    key = idempotency_key(
+        request.user_id,
+        request.lead_whatsapp_number,
+        request.message,
+        await run_in_threadpool(_lead_turn, request),
+        request.message_id,
+        request.message_timestamp,
+    )
+    # Mensagens do mesmo lead são processadas em ordem, uma de cada vez
+    return await run_once(
+        key,
+        lambda: run_for_lead(request.lead_whatsapp_number, request.message, lambda message: _process_message(request, message)),
+    )
+
+def _process_message(request: WhatsAppMessage, message: str) -> dict:
+    try:
+        with stage_timer("total"):
+            with stage_timer("knowledge_fetch"):
+                knowledge = get_knowledge_for_hotel(str(request.user_id))
+            session_data = get_session(request.lead_whatsapp_number) or {}
+            # Turnos do fluxo de reserva ("sim", e-mail, datas...) não precisam dos documentos
+            gate = gate_retrieval(request.user_id, message, session_data)
+            rag_context = ""
+            # Com pouco prazo sobrando (ex: turno que esperou na fila do lead), responde sem os documentos
+            if gate.retrieve and not should_degrade("skip_rag", DEADLINE_SKIP_RAG_MS):
+                rag_context = process_rag_pipeline(request.user_id, message, query_embedding=gate.query_embedding)
+            
+            # Histórico estruturado do servidor (ou o do Gateway, na primeira mensagem)
+            conversation_summary, parsed_chat_history = _load_chat_history(request)
+            logger.debug("🔍 [DEBUG] request.lead_whatsapp_number: %s", request.lead_whatsapp_number)
+            response_gemini = generate_response_with_gemini(
+                rag_context=rag_context,
+                user_question=message, 
+                chat_history=parsed_chat_history, # Passa o histórico parseado
+                conversation_summary=conversation_summary,
+                knowledge=knowledge, 
+                hotel_id=request.user_id, 
+                lead_whatsapp_number=request.lead_whatsapp_number,
+                session_data=session_data,
+            )
+            record_gate_reply(gate, response_gemini)
+            if request.lead_whatsapp_number:
+                try:
+                    append_turn(request.lead_whatsapp_number, message, response_gemini)
+                except Exception as e:
+                    logger.warning("⚠️ [HISTÓRICO] Falha ao registrar o turno de %s: %s", request.lead_whatsapp_number, e)
+        record_outcome()
 
         return {
             "response_gemini": response_gemini
@@ -96,33 +309,95 @@ async def health_check():
     return {
         "status": "healthy", 
         "service": "WhatsApp AI Assistant",
-        "supabase_configured": supabase is not None
+        "supabase_configured": SUPABASE_CONFIGURED,
+        "warm_up": warm_up_status,
+        "circuits": breaker_states()
     }
 
-@app.post("/index-document")
+@app.get("/metrics")
+async def metrics():
+    """Expõe as métricas do worker no formato de texto do Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.post("/index-document", dependencies=[Depends(verify_api_key)])
 async def index_document(document: DocumentToIndex):
     """
     Endpoint que recebe o texto completo de um documento e retorna os chunks vetorizados.
+    Com background=True (ou callback_url), enfileira a indexação e retorna 202 com o job_id.
     """
+    if document.user_id and not document.document_id:
+        # Sem o ID não há como substituir ou remover o documento do índice do hotel depois
+        raise HTTPException(status_code=400, detail="document_id é obrigatório quando user_id é informado.")
+    if document.background or document.callback_url:
+        try:
+            job = await run_in_threadpool(submit_index_job, document.full_text, document.callback_url, document.user_id, document.document_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            logger.error("❌ ERRO ao enfileirar indexação: %s", e)
+            raise HTTPException(status_code=503, detail=f"Não foi possível enfileirar a indexação: {str(e)}")
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job["job_id"], "status": job["status"], "status_url": f"/index-jobs/{job['job_id']}"},
+        )
+
     try:
-        print("🏭 [Fábrica] Recebido novo documento para indexação via API...")
-        # Chama a função principal do nosso novo arquivo
-        vectorized_chunks = generate_vectorized_chunks(document.full_text)
+        logger.info("🏭 [Fábrica] Recebido novo documento para indexação via API...")
+        # Chama a função principal do nosso novo arquivo (fora do event loop)
+        vectorized_chunks = await run_in_threadpool(generate_vectorized_chunks, document.full_text)
+        if document.user_id:
+            await run_in_threadpool(store_lexical_index, document.user_id, vectorized_chunks, document.document_id)
         return vectorized_chunks
     except (ValueError, RuntimeError) as e:
         # Erros esperados (ex: texto vazio)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Erros inesperados
-        print(f"❌ ERRO na fábrica de embeddings: {e}")
+        logger.error("❌ ERRO na fábrica de embeddings: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro interno no serviço de IA: {str(e)}")
 
+@app.delete("/index-document/{user_id}/{document_id}", dependencies=[Depends(verify_api_key)])
+def delete_indexed_document(user_id: str, document_id: str):
+    """Remove o documento do índice lexical (BM25) do hotel, ex: quando ele é apagado no Gateway."""
+    try:
+        removed = delete_document_index(user_id, document_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="Documento não encontrado no índice do hotel.")
+    return {"message": f"Documento {document_id} removido do índice do hotel {user_id}."}
+
+@app.get("/index-jobs/{job_id}", dependencies=[Depends(verify_api_key)])
+def index_job_status(job_id: str):
+    """Status, progresso e (quando concluído) resultado de um job de indexação."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de indexação não encontrado ou expirado.")
+    return job
+
 
-@app.post("/handleWebhook")
+@app.post("/handleWebhook", dependencies=[Depends(verify_api_key)])
 def handle_webhook(promptPayload: dict):
     """
-    Endpoint para lidar com eventos do Google Calendar.
+    Endpoint para lidar com eventos do Google Calendar. Com callback_url no payload
+    (ou CALENDAR_RESULTS_URL configurada), enfileira os eventos e responde 202; os
+    resultados são extraídos em lote e enviados depois. Sem destino, responde na hora.
     """
+    try:
+        results_url = calendar_results_url(promptPayload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if results_url:
+        try:
+            queued = enqueue_calendar_events(promptPayload)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except CalendarQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return JSONResponse(status_code=202, content={"status": "queued", "events": queued})
+
     try:
         # Chama a função que processa o evento
         response = process_google_event(promptPayload)
@@ -0,0 +1,125 @@
+# app_logging.py
+
+import json
+import logging
+import os
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# ==============================================================================
+#  CONFIGURAÇÃO DE LOGS
+#  Substitui os print() espalhados pelo código. Os níveis, o formato e a taxa
+#  de amostragem de DEBUG vêm do ambiente:
+#    LOG_LEVEL=INFO | DEBUG | WARNING ...
+#    LOG_FORMAT=json | text
+#    LOG_DEBUG_SAMPLE_RATE=0.0 a 1.0 (fração das requisições com DEBUG completo)
+# ==============================================================================
+
+# ID de correlação da requisição atual (propagado automaticamente pelas threads
+# do FastAPI, que copiam o contexto).
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+# Decisão de amostragem de DEBUG para a requisição atual.
+_debug_sampled: ContextVar[bool] = ContextVar("debug_sampled", default=False)
+
+_configured = False
+
+
+class lazy:
+    """
+    Adia uma chamada cara (ex: json.dumps de uma sessão inteira) até o momento
+    em que o log é realmente emitido. Uso: logger.debug("Sessão: %s", lazy(json.dumps, data))
+    """
+    __slots__ = ("fn", "args", "kwargs")
+
+    def __init__(self, fn, *args, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        try:
+            return str(self.fn(*self.args, **self.kwargs))
+        except Exception as e:
+            return f"<erro ao formatar log: {e}>"
+
+    __repr__ = __str__
+
+
+def start_request_context(request_id: str = None) -> str:
+    """
+    Define o ID de correlação da requisição e sorteia se ela terá logs de DEBUG.
+    Retorna o ID usado (gera um novo se nenhum for informado).
+    """
+    request_id = request_id or uuid.uuid4().hex[:16]
+    correlation_id.set(request_id)
+    _debug_sampled.set(random.random() < _sample_rate())
+    return request_id
+
+
+def _sample_rate() -> float:
+    try:
+        return float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    except ValueError:
+        return 1.0
+
+
+class _DebugSamplingFilter(logging.Filter):
+    """Descarta registros de DEBUG das requisições que não foram sorteadas."""
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        # Fora de uma requisição (ex: inicialização) o DEBUG sempre passa
+        if correlation_id.get() == "-":
+            return True
+        return _debug_sampled.get()
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": correlation_id.get(),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record):
+        record.request_id = correlation_id.get()
+        return super().format(record)
+
+
+def configure_logging():
+    """Configura o logger raiz da aplicação. Pode ser chamada várias vezes."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_JsonFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else _TextFormatter())
+    handler.addFilter(_DebugSamplingFilter())
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(getattr(logging, level, logging.INFO))
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Retorna um logger filho de 'app' (ex: get_logger("gemini") -> app.gemini)."""
+    configure_logging()
+    return logging.getLogger(f"app.{name}")
@@ -0,0 +1,47 @@
+# benchmarks/conversations.py
+
+from datetime import date, timedelta
+
+# ==============================================================================
+#  ROTEIROS DE CONVERSA PARA OS BENCHMARKS
+#  Baseados em test_booking_flow (gemini.py): saudação, datas, escolha do quarto,
+#  nome/e-mail e link de pagamento.
+# ==============================================================================
+
+MESES = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+         "agosto", "setembro", "outubro", "novembro", "dezembro"]
+
+
+def _dia_mes(d: date) -> str:
+    return f"{d.day} de {MESES[d.month - 1]}"
+
+
+def booking_conversation(index: int = 0) -> list[str]:
+    """Conversa completa de reserva com datas sempre no futuro."""
+    check_in = date.today() + timedelta(days=30 + index % 60)
+    check_out = check_in + timedelta(days=3 + index % 4)
+    return [
+        "Olá, gostaria de fazer uma reserva",
+        f"Quero reservar de {_dia_mes(check_in)} a {_dia_mes(check_out)}",
+        "Gostei da Suíte Master, pode reservar?",
+        f"Meu nome é Cliente {index} Silva, cliente{index}@email.com",
+    ]
+
+
+def question_conversation(index: int = 0) -> list[str]:
+    """Conversa curta de dúvidas sobre as regras do hotel (sem ferramentas)."""
+    return [
+        "Oi, qual o horário do check-in?",
+        "Vocês aceitam pets?",
+        "Tem estacionamento?",
+    ]
+
+
+def render_chat_history(turns: list[tuple[str, str]]) -> str:
+    """Monta o chat_history no formato enviado pelo Gateway ("Usuário: ..."/"Alfred: ...")."""
+    lines = []
+    for user_message, bot_reply in turns:
+        lines.append(f"Usuário: {user_message}")
+        # O Gateway envia uma linha por mensagem
+        lines.append(f"Alfred: {bot_reply.replace(chr(10), ' ')}")
+    return "\n".join(lines)
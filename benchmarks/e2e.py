@@ -0,0 +1,126 @@
+# benchmarks/e2e.py
+"""
+Benchmark ponta a ponta de /process_whatsapp_message, sem rede.
+
+Sobe a API em processo com dublês do Gemini, do Gateway Node.js e do Redis,
+dispara conversas de reserva concorrentes e reporta RPS, p50/p95/p99 e o
+tempo por etapa (a partir das métricas internas).
+
+Uso:
+    python -m benchmarks.e2e --conversations 50 --concurrency 10 --model-latency-ms 800
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.conversations import booking_conversation, render_chat_history
+from benchmarks.fakes import Latency
+from benchmarks.harness import BENCH_API_KEY, boot_app, percentile, stage_breakdown, write_report
+
+
+async def _run_conversation(client, index: int, hotels: int, latencies: list, errors: list):
+    lead = f"5511{index:09d}"
+    hotel_id = f"hotel-{index % hotels}"
+    turns = []
+    for message in booking_conversation(index):
+        payload = {
+            "user_id": hotel_id,
+            "message": message,
+            "chat_history": render_chat_history(turns),
+            "lead_whatsapp_number": lead,
+        }
+        start = time.perf_counter()
+        try:
+            response = await client.post("/process_whatsapp_message", json=payload, headers={"x-api-key": BENCH_API_KEY})
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}")
+                reply = ""
+            else:
+                reply = response.json().get("response_gemini", "")
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            errors.append(type(e).__name__)
+            reply = ""
+        latencies.append(elapsed)
+        turns.append((message, reply))
+
+
+async def run(args) -> dict:
+    import httpx
+    from metrics import STAGE_LATENCY
+
+    app, gateway, fake_client = boot_app(
+        model_latency=Latency(args.model_latency_ms, args.model_jitter_ms),
+        gateway_latency=Latency(args.gateway_latency_ms),
+        embed_latency=Latency(args.embed_latency_ms),
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # Aquecimento: popula o hotel_cache e o cache do Gemini
+        await _run_conversation(client, 10**6, args.hotels, [], [])
+
+        before = STAGE_LATENCY.snapshot()
+        latencies, errors = [], []
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def guarded(index):
+            async with semaphore:
+                await _run_conversation(client, index, args.hotels, latencies, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(guarded(i) for i in range(args.conversations)))
+        duration = time.perf_counter() - start
+        after = STAGE_LATENCY.snapshot()
+
+    gateway.stop()
+    return {
+        "config": vars(args),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_types": sorted(set(errors)),
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 2) if duration else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies, default=0) * 1000, 2),
+        },
+        "model_calls": fake_client.models.calls,
+        "gateway_requests": gateway.requests,
+        "stages": stage_breakdown(before, after),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n📊 {report['requests']} requisições em {report['duration_s']}s "
+          f"({report['rps']} req/s), {report['errors']} erros")
+    lat = report["latency_ms"]
+    print(f"⏱️  p50={lat['p50']}ms  p95={lat['p95']}ms  p99={lat['p99']}ms  max={lat['max']}ms")
+    print(f"🤖 chamadas ao modelo: {report['model_calls']}  🌐 chamadas ao gateway: {report['gateway_requests']}")
+    print("\nEtapa                          qtd    média(ms)   p95<=(ms)")
+    for stage, data in sorted(report["stages"].items(), key=lambda item: -item[1]["mean_ms"] * item[1]["count"]):
+        print(f"{stage:<30} {data['count']:>5} {data['mean_ms']:>12} {str(data['p95_le_ms']):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta com dublês locais")
+    parser.add_argument("--conversations", type=int, default=40, help="total de conversas")
+    parser.add_argument("--concurrency", type=int, default=8, help="conversas simultâneas")
+    parser.add_argument("--hotels", type=int, default=4, help="quantidade de hotéis distintos")
+    parser.add_argument("--model-latency-ms", type=float, default=300)
+    parser.add_argument("--model-jitter-ms", type=float, default=100)
+    parser.add_argument("--gateway-latency-ms", type=float, default=20)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--output", help="arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
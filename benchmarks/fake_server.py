@@ -0,0 +1,39 @@
+# benchmarks/fake_server.py
+"""
+Sobe a API de verdade (uvicorn) com os dublês do Gemini, do Gateway e do Redis,
+para servir de alvo ao gerador de carga sem consumir cota nem tocar produção.
+
+Uso:
+    python -m benchmarks.fake_server --port 8001 --model-latency-ms 1200
+    python -m benchmarks.loadgen --url http://localhost:8001 --api-key bench-api-key --ramp 0.5,1,2,4
+"""
+
+import argparse
+
+from benchmarks.fakes import Latency
+from benchmarks.harness import BENCH_API_KEY, boot_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API com backends simulados")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--model-latency-ms", type=float, default=1000)
+    parser.add_argument("--model-jitter-ms", type=float, default=400)
+    parser.add_argument("--gateway-latency-ms", type=float, default=30)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app, gateway, _ = boot_app(
+        model_latency=Latency(args.model_latency_ms, args.model_jitter_ms),
+        gateway_latency=Latency(args.gateway_latency_ms),
+        embed_latency=Latency(args.embed_latency_ms),
+    )
+    print(f"🧪 API com dublês em http://{args.host}:{args.port} (x-api-key: {BENCH_API_KEY}, gateway: {gateway.url})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# benchmarks/fakes.py
+
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# ==============================================================================
+#  DUBLÊS LOCAIS PARA OS BENCHMARKS
+#  Substituem o Gemini, o Gateway Node.js e o Redis para medir o serviço sem
+#  rede. As latências são configuráveis para simular o ambiente real.
+# ==============================================================================
+
+
+class Latency:
+    """Latência simulada: base + jitter log-normal (cauda longa, como APIs reais)."""
+
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.base = base_ms / 1000
+        self.jitter = jitter_ms / 1000
+
+    def sample(self) -> float:
+        if self.jitter <= 0:
+            return self.base
+        return self.base + random.lognormvariate(0, 0.75) * self.jitter
+
+    def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# --- Gemini (google.genai.Client) ---
+
+_QUESTION_RE = re.compile(r"\*\*PERGUNTA ATUAL DO USUÁRIO:\*\*\s*(.+?)\s*\*\*INSTRUÇÕES", re.S)
+_HOTEL_RE = re.compile(r"- Hotel ID: (\S+)")
+_LEAD_RE = re.compile(r"- Número do WhatsApp do lead: (\S+)")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_NAME_RE = re.compile(r"[Mm]eu nome é ([^,]+)")
+
+
+def _text_of(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    texts = []
+    for content in contents or []:
+        for part in getattr(content, "parts", None) or []:
+            text = getattr(part, "text", None)
+            if text:
+                texts.append(text)
+    return "\n".join(texts)
+
+
+def _has_function_response(contents) -> bool:
+    if isinstance(contents, str):
+        return False
+    return any(
+        getattr(part, "function_response", None)
+        for content in contents or []
+        for part in getattr(content, "parts", None) or []
+    )
+
+
+def _part(text: str = None, function_call=None):
+    return SimpleNamespace(text=text, function_call=function_call)
+
+
+def _response(parts: list, prompt_text: str):
+    prompt_tokens = len(prompt_text) // 4
+    output_text = "".join(p.text or "" for p in parts)
+    candidates_tokens = max(len(output_text) // 4, 8)
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(role="model", parts=parts))],
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=candidates_tokens,
+            cached_content_token_count=1200,
+            total_token_count=prompt_tokens + candidates_tokens,
+        ),
+        text=output_text,
+    )
+
+
+class FakeModels:
+    """
+    Simula client.models.generate_content com chamadas de ferramenta roteirizadas
+    a partir da pergunta do usuário (datas -> disponibilidade, quarto -> extração,
+    e-mail -> dados pessoais). A segunda chamada do turno sempre devolve texto.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model: str, contents, config=None):
+        with self._lock:
+            self.calls += 1
+        self.latency.wait()
+        prompt = _text_of(contents)
+
+        if _has_function_response(contents):
+            return _response([_part("Perfeito! Segue o resultado da sua consulta. Posso ajudar em algo mais?")], prompt)
+
+        # Prompt dos eventos do Calendar (extract_google_events): um objeto por evento
+        if "Eventos do Google Calendar" in prompt:
+            return _response([_part(json.dumps([
+                {"eventIndex": int(i), "roomName": "Suíte Master", "leadName": "Ana Clara", "leadEmail": "ana@example.com", "leadWhatsapp": "5521987654321"}
+                for i in re.findall(r"^\s*\[(\d+)\] Título", prompt, re.M)
+            ]))], prompt)
+
+        # Prompt do resumo incremental do histórico (conversation_history)
+        if "RESUMO ATUALIZADO" in prompt:
+            return _response([_part("Hóspede quer reservar a Suíte Master por 3 noites daqui a 30 dias e já informou nome e e-mail.")], prompt)
+
+        match = _QUESTION_RE.search(prompt)
+        question = match.group(1) if match else prompt[-500:]
+        hotel = (_HOTEL_RE.search(prompt) or [None, "hotel"])[1]
+        lead = (_LEAD_RE.search(prompt) or [None, "lead"])[1]
+        lowered = question.lower()
+
+        email = _EMAIL_RE.search(question)
+        if email:
+            name = _NAME_RE.search(question)
+            return _response([_part(function_call=SimpleNamespace(name="extrair_dados_pessoais", args={
+                "customer_name": name.group(1).strip() if name else "Cliente",
+                "customer_email": email.group(0),
+                "hotel_id": hotel, "lead_whatsapp_number": lead,
+            }))], prompt)
+
+        if "reservar de" in lowered or re.search(r"\d+ de \w+", lowered):
+            check_in = date.today() + timedelta(days=30)
+            return _response([_part(function_call=SimpleNamespace(name="verificar_disponibilidade_geral", args={
+                "check_in_date": check_in.isoformat(),
+                "check_out_date": (check_in + timedelta(days=3)).isoformat(),
+                "hotel_id": hotel, "lead_whatsapp_number": lead,
+            }))], prompt)
+
+        if "suíte" in lowered or "quarto" in lowered:
+            check_in = date.today() + timedelta(days=30)
+            return _response([_part(function_call=SimpleNamespace(name="extrair_informacoes_reserva", args={
+                "room_name": "Suíte Master",
+                "check_in_date": check_in.isoformat(),
+                "check_out_date": (check_in + timedelta(days=3)).isoformat(),
+                "hotel_id": hotel, "lead_whatsapp_number": lead,
+            }))], prompt)
+
+        return _response([_part("Olá! Sou o Alfred, assistente virtual do hotel. Como posso ajudar?")], prompt)
+
+
+class FakeCaches:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.created = 0
+
+    def create(self, model: str, config=None):
+        self.latency.wait()
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/fake-{self.created}")
+
+
+class FakeGenaiClient:
+    """Dublê de google.genai.Client com .models e .caches."""
+
+    def __init__(self, model_latency: Latency, cache_latency: Latency = None):
+        self.models = FakeModels(model_latency)
+        self.caches = FakeCaches(cache_latency or Latency(0))
+
+
+def fake_embed_content(latency: Latency, dimensions: int = 768):
+    """Gera uma função compatível com google.generativeai.embed_content."""
+    def embed_content(model: str, content, task_type: str = None, **kwargs):
+        latency.wait()
+        items = content if isinstance(content, list) else [content]
+        return {"embedding": [[random.random() for _ in range(dimensions)] for _ in items]}
+    return embed_content
+
+
+# --- Gateway Node.js ---
+
+def sample_rooms(count: int = 6) -> list[dict]:
+    names = ["Suíte Master", "Quarto Simples", "Quarto Duplo", "Suíte Família", "Chalé Vista Mar", "Quarto Econômico"]
+    rooms = []
+    for i in range(count):
+        base = names[i % len(names)]
+        rooms.append({
+            "id": i + 1,
+            "name": base if i < len(names) else f"{base} {i // len(names) + 1}",
+            "description": "Quarto confortável com vista para o jardim e café da manhã incluso.",
+            "capacity": 2 + i % 3,
+            "daily_rate": 150.0 + 25 * (i % 8),
+            "beds": [{"type": "Cama de casal", "quantity": 1}, {"type": "Cama de solteiro", "quantity": i % 3}],
+            "amenities": {"tech_wifi": True, "tech_tv": True, "comfort_ar_condicionado": True, "kitchen_frigobar": i % 2 == 0, "outdoor_varanda": i % 3 == 0},
+            "photos": [f"https://example.com/rooms/{i + 1}.jpg"],
+        })
+    return rooms
+
+
+SAMPLE_CHUNKS = [
+    "1. **Check-in e Check-out:** O horário de check-in é a partir das 13:43. O horário de check-out é até as 14:37.",
+    "4. **Comportamento:** Ruído excessivo não é permitido, especialmente após as 22:34.",
+    "5. **Fumo:** O Hotel Estrela Cadente é um hotel para não fumantes.",
+]
+
+
+class StubGateway:
+    """
+    Servidor HTTP local que imita as rotas do Gateway usadas pelo serviço:
+    catálogo de quartos, relatório de disponibilidade, criação/cancelamento de
+    reservas, atendente humano e busca de chunks relevantes.
+    """
+
+    def __init__(self, latency: Latency = None, rooms: list[dict] = None, chunks: list[str] = None):
+        self.latency = latency or Latency(0)
+        self.rooms = rooms or sample_rooms()
+        self.chunks = chunks or SAMPLE_CHUNKS
+        self.requests = 0
+        self._server = None
+        self._booking_seq = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+            def _send(self, status: int, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _dispatch(self, method: str):
+                gateway.requests += 1
+                gateway.latency.wait()
+                body = self._read_body()
+                path = self.path.split("?")[0]
+                if method == "POST" and path == "/rooms/get-catalog":
+                    return self._send(200, {"data": gateway.rooms})
+                if method == "GET" and path.endswith("/availability-report"):
+                    return self._send(200, [
+                        {"id": r["id"], "name": r["name"], "dailyRate": r["daily_rate"],
+                         "isAvailable": i % 4 != 3, "availableCount": 0 if i % 4 == 3 else 2}
+                        for i, r in enumerate(gateway.rooms)
+                    ])
+                if method == "POST" and path == "/bookings/create":
+                    gateway._booking_seq += 1
+                    booking_id = gateway._booking_seq
+                    return self._send(200, {"bookingId": booking_id, "paymentUrl": f"https://pay.example.com/{booking_id}"})
+                if method == "DELETE" and path.startswith("/bookings/cancel/"):
+                    return self._send(200, {"cancelled": True})
+                if method == "POST" and path == "/bookings/call-human-agent":
+                    return self._send(200, {"notified": True})
+                if method == "POST" and path == "/document-chunks/find-relevant":
+                    top_k = body.get("top_k", 3)
+                    return self._send(200, {"data": gateway.chunks[:top_k]})
+                return self._send(404, {"error": f"rota desconhecida: {method} {path}"})
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stub-gateway", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
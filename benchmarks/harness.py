@@ -0,0 +1,101 @@
+# benchmarks/harness.py
+
+import json
+import os
+import sys
+
+from benchmarks.fakes import FakeGenaiClient, Latency, StubGateway, fake_embed_content
+
+# ==============================================================================
+#  MONTAGEM DO AMBIENTE DE BENCHMARK
+#  Instala os dublês (Gemini, embeddings, Redis, Gateway) ANTES de importar a
+#  API, para que os clientes criados na importação já sejam os falsos.
+# ==============================================================================
+
+BENCH_API_KEY = "bench-api-key"
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def install_fakes(model_latency: Latency = None, gateway_latency: Latency = None, embed_latency: Latency = None, rooms: list[dict] = None):
+    """
+    Sobe o Gateway falso e substitui os clientes externos (Gemini, embeddings, Redis).
+    Deve ser chamada antes de importar os módulos da aplicação. Retorna (gateway, fake_genai_client).
+    """
+    import fakeredis
+    import redis
+    import google.generativeai
+    from google import genai
+
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+    gateway = StubGateway(gateway_latency, rooms=rooms).start()
+    fake_client = FakeGenaiClient(model_latency or Latency(0))
+    fake_redis = fakeredis.FakeRedis(decode_responses=True)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["BACKEND_URL"] = gateway.url
+    os.environ["API_SECRET_KEY"] = BENCH_API_KEY
+    os.environ["REDIS_URL"] = "redis://bench.invalid:6379/0"
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+    redis.Redis.from_url = classmethod(lambda cls, *args, **kwargs: fake_redis)
+    genai.Client = lambda *args, **kwargs: fake_client
+    google.generativeai.embed_content = fake_embed_content(embed_latency or Latency(0))
+    return gateway, fake_client
+
+
+def boot_app(model_latency: Latency, gateway_latency: Latency, embed_latency: Latency, rooms: list[dict] = None):
+    """Instala os dublês e importa a API. Retorna (app, gateway, fake_genai_client)."""
+    gateway, fake_client = install_fakes(model_latency, gateway_latency, embed_latency, rooms)
+    import api
+    return api.app, gateway, fake_client
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Percentil exato (interpolação linear) de uma lista de amostras."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """
+    Diferença entre dois snapshots de STAGE_LATENCY: quantidade, média e p95
+    aproximado (pelos buckets do histograma) de cada etapa.
+    """
+    from metrics import STAGE_LATENCY
+
+    breakdown = {}
+    for key, series in after.items():
+        previous = before.get(key, {"count": 0, "sum": 0.0, "buckets": [0] * len(series["buckets"])})
+        count = series["count"] - previous["count"]
+        if count <= 0:
+            continue
+        buckets = [a - b for a, b in zip(series["buckets"], previous["buckets"])]
+        target = count * 0.95
+        cumulative = 0
+        p95 = float("inf")
+        for bound, bucket_count in zip(STAGE_LATENCY.buckets + (float("inf"),), buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                p95 = bound
+                break
+        breakdown[key[0]] = {
+            "count": count,
+            "mean_ms": round((series["sum"] - previous["sum"]) / count * 1000, 2),
+            "p95_le_ms": round(p95 * 1000, 2) if p95 != float("inf") else None,
+        }
+    return breakdown
+
+
+def write_report(report: dict, output: str = None):
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Relatório salvo em {output}")
@@ -0,0 +1,79 @@
+# benchmarks/import_budget.py
+"""
+Verifica o orçamento de tempo de importação da API (python -X importtime).
+
+A importação não deve criar clientes, abrir conexões nem chamar o Gemini: tudo
+isso acontece no primeiro uso ou no aquecimento do lifespan. Para garantir, a
+importação roda num processo limpo, com Redis apontando para um endereço que
+não responde e sem chave do Google; falha se passar do orçamento.
+
+Uso:
+    python -m benchmarks.import_budget                  # orçamento padrão (IMPORT_BUDGET_MS ou 1500 ms)
+    python -m benchmarks.import_budget --budget-ms 800 --top 15
+
+O mesmo orçamento roda na suíte de testes (tests/test_import_budget.py).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import ROOT_DIR
+
+# Orçamento padrão da importação da API (ms)
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+def measure_import(module: str) -> list[tuple[int, int, str]]:
+    """Importa o módulo num processo novo. Retorna [(self_us, cumulativo_us, nome)]."""
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    env.pop("GEMINI_API_KEY", None)
+    env["REDIS_URL"] = "redis://192.0.2.1:6379/0"  # TEST-NET: qualquer conexão ficaria pendurada
+    env["LOG_LEVEL"] = "WARNING"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def total_import_ms(rows: list[tuple[int, int, str]], module: str) -> float:
+    """Tempo cumulativo (ms) da importação do módulo principal."""
+    return next(c for _, c, name in reversed(rows) if name.strip() == module) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de importação da API")
+    parser.add_argument("--module", default="api")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="quantos módulos mais caros listar")
+    args = parser.parse_args()
+
+    try:
+        rows = measure_import(args.module)
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
+    total_ms = total_import_ms(rows, args.module)
+
+    print(f"Módulos mais caros (cumulativo) ao importar {args.module}:")
+    for _, cumulative, name in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name.strip()}")
+    print(f"\nTotal: {total_ms:.1f} ms (orçamento: {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        print("❌ Importação acima do orçamento")
+        sys.exit(1)
+    print("✅ Dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# benchmarks/loadgen.py
+"""
+Gerador de carga em malha aberta para /process_whatsapp_message.
+
+Novas conversas chegam como um processo de Poisson na taxa alvo (independente
+de as anteriores terem terminado), cada uma reproduzindo um roteiro de reserva
+com tempo de "digitação" entre as mensagens e chat_history crescente. A
+latência é medida a partir do instante agendado do envio, para não esconder
+filas (coordinated omission).
+
+Alvo: qualquer servidor em execução, com backends reais ou com os dublês de
+benchmarks/fake_server.py.
+
+Uso:
+    python -m benchmarks.loadgen --url http://localhost:8000 --api-key $API_SECRET_KEY --rate 2 --duration 60
+    python -m benchmarks.loadgen --url http://localhost:8000 --api-key ... --ramp 0.5,1,2,4,8 --slo-p95-ms 6000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.conversations import booking_conversation, question_conversation, render_chat_history
+from benchmarks.harness import percentile, write_report
+
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000)
+
+
+class StepResult:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.latencies = []
+        self.errors = {}
+        self.conversations_started = 0
+        self.conversations_completed = 0
+        self.conversation_durations = []
+
+    def record_error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, duration: float) -> dict:
+        requests = len(self.latencies)
+        errors = sum(self.errors.values())
+        histogram = {f"<={b}ms": 0 for b in LATENCY_BUCKETS_MS}
+        histogram["+Inf"] = 0
+        for latency in self.latencies:
+            ms = latency * 1000
+            for bound in LATENCY_BUCKETS_MS:
+                if ms <= bound:
+                    histogram[f"<={bound}ms"] += 1
+                    break
+            else:
+                histogram["+Inf"] += 1
+        mean_conversation = (sum(self.conversation_durations) / len(self.conversation_durations)) if self.conversation_durations else 0
+        return {
+            "offered_conversations_per_s": self.rate,
+            "achieved_conversations_per_s": round(self.conversations_completed / duration, 3) if duration else 0,
+            "conversations_started": self.conversations_started,
+            "conversations_completed": self.conversations_completed,
+            "requests": requests,
+            "error_rate": round(errors / requests, 4) if requests else 0,
+            "errors": self.errors,
+            "latency_ms": {
+                "p50": round(percentile(self.latencies, 0.50) * 1000, 1),
+                "p90": round(percentile(self.latencies, 0.90) * 1000, 1),
+                "p95": round(percentile(self.latencies, 0.95) * 1000, 1),
+                "p99": round(percentile(self.latencies, 0.99) * 1000, 1),
+                "max": round(max(self.latencies, default=0) * 1000, 1),
+            },
+            "latency_histogram": histogram,
+            # Lei de Little: leads em conversa simultânea = taxa de chegada x duração média
+            "concurrent_leads": round(self.rate * mean_conversation, 1),
+        }
+
+
+async def _conversation(client, args, index: int, result: StepResult):
+    script = booking_conversation(index) if random.random() < args.booking_ratio else question_conversation(index)
+    lead = f"5599{random.randrange(10**9):09d}"
+    hotel_id = f"{args.hotel_prefix}{index % args.hotels}"
+    turns = []
+    result.conversations_started += 1
+    conversation_start = time.perf_counter()
+    failed = False
+    for message in script:
+        payload = {
+            "user_id": hotel_id,
+            "message": message,
+            "chat_history": render_chat_history(turns),
+            "lead_whatsapp_number": lead,
+        }
+        scheduled = time.perf_counter()
+        try:
+            response = await client.post("/process_whatsapp_message", json=payload, headers={"x-api-key": args.api_key})
+            latency = time.perf_counter() - scheduled
+            if response.status_code == 200:
+                reply = response.json().get("response_gemini", "")
+            else:
+                result.record_error(f"HTTP {response.status_code}")
+                reply, failed = "", True
+        except Exception as e:
+            latency = time.perf_counter() - scheduled
+            result.record_error(type(e).__name__)
+            reply, failed = "", True
+        result.latencies.append(latency)
+        turns.append((message, reply))
+        if failed:
+            break
+        # Tempo até o hóspede mandar a próxima mensagem
+        await asyncio.sleep(random.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+    if not failed:
+        result.conversations_completed += 1
+        result.conversation_durations.append(time.perf_counter() - conversation_start)
+
+
+async def run_step(client, args, rate: float, first_index: int) -> dict:
+    result = StepResult(rate)
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    index = first_index
+    while True:
+        next_arrival += random.expovariate(rate)
+        if next_arrival - start > args.duration:
+            break
+        await asyncio.sleep(max(0, next_arrival - time.perf_counter()))
+        tasks.append(asyncio.create_task(_conversation(client, args, index, result)))
+        index += 1
+    # Espera as conversas em andamento terminarem (ou o tempo limite de drenagem)
+    if tasks:
+        await asyncio.wait(tasks, timeout=args.drain_timeout)
+        for task in tasks:
+            task.cancel()
+    summary = result.summary(time.perf_counter() - start)
+    summary["_next_index"] = index
+    return summary
+
+
+def is_saturated(step: dict, args) -> bool:
+    return (
+        step["latency_ms"]["p95"] > args.slo_p95_ms
+        or step["error_rate"] > args.max_error_rate
+        or step["conversations_completed"] < 0.9 * step["conversations_started"]
+    )
+
+
+async def run(args) -> dict:
+    import httpx
+
+    rates = [float(r) for r in args.ramp.split(",")] if args.ramp else [args.rate]
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    steps = []
+    saturation = None
+    index = 0
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for rate in rates:
+            print(f"▶️  {rate} conversas/s por {args.duration}s...")
+            step = await run_step(client, args, rate, index)
+            index = step.pop("_next_index")
+            steps.append(step)
+            lat = step["latency_ms"]
+            print(f"   p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                  f"erros={step['error_rate']:.2%} conversas={step['conversations_completed']}/{step['conversations_started']} "
+                  f"leads simultâneos≈{step['concurrent_leads']}")
+            if is_saturated(step, args):
+                saturation = rate
+                print(f"⛔ Saturação em {rate} conversas/s")
+                break
+
+    sustainable = [s for s in steps if not is_saturated(s, args)]
+    return {
+        "config": vars(args),
+        "steps": steps,
+        "saturation_rate": saturation,
+        "max_sustainable_rate": sustainable[-1]["offered_conversations_per_s"] if sustainable else None,
+        "max_concurrent_leads": sustainable[-1]["concurrent_leads"] if sustainable else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga em malha aberta (chegadas de Poisson)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--api-key", default="", help="valor do header x-api-key")
+    parser.add_argument("--rate", type=float, default=1.0, help="novas conversas por segundo")
+    parser.add_argument("--ramp", help="lista de taxas para achar a saturação, ex: 0.5,1,2,4")
+    parser.add_argument("--duration", type=float, default=60, help="segundos de chegadas por etapa")
+    parser.add_argument("--think-time", type=float, default=2.0, help="média (s) entre mensagens do hóspede")
+    parser.add_argument("--booking-ratio", type=float, default=0.7, help="fração de conversas de reserva")
+    parser.add_argument("--hotels", type=int, default=5)
+    parser.add_argument("--hotel-prefix", default="hotel-")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout por requisição (s)")
+    parser.add_argument("--drain-timeout", type=float, default=120, help="espera máxima pelas conversas ao fim da etapa")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--slo-p95-ms", type=float, default=8000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if report["max_sustainable_rate"] is not None:
+        print(f"\n✅ Máximo sustentável: {report['max_sustainable_rate']} conversas/s "
+              f"(≈{report['max_concurrent_leads']} leads em conversa simultânea)")
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
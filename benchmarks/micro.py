@@ -0,0 +1,183 @@
+# benchmarks/micro.py
+"""
+Microbenchmarks das funções Python puras executadas a cada turno.
+
+Usa entradas realistas em escala (catálogo de 500 quartos, histórico de 1000
+linhas, documento de vários MB a partir do Regras.json) e salva o resultado
+em JSON para acompanhar a evolução entre versões.
+
+Uso:
+    python -m benchmarks.micro                       # salva em benchmarks/results/
+    python -m benchmarks.micro --filter chunks       # só os casos que contêm "chunks"
+    python -m benchmarks.micro --compare benchmarks/results/micro-anterior.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import timeit
+from datetime import date, datetime, timedelta
+
+from benchmarks.conversations import booking_conversation, question_conversation, render_chat_history
+from benchmarks.fakes import sample_rooms
+from benchmarks.harness import ROOT_DIR, install_fakes, write_report
+
+ROOMS = 500
+HISTORY_LINES = 1000
+DOCUMENT_MB = 3
+
+
+def _availability(rooms: list[dict]) -> list[dict]:
+    return [
+        {"id": r["id"], "name": r["name"], "dailyRate": r["daily_rate"], "description": r["description"],
+         "isAvailable": i % 4 != 3, "availableCount": 0 if i % 4 == 3 else 2}
+        for i, r in enumerate(rooms)
+    ]
+
+
+def _history(lines: int) -> str:
+    turns = []
+    index = 0
+    while len(turns) * 2 < lines:
+        for message in booking_conversation(index) + question_conversation(index):
+            turns.append((message, "Claro! Aqui está a informação que você pediu sobre a sua reserva no hotel."))
+        index += 1
+    return render_chat_history(turns[: lines // 2])
+
+
+def _document(megabytes: int) -> str:
+    with open(os.path.join(ROOT_DIR, "Regras.json"), encoding="utf-8") as f:
+        content = json.load(f)["content"]
+    repeats = megabytes * 1024 * 1024 // len(content) + 1
+    return "\n\n".join([content] * repeats)
+
+
+def build_cases() -> dict:
+    """Monta {nome: função sem argumentos} com as entradas já preparadas."""
+    import gemini
+    from date_parser import parse_date_range
+    from api import parse_chat_history
+    from generateChunks import get_text_chunks
+    from knowledge_service import _format_rooms_for_llm
+    from lexical_index import Bm25Index
+    from ExtractFromFile import select_context
+
+    rooms = sample_rooms(ROOMS)
+    availability = _availability(rooms)
+    history = _history(HISTORY_LINES)
+    document = _document(DOCUMENT_MB)
+    check_in = (date.today() + timedelta(days=30)).isoformat()
+    check_out = (date.today() + timedelta(days=34)).isoformat()
+    knowledge = {"contexto_quartos": _format_rooms_for_llm({"data": rooms})}
+    session_data = {
+        "check_in_date": check_in, "check_out_date": check_out,
+        "availability": {"rooms": availability, "checkIn": check_in, "checkOut": check_out},
+        "room_name": "Suíte Master", "room_id": 1,
+    }
+    chat_context = "\n".join(
+        f"{m['role']}: {m['parts'][0]['text']}" for m in parse_chat_history(history)[-10:]
+    )
+    rag_context = "\n\n---\n\n".join(get_text_chunks(document[:5000])[:3])
+    lexical = Bm25Index(get_text_chunks(document[:200_000]))
+    candidates = [(chunk, 1 / (61 + i)) for i, chunk in enumerate(get_text_chunks(document[:10_000])[:12])]
+    candidate_embeddings = {chunk: [random.random() for _ in range(768)] for chunk, _ in candidates}
+
+    return {
+        "parse_chat_history[1000 linhas]": lambda: parse_chat_history(history),
+        "_format_rooms_for_llm[500 quartos]": lambda: _format_rooms_for_llm({"data": rooms}),
+        "format_availability_response[500 quartos]": lambda: gemini.format_availability_response(availability),
+        f"get_text_chunks[{DOCUMENT_MB}MB]": lambda: get_text_chunks(document),
+        "convert_date_to_iso": lambda: gemini.convert_date_to_iso("20 de dezembro"),
+        "parse_date_range": lambda: parse_date_range("Quero 3 noites a partir de sexta, de 15 a 20/12 não dá"),
+        "Bm25Index.search[200KB]": lambda: lexical.search("Qual o horário do check-in? Aceitam animais?", 6),
+        "select_context[12 candidatos]": lambda: select_context(candidates, candidate_embeddings),
+        "validar_datas_reserva": lambda: gemini.validar_datas_reserva(check_in, check_out),
+        "detectar_confirmacao_reserva[positiva]": lambda: gemini.detectar_confirmacao_reserva("Gostei da Suíte Master, pode reservar?"),
+        "detectar_confirmacao_reserva[negativa]": lambda: gemini.detectar_confirmacao_reserva("Qual o horário do café da manhã no domingo?"),
+        "get_room_id_from_name[500 quartos]": lambda: gemini.get_room_id_from_name(availability, "suite familia 42"),
+        "calculate_total_price[500 quartos]": lambda: gemini.calculate_total_price(check_in, check_out, ROOMS, availability),
+        "build_system_context[500 quartos]": lambda: gemini.build_system_context(
+            current_date=date.today().isoformat(), hotel_id="hotel-1", lead_whatsapp_number="5511999999999",
+            knowledge=knowledge, rag_context=rag_context, session_data=session_data,
+            booking_status=gemini.check_booking_requirements(session_data),
+            chat_context=chat_context, user_question="Gostei da Suíte Master, pode reservar?",
+        ),
+    }
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    """Estilo pyperf: calibra o número de loops para ~min_time e repete a medição."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time or loops >= 10**7:
+            break
+        loops *= 2
+    runs = [timer.timeit(loops) / loops for _ in range(repeat)]
+    return {
+        "loops": loops,
+        "min_us": round(min(runs) * 1e6, 3),
+        "mean_us": round(statistics.mean(runs) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(runs) * 1e6, 3) if len(runs) > 1 else 0.0,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return "desconhecido"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks das funções do caminho quente")
+    parser.add_argument("--filter", help="roda apenas casos cujo nome contém este texto")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="segundos mínimos por medição")
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: benchmarks/results/micro-<data>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    gateway, _ = install_fakes()
+    cases = build_cases()
+    gateway.stop()
+
+    results = {}
+    for name, fn in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:<45} {results[name]['mean_us']:>14.3f} µs ± {results[name]['stdev_us']:.3f}")
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f).get("results", {})
+        print("\nComparação com", args.compare)
+        for name, data in results.items():
+            if name in previous:
+                ratio = data["mean_us"] / previous[name]["mean_us"] if previous[name]["mean_us"] else float("inf")
+                print(f"{name:<45} {ratio:>8.2f}x")
+
+    output = args.output or os.path.join(
+        ROOT_DIR, "benchmarks", "results", f"micro-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    write_report({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }, output)
+
+
+if __name__ == "__main__":
+    main()
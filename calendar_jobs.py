@@ -0,0 +1,275 @@
+# calendar_jobs.py
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from app_logging import get_logger
+from callbacks import allowed_callback_url, post_callback
+from deadline import clear_deadline
+from metrics import CACHE_REQUESTS, Counter, Gauge, Histogram, stage_timer
+
+# ==============================================================================
+#  EVENTOS DO GOOGLE CALENDAR EM LOTE
+#  Sincronizações do Calendar chegam em rajadas de dezenas de eventos. O
+#  /handleWebhook só enfileira e responde 202; uma thread junta os eventos que
+#  chegam dentro de CALENDAR_BATCH_WINDOW_MS (até CALENDAR_BATCH_SIZE) e extrai
+#  os dados de todos os eventos do mesmo hotel numa única chamada ao Gemini
+#  (saída JSON estruturada). Os resultados vão por POST para a callback_url do
+#  payload ou para CALENDAR_RESULTS_URL.
+#
+#  O Google reenvia eventos e dispara o webhook em mudanças irrelevantes. A
+#  extração de cada evento fica no Redis (calendar_event:{id}) junto com o hash
+#  dos campos que importam (título, descrição, início, fim e lista de quartos);
+#  evento sem mudança devolve a extração guardada, sem chamar o modelo.
+# ==============================================================================
+
+logger = get_logger("calendar_jobs")
+
+# Eventos por chamada ao modelo
+CALENDAR_BATCH_SIZE = int(os.getenv("CALENDAR_BATCH_SIZE", "20"))
+# Espera por mais eventos depois do primeiro da rajada (ms)
+CALENDAR_BATCH_WINDOW_MS = int(os.getenv("CALENDAR_BATCH_WINDOW_MS", "500"))
+# Eventos aguardando na fila antes de recusar novos
+CALENDAR_QUEUE_MAX = int(os.getenv("CALENDAR_QUEUE_MAX", "1000"))
+# Destino padrão dos resultados (o payload pode trazer a própria callback_url)
+CALENDAR_RESULTS_URL = os.getenv("CALENDAR_RESULTS_URL")
+# Validade da extração guardada de cada evento (segundos)
+CALENDAR_EVENT_CACHE_TTL = int(os.getenv("CALENDAR_EVENT_CACHE_TTL", str(30 * 24 * 3600)))
+
+CALENDAR_EVENTS = Counter(
+    "calendar_events_total",
+    "Eventos do Google Calendar processados em lote por resultado (ok, missing, error).",
+    ["result"],
+)
+CALENDAR_EVENTS_QUEUED = Gauge(
+    "calendar_events_queued",
+    "Eventos do Google Calendar aguardando processamento neste worker.",
+)
+CALENDAR_BATCH_EVENTS = Histogram(
+    "calendar_batch_events",
+    "Eventos extraídos por chamada ao modelo.",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+
+_queue = queue.Queue(maxsize=CALENDAR_QUEUE_MAX)
+_STOP = object()
+_worker = None
+_worker_lock = threading.Lock()
+_enqueue_lock = threading.Lock()
+
+
+class QueueFullError(RuntimeError):
+    """A fila de eventos do Calendar deste worker está cheia."""
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _fingerprint(event: dict, available_rooms: list) -> str:
+    relevant = [event.get(field) for field in ("summary", "description", "start", "end")]
+    raw = json.dumps([relevant, sorted(available_rooms)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _cache_key(event: dict, fingerprint: str) -> str:
+    # Evento sem ID: o próprio conteúdo identifica
+    return f"calendar_event:{event.get('id') or fingerprint}"
+
+
+def _load_cached(keys: list) -> list:
+    try:
+        return [json.loads(raw) if raw else None for raw in _redis().mget(keys)]
+    except Exception as e:
+        logger.warning("⚠️ [CALENDAR] Cache de eventos indisponível: %s", e)
+        return [None] * len(keys)
+
+
+def _store_cached(entries: dict):
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for key, value in entries.items():
+            pipe.set(key, json.dumps(value, ensure_ascii=False), ex=CALENDAR_EVENT_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("⚠️ [CALENDAR] Falha ao guardar %d extrações no cache: %s", len(entries), e)
+
+
+def extract_events(events: list, available_rooms: list) -> list:
+    """
+    Extração de cada evento (ou None), reaproveitando as guardadas para eventos
+    sem mudança relevante. Só os eventos novos ou alterados (e cada um uma vez só,
+    mesmo repetido no lote) vão para o modelo, numa única chamada.
+    """
+    from gemini import extract_google_events
+
+    fingerprints = [_fingerprint(event, available_rooms) for event in events]
+    keys = [_cache_key(event, fp) for event, fp in zip(events, fingerprints)]
+    results = [None] * len(events)
+    pending = {}  # fingerprint -> índices dos eventos que precisam do modelo
+    for i, cached in enumerate(_load_cached(keys)):
+        if cached and cached.get("fingerprint") == fingerprints[i]:
+            results[i] = cached["data"]
+            CACHE_REQUESTS.inc(cache="calendar_event", result="hit")
+        else:
+            pending.setdefault(fingerprints[i], []).append(i)
+            CACHE_REQUESTS.inc(cache="calendar_event", result="miss")
+    if not pending:
+        return results
+
+    first_indexes = [indexes[0] for indexes in pending.values()]
+    CALENDAR_BATCH_EVENTS.observe(len(first_indexes))
+    with stage_timer("calendar_batch"):
+        extracted = extract_google_events([events[i] for i in first_indexes], available_rooms)
+
+    to_store = {}
+    for indexes, data in zip(pending.values(), extracted):
+        for i in indexes:
+            results[i] = data
+            if data is not None:
+                to_store[keys[i]] = {"fingerprint": fingerprints[i], "data": data}
+    if to_store:
+        _store_cached(to_store)
+    return results
+
+
+def results_url(payload: dict):
+    """
+    Para onde enviar os resultados do payload, ou None (processamento síncrono).
+    Levanta ValueError se a callback_url do payload não for do Gateway.
+    """
+    callback_url = payload.get("callback_url")
+    if callback_url and not allowed_callback_url(callback_url):
+        raise ValueError("callback_url não permitida: use o host do Gateway ou um de CALLBACK_ALLOWED_HOSTS.")
+    return callback_url or CALENDAR_RESULTS_URL
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="calendar-batch", daemon=True)
+            _worker.start()
+
+
+def enqueue_events(payload: dict) -> int:
+    """
+    Enfileira os eventos do payload ({"event": {...}} ou {"events": [...]}, mais
+    "user" com "availableRooms"). Retorna quantos foram enfileirados. Levanta
+    ValueError sem eventos e QueueFullError se a fila estiver cheia.
+    """
+    events = payload.get("events") or ([payload["event"]] if payload.get("event") else [])
+    if not events:
+        raise ValueError("Nenhum evento no payload.")
+
+    user = payload.get("user", {})
+    callback_url = results_url(payload)
+    _ensure_worker()
+    # Verificação e inserção juntas: webhooks simultâneos não enfileiram parte do
+    # payload (o reenvio depois de um erro duplicaria os eventos já na fila)
+    with _enqueue_lock:
+        if _queue.qsize() + len(events) > CALENDAR_QUEUE_MAX:
+            raise QueueFullError("Fila de eventos do Calendar cheia, tente novamente mais tarde.")
+        for event in events:
+            try:
+                _queue.put_nowait((event, user, callback_url))
+            except queue.Full:
+                raise QueueFullError("Fila de eventos do Calendar cheia, tente novamente mais tarde.")
+    CALENDAR_EVENTS_QUEUED.set(_queue.qsize())
+    logger.info("📅 [CALENDAR] %d evento(s) enfileirado(s)", len(events))
+    return len(events)
+
+
+def _next_batch():
+    """Bloqueia até o primeiro evento e junta os que chegarem na janela. Retorna (lote, parar)."""
+    first = _queue.get()
+    if first is _STOP:
+        return [], True
+    batch = [first]
+    deadline = time.monotonic() + CALENDAR_BATCH_WINDOW_MS / 1000
+    while len(batch) < CALENDAR_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = _queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def _run():
+    # A thread do lote nasce de uma requisição, mas atende eventos de várias: sem prazo
+    clear_deadline()
+    while True:
+        batch, stop = _next_batch()
+        CALENDAR_EVENTS_QUEUED.set(_queue.qsize())
+        if batch:
+            try:
+                _process_batch(batch)
+            except Exception as e:
+                logger.error("❌ [CALENDAR] Erro inesperado no lote de %d eventos: %s", len(batch), e)
+        if stop:
+            return
+
+
+def _process_batch(batch: list):
+    # A lista de quartos entra no prompt: uma chamada por hotel (e destino dos resultados)
+    groups = {}
+    for event, user, callback_url in batch:
+        key = (tuple(user.get("availableRooms", [])), callback_url)
+        groups.setdefault(key, []).append((event, user))
+
+    for (rooms, callback_url), items in groups.items():
+        events = [event for event, _ in items]
+        failure = None
+        try:
+            extracted = extract_events(events, list(rooms))
+        except Exception as e:
+            logger.error("❌ [CALENDAR] Falha ao extrair %d eventos: %s", len(events), e)
+            extracted, failure = [None] * len(events), str(e)
+
+        results = []
+        for (event, user), data in zip(items, extracted):
+            entry = {
+                "eventId": event.get("id"),
+                "event": event,
+                "user": {k: v for k, v in user.items() if k != "availableRooms"},
+            }
+            if data is not None:
+                CALENDAR_EVENTS.inc(result="ok")
+                entry.update(status="ok", data=data)
+            else:
+                CALENDAR_EVENTS.inc(result="error" if failure else "missing")
+                entry.update(status="error", error=failure or "O modelo não retornou dados para este evento.")
+            results.append(entry)
+        _post_results(callback_url, results)
+
+
+def _post_results(callback_url: str, results: list):
+    try:
+        # Corpo assinado (HMAC) em vez da API_SECRET_KEY, como nos jobs de indexação
+        post_callback(callback_url, {"results": results})
+        logger.info("📨 [CALENDAR] %d resultado(s) enviados para o Gateway", len(results))
+    except Exception as e:
+        logger.error("❌ [CALENDAR] Falha ao enviar %d resultado(s) para %s: %s", len(results), callback_url, e)
+
+
+def shutdown(timeout: float = 30):
+    """Desligamento do worker: processa o que já está na fila (até o prazo) e encerra a thread."""
+    if _worker is None or not _worker.is_alive():
+        return
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        logger.warning("⚠️ [CALENDAR] Fila cheia no desligamento; %d eventos não serão processados", _queue.qsize())
+        return
+    _worker.join(timeout)
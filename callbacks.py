@@ -0,0 +1,61 @@
+# callbacks.py
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from tracing import inject_trace_headers
+
+# ==============================================================================
+#  CALLBACKS PARA O GATEWAY
+#  Jobs de indexação e lotes do Calendar devolvem o resultado por POST para uma
+#  URL. Como a URL pode vir no corpo da requisição, ela só é aceita se o host
+#  for o do Gateway (BACKEND_URL, CALENDAR_RESULTS_URL) ou estiver em
+#  CALLBACK_ALLOWED_HOSTS, e a API_SECRET_KEY nunca vai junto: o corpo é
+#  assinado com HMAC-SHA256 e o Gateway confere a assinatura com a mesma chave.
+#
+#    x-signature-timestamp: segundos desde a época
+#    x-signature: sha256=HMAC(chave, "{timestamp}." + corpo)
+# ==============================================================================
+
+# Hosts extras aceitos em callback_url (separados por vírgula, ex: "gateway.interno:3000")
+CALLBACK_ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()}
+
+
+def _netloc(url: str) -> str:
+    return urlsplit(url).netloc.lower() if url else ""
+
+
+def allowed_callback_url(url: str) -> bool:
+    """True se a URL é http(s) e o host é o do Gateway ou está em CALLBACK_ALLOWED_HOSTS."""
+    try:
+        parts = urlsplit(url or "")
+    except ValueError:
+        return False
+    if parts.scheme not in ("http", "https") or not parts.netloc or parts.username or parts.password:
+        return False
+    netloc = parts.netloc.lower()
+    allowed = CALLBACK_ALLOWED_HOSTS | {_netloc(os.getenv("BACKEND_URL")), _netloc(os.getenv("CALENDAR_RESULTS_URL"))}
+    return netloc in allowed or parts.hostname in allowed
+
+
+def signature_headers(body: bytes) -> dict:
+    """Headers com a assinatura HMAC do corpo (chave: API_SECRET_KEY)."""
+    timestamp = str(int(time.time()))
+    secret = (os.getenv("API_SECRET_KEY") or "").encode("utf-8")
+    digest = hmac.new(secret, timestamp.encode("utf-8") + b"." + body, hashlib.sha256).hexdigest()
+    return {"x-signature-timestamp": timestamp, "x-signature": f"sha256={digest}"}
+
+
+def post_callback(url: str, payload: dict, timeout: float = 30) -> requests.Response:
+    """POST assinado do payload (JSON) para a URL. Levanta erro em status HTTP de falha."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = inject_trace_headers({"content-type": "application/json", **signature_headers(body)})
+    response = requests.post(url, data=body, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response
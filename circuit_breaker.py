@@ -0,0 +1,148 @@
+# circuit_breaker.py
+
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+from app_logging import get_logger
+from metrics import Counter, Gauge
+
+# ==============================================================================
+#  CIRCUIT BREAKERS DAS DEPENDÊNCIAS DO GATEWAY
+#  Com o Gateway degradado, cada turno esperava as chamadas HTTP sem prazo e as
+#  threads do worker se acumulavam. Cada endpoint tem um disjuntor: se a taxa de
+#  falhas na janela recente passa do limite, ele abre e as chamadas falham na
+#  hora (quem chama usa o último dado bom, quando houver). Depois de
+#  CIRCUIT_OPEN_SECONDS, uma chamada de teste (meio-aberto) decide se fecha.
+#
+#  Os estados valem por worker.
+# ==============================================================================
+
+logger = get_logger("circuit_breaker")
+
+# Prazo das chamadas HTTP ao Gateway (segundos)
+GATEWAY_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "5"))
+# Fração de falhas na janela que abre o disjuntor
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# Chamadas mínimas na janela antes de avaliar a taxa de falhas
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+# Janela das chamadas consideradas (segundos)
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+# Tempo aberto antes da chamada de teste (segundos)
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Estado do disjuntor (0 = fechado, 1 = meio-aberto, 2 = aberto).",
+    ["breaker"],
+)
+CIRCUIT_CALLS = Counter(
+    "circuit_breaker_calls_total",
+    "Chamadas por disjuntor e resultado (success, failure, rejected).",
+    ["breaker", "result"],
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """O disjuntor está aberto: a dependência não foi chamada."""
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """Erros que indicam dependência degradada; 4xx são problema da requisição, não do Gateway."""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return True
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = CIRCUIT_FAILURE_RATE, min_calls: int = CIRCUIT_MIN_CALLS,
+                 window_seconds: float = CIRCUIT_WINDOW_SECONDS, open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque()  # (instante, sucesso)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, breaker=name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("🔌 [CIRCUIT] %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], breaker=self.name)
+
+    def _before_call(self) -> bool:
+        """Autoriza a chamada. Retorna True se ela for a chamada de teste do meio-aberto."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    raise CircuitOpenError(f"Circuito {self.name} aberto")
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(f"Circuito {self.name} em teste")
+                self._probing = True
+                return True
+            return False
+
+    def _record(self, success: bool, probe: bool):
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                if success:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                else:
+                    self._opened_at = now
+                    self._set_state(OPEN)
+                return
+            self._outcomes.append((now, success))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for _, ok in self._outcomes if not ok)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._opened_at = now
+                    self._set_state(OPEN)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Executa fn(*args, **kwargs) se o disjuntor permitir; senão levanta
+        CircuitOpenError sem chamar a dependência.
+        """
+        try:
+            probe = self._before_call()
+        except CircuitOpenError:
+            CIRCUIT_CALLS.inc(breaker=self.name, result="rejected")
+            raise
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            failed = is_dependency_failure(e)
+            self._record(not failed, probe)
+            CIRCUIT_CALLS.inc(breaker=self.name, result="failure" if failed else "success")
+            raise
+        self._record(True, probe)
+        CIRCUIT_CALLS.inc(breaker=self.name, result="success")
+        return result
+
+
+KNOWLEDGE_BREAKER = CircuitBreaker("gateway_rooms_catalog")
+RAG_BREAKER = CircuitBreaker("gateway_find_relevant")
+AVAILABILITY_BREAKER = CircuitBreaker("gateway_availability")
+
+
+def breaker_states() -> dict:
+    """Estado atual de cada disjuntor (para o /health)."""
+    return {b.name: b.state for b in (KNOWLEDGE_BREAKER, RAG_BREAKER, AVAILABILITY_BREAKER)}
@@ -0,0 +1,226 @@
+# conversation_history.py
+
+import contextvars
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import get_logger
+from deadline import clear_deadline
+from metrics import Counter, stage_timer
+from tracing import traced
+
+# ==============================================================================
+#  HISTÓRICO DA CONVERSA NO SERVIDOR
+#  Cada lead tem uma lista no Redis (history:{número}) com os turnos já
+#  estruturados, limitada por RPUSH + LTRIM. O Gateway só precisa mandar a
+#  mensagem nova; o chat_history enviado por ele é usado apenas para semear o
+#  histórico de conversas que ainda não existem no Redis.
+#
+#  RESUMO INCREMENTAL
+#  Quando a janela literal passa de HISTORY_SUMMARY_TRIGGER_TOKENS (ou de
+#  HISTORY_CONTEXT_MESSAGES mensagens), as mensagens mais antigas são
+#  incorporadas a um resumo (history_summary:{número}) por um modelo barato,
+#  fora do caminho da resposta. O modelo recebe resumo + mensagens recentes.
+# ==============================================================================
+
+logger = get_logger("conversation_history")
+
+# Turnos (mensagens) guardados por lead
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))
+# Mensagens recentes enviadas ao modelo a cada turno
+HISTORY_CONTEXT_MESSAGES = int(os.getenv("HISTORY_CONTEXT_MESSAGES", "20"))
+# Validade do histórico sem novas mensagens (segundos)
+HISTORY_TTL = int(os.getenv("HISTORY_TTL", str(7 * 24 * 3600)))
+# Tokens (estimados) da janela literal que disparam o resumo (0 = desliga)
+HISTORY_SUMMARY_TRIGGER_TOKENS = int(os.getenv("HISTORY_SUMMARY_TRIGGER_TOKENS", "2000"))
+# Mensagens mais recentes que nunca entram no resumo
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "6"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash-lite")
+
+SUMMARIES = Counter(
+    "history_summaries_total",
+    "Compactações do histórico em resumo por resultado.",
+    ["result"],
+)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+# Leads com resumo em andamento neste worker
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+SUMMARY_PROMPT = """
+Você mantém o resumo de uma conversa de WhatsApp entre um hóspede e o Alfred, assistente de reservas do hotel.
+Atualize o resumo abaixo incorporando as novas mensagens. Preserve tudo que for útil para continuar o atendimento:
+datas pedidas, quarto escolhido, número de hóspedes, nome, e-mail, preferências, dúvidas já respondidas e pendências.
+Escreva em português, em até 150 palavras, sem inventar informações.
+
+RESUMO ATUAL:
+{summary}
+
+NOVAS MENSAGENS:
+{messages}
+
+RESUMO ATUALIZADO:
+"""
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _key(lead_whatsapp_number: str) -> str:
+    return f"history:{lead_whatsapp_number}"
+
+
+def _summary_key(lead_whatsapp_number: str) -> str:
+    return f"history_summary:{lead_whatsapp_number}"
+
+
+def _turns_key(lead_whatsapp_number: str) -> str:
+    return f"history_turns:{lead_whatsapp_number}"
+
+
+def _message(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def _text(message: dict) -> str:
+    return message["parts"][0].get("text", "")
+
+
+def _estimate_tokens(message: dict) -> int:
+    # ~4 caracteres por token em português; suficiente para decidir quando resumir
+    return len(_text(message)) // 4 + 4
+
+
+@traced("redis_history_get")
+def load_conversation(lead_whatsapp_number: str, limit: int = HISTORY_CONTEXT_MESSAGES):
+    """
+    Resumo das mensagens antigas (ou None) e as últimas mensagens do lead no
+    formato do Gemini ({"role", "parts"}).
+    """
+    with stage_timer("redis_history_get"):
+        pipe = _redis().pipeline(transaction=False)
+        pipe.get(_summary_key(lead_whatsapp_number))
+        pipe.lrange(_key(lead_whatsapp_number), -limit, -1)
+        summary, raw = pipe.execute()
+    return summary, [json.loads(item) for item in raw]
+
+
+def turn_count(lead_whatsapp_number: str) -> int:
+    """
+    Quantos turnos o lead já teve (só cresce, ao contrário da lista, que é
+    cortada e resumida). Muda a cada resposta, o que separa um "sim" repetido
+    pelo hóspede de um reenvio da mesma mensagem.
+    """
+    return int(_redis().get(_turns_key(lead_whatsapp_number)) or 0)
+
+
+@traced("redis_history_append")
+def append_messages(lead_whatsapp_number: str, messages: list[dict], new_turn: bool = False):
+    """
+    Acrescenta mensagens ao histórico do lead, mantendo só as HISTORY_MAX_MESSAGES
+    mais recentes. Com new_turn, conta mais um turno do lead (turn_count).
+    """
+    if not messages:
+        return
+    key = _key(lead_whatsapp_number)
+    with stage_timer("redis_history_append"):
+        pipe = _redis().pipeline(transaction=False)
+        pipe.rpush(key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+        pipe.ltrim(key, -HISTORY_MAX_MESSAGES, -1)
+        pipe.expire(key, HISTORY_TTL)
+        pipe.expire(_summary_key(lead_whatsapp_number), HISTORY_TTL)
+        if new_turn:
+            pipe.incr(_turns_key(lead_whatsapp_number))
+            pipe.expire(_turns_key(lead_whatsapp_number), HISTORY_TTL)
+        pipe.execute()
+    _maybe_summarize(lead_whatsapp_number)
+
+
+def append_turn(lead_whatsapp_number: str, user_message: str, reply: str):
+    """Registra a mensagem do hóspede e a resposta do assistente."""
+    messages = [_message("user", user_message)]
+    if reply:
+        messages.append(_message("model", reply))
+    append_messages(lead_whatsapp_number, messages, new_turn=True)
+
+
+def _maybe_summarize(lead_whatsapp_number: str):
+    """Agenda a compactação do histórico em segundo plano (uma por lead de cada vez)."""
+    if HISTORY_SUMMARY_TRIGGER_TOKENS <= 0:
+        return
+    with _summarizing_lock:
+        if lead_whatsapp_number in _summarizing:
+            return
+        _summarizing.add(lead_whatsapp_number)
+    _executor.submit(contextvars.copy_context().run, _summarize, lead_whatsapp_number)
+
+
+def _messages_to_fold(messages: list[dict]) -> int:
+    """Quantas mensagens antigas incorporar ao resumo (0 se a janela ainda cabe)."""
+    tokens = sum(_estimate_tokens(m) for m in messages)
+    if tokens <= HISTORY_SUMMARY_TRIGGER_TOKENS and len(messages) <= HISTORY_CONTEXT_MESSAGES:
+        return 0
+    # Mantém as mensagens mais recentes que cabem em metade dos limites
+    keep, kept_tokens = 0, 0
+    for message in reversed(messages):
+        kept_tokens += _estimate_tokens(message)
+        if keep >= HISTORY_KEEP_RECENT and (
+            kept_tokens > HISTORY_SUMMARY_TRIGGER_TOKENS // 2 or keep >= HISTORY_CONTEXT_MESSAGES // 2
+        ):
+            break
+        keep += 1
+    return len(messages) - keep
+
+
+def _summarize(lead_whatsapp_number: str):
+    from gemini import get_client
+    from rate_limiter import GEMINI_LIMITER
+
+    # O resumo roda depois da resposta: não herda o prazo da requisição
+    clear_deadline()
+    key = _key(lead_whatsapp_number)
+    lock_key = f"history_summary_lock:{lead_whatsapp_number}"
+    try:
+        redis_client = _redis()
+        # Entre workers: só um resumo por lead de cada vez
+        if not redis_client.set(lock_key, "1", nx=True, ex=120):
+            return
+        try:
+            messages = [json.loads(item) for item in redis_client.lrange(key, 0, -1)]
+            fold = _messages_to_fold(messages)
+            if not fold:
+                return
+            summary = redis_client.get(_summary_key(lead_whatsapp_number)) or "(sem resumo ainda)"
+            transcript = "\n".join(
+                f"{'Hóspede' if m['role'] == 'user' else 'Alfred'}: {_text(m)}" for m in messages[:fold]
+            )
+            with stage_timer("history_summary"):
+                response = GEMINI_LIMITER.call(
+                    get_client().models.generate_content,
+                    model=SUMMARY_MODEL,
+                    contents=SUMMARY_PROMPT.format(summary=summary, messages=transcript),
+                )
+            new_summary = (response.text or "").strip()
+            if not new_summary:
+                SUMMARIES.inc(result="empty")
+                return
+            # Novas mensagens entram no fim da lista; as resumidas saem do início
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.set(_summary_key(lead_whatsapp_number), new_summary, ex=HISTORY_TTL)
+            pipe.ltrim(key, fold, -1)
+            pipe.execute()
+            SUMMARIES.inc(result="ok")
+            logger.info("🗜️ [HISTÓRICO] %s mensagens de %s incorporadas ao resumo", fold, lead_whatsapp_number)
+        finally:
+            redis_client.delete(lock_key)
+    except Exception as e:
+        SUMMARIES.inc(result="error")
+        logger.warning("⚠️ [HISTÓRICO] Falha ao resumir o histórico de %s: %s", lead_whatsapp_number, e)
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(lead_whatsapp_number)
@@ -1,16 +1,32 @@
 import os
+import threading
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from app_logging import get_logger
 
 load_dotenv()
 
+logger = get_logger("database")
+
 url: str = os.getenv("SUPABASE_URL")
 key: str = os.getenv("SUPABASE_KEY")
 
+SUPABASE_CONFIGURED = bool(url and key)
+
 # Verifica se as variáveis de ambiente estão configuradas
-if not url or not key:
-    print("⚠️  Aviso: Variáveis SUPABASE_URL e SUPABASE_KEY não configuradas no arquivo .env")
-    print("A API funcionará apenas para testes básicos.")
+if not SUPABASE_CONFIGURED:
+    logger.warning("⚠️  Aviso: Variáveis SUPABASE_URL e SUPABASE_KEY não configuradas no arquivo .env")
+    logger.warning("A API funcionará apenas para testes básicos.")
+
+_supabase = None
+_supabase_lock = threading.Lock()
 
-supabase: Client = create_client(url, key) if url and key else None
 
+def get_supabase():
+    """Cliente do Supabase, criado no primeiro uso (None se não configurado)."""
+    global _supabase
+    if _supabase is None and SUPABASE_CONFIGURED:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(url, key)
+    return _supabase
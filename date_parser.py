@@ -0,0 +1,269 @@
+# date_parser.py
+
+import re
+import unicodedata
+from datetime import date, timedelta
+
+# ==============================================================================
+#  INTERPRETAÇÃO DE DATAS EM PORTUGUÊS
+#  Regras determinísticas (expressões pré-compiladas) para as datas e períodos
+#  que os hóspedes escrevem: "amanhã", "próximo fim de semana", "de 15 a 20/12",
+#  "3 noites a partir de sexta", "carnaval"... Resolver aqui evita turnos de
+#  esclarecimento e chamadas extras de ferramenta, cada um custando uma ida
+#  ao Gemini.
+# ==============================================================================
+
+MONTHS = {
+    "janeiro": 1, "jan": 1, "fevereiro": 2, "fev": 2, "marco": 3, "mar": 3, "abril": 4, "abr": 4,
+    "maio": 5, "mai": 5, "junho": 6, "jun": 6, "julho": 7, "jul": 7, "agosto": 8, "ago": 8,
+    "setembro": 9, "set": 9, "outubro": 10, "out": 10, "novembro": 11, "nov": 11, "dezembro": 12, "dez": 12,
+}
+WEEKDAYS = {"segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6}
+NUMBER_WORDS = {
+    "uma": 1, "um": 1, "duas": 2, "dois": 2, "tres": 3, "quatro": 4, "cinco": 5, "seis": 6,
+    "sete": 7, "oito": 8, "nove": 9, "dez": 10, "onze": 11, "doze": 12, "quinze": 15,
+}
+# Estadias acima disso são tratadas como erro de interpretação
+MAX_NIGHTS = 30
+# "28 a 2/1" atravessa o mês; "5 a 1 de janeiro" (27 noites) é mais provável erro de digitação
+_MAX_CROSS_MONTH_NIGHTS = 15
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY = "|".join(WEEKDAYS)
+_NUMBER = r"\d{1,2}|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+
+# Uma data isolada; os grupos nomeados indicam o formato encontrado
+_DATE_RE = re.compile(
+    r"(?P<iso>\b(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})\b)"
+    r"|(?P<num>\b(?P<num_d>\d{1,2})/(?P<num_m>\d{1,2})(?:/(?P<num_y>\d{2,4}))?\b)"
+    rf"|(?P<txt>\b(?P<txt_d>\d{{1,2}})(?:o|º)?\s+de\s+(?P<txt_m>{_MONTH})\b(?:\s+de\s+(?P<txt_y>\d{{4}}))?)"
+    r"|(?P<rel>\bdepois\s+de\s+amanha\b|\bamanha\b|\bhoje\b)"
+    rf"|(?P<wd>\b(?P<wd_next>proxim[oa]\s+)?(?P<wd_name>{_WEEKDAY})(?:-feira|\s+feira)?\b)"
+)
+# "de 15 a 20/12", "15 a 20 de dezembro", "entre 15 e 20 de dezembro"
+_DAY_SPAN_RE = re.compile(
+    r"(?<![/\d-])\b(?P<d1>\d{1,2})\s*(?:a|ao|ate|e|-)\s*(?:o\s+)?(?:dia\s+)?(?P<d2>\d{1,2})"
+    rf"(?:/(?P<m_num>\d{{1,2}})|\s+de\s+(?P<m_txt>{_MONTH})\b)(?:(?:/|\s+de\s+)(?P<y>\d{{2,4}}))?"
+)
+# Liga duas datas: "20 de dezembro a 3 de janeiro", "15/12 até 20/12"
+_CONNECTOR_RE = re.compile(r"^\s*(?:,\s*)?(?:a|ao|ate|e|-|para)\s+(?:o\s+)?(?:dia\s+)?$|^\s*-\s*$")
+_NIGHTS_RE = re.compile(rf"\b(?P<n>{_NUMBER})\s+(?:noites?|diarias?|pernoites?)\b")
+_WEEKS_RE = re.compile(rf"\b(?P<n>{_NUMBER})\s+semanas?\b")
+_WEEKEND_RE = re.compile(r"\b(?P<next>proximo\s+|que\s+vem\s+)?fi(?:m|nal)\s+de\s+semana(?P<after>\s+que\s+vem)?\b")
+# "Natal" também é cidade ("sou de Natal"): só conta como feriado com artigo ("no natal", "para o natal")
+_HOLIDAY_RE = re.compile(
+    r"\b(carnaval|pascoa|semana\s+santa|(?<=o\s)natal|(?<=do\s)natal|reveillon|ano\s+novo|tiradentes|corpus\s+christi)\b"
+)
+# Intenção de hospedagem ou de consultar disponibilidade na mensagem
+_STAY_INTENT_RE = re.compile(
+    r"\b(reserv\w*|hosped\w*|disponib\w*|disponive\w*|vagas?|quartos?|suites?|diarias?|noites?|pernoit\w*|estadia"
+    r"|ficar|chego|chegar|chegada|saio|sair|saida|check-?in|check-?out|passar|ir|vir|viajar)\b"
+)
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos, para as expressões não dependerem da grafia."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _easter(year: int) -> date:
+    # Algoritmo de Meeus/Jones/Butcher (calendário gregoriano)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - e - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _holiday_period(name: str, year: int):
+    """(check-in, check-out) típicos de cada feriado no ano informado."""
+    name = re.sub(r"\s+", " ", name)
+    if name == "carnaval":
+        easter = _easter(year)
+        return easter - timedelta(days=50), easter - timedelta(days=46)  # sábado até quarta de cinzas
+    if name in ("pascoa", "semana santa"):
+        easter = _easter(year)
+        return easter - timedelta(days=3), easter + timedelta(days=1)  # quinta santa até segunda
+    if name == "corpus christi":
+        thursday = _easter(year) + timedelta(days=60)
+        return thursday, thursday + timedelta(days=3)
+    if name == "natal":
+        return date(year, 12, 24), date(year, 12, 26)
+    if name in ("reveillon", "ano novo"):
+        return date(year, 12, 30), date(year + 1, 1, 2)
+    if name == "tiradentes":
+        return date(year, 4, 20), date(year, 4, 22)
+    return None
+
+
+def _upcoming_holiday(name: str, today: date):
+    for year in (today.year, today.year + 1):
+        period = _holiday_period(name, year)
+        if period and period[1] > today:
+            return period
+    return None
+
+
+def _to_int(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def _safe_date(year: int, month: int, day: int):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _resolve_year(month: int, day: int, today: date, year: str = None):
+    """Sem ano explícito, usa a próxima ocorrência da data (este ano ou o próximo)."""
+    if year:
+        full_year = int(year) + 2000 if len(year) == 2 else int(year)
+        return _safe_date(full_year, month, day)
+    candidate = _safe_date(today.year, month, day)
+    if candidate is None or candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def _date_from_match(match: re.Match, today: date):
+    if match.group("iso"):
+        return _safe_date(int(match.group("iso_y")), int(match.group("iso_m")), int(match.group("iso_d")))
+    if match.group("num"):
+        return _resolve_year(int(match.group("num_m")), int(match.group("num_d")), today, match.group("num_y"))
+    if match.group("txt"):
+        return _resolve_year(MONTHS[match.group("txt_m")], int(match.group("txt_d")), today, match.group("txt_y"))
+    if match.group("rel"):
+        relative = re.sub(r"\s+", " ", match.group("rel"))
+        return today + timedelta(days={"hoje": 0, "amanha": 1, "depois de amanha": 2}[relative])
+    if match.group("wd"):
+        ahead = (WEEKDAYS[match.group("wd_name")] - today.weekday()) % 7
+        if ahead == 0 and match.group("wd_next"):
+            ahead = 7
+        return today + timedelta(days=ahead)
+    return None
+
+
+def parse_date(text: str, today: date = None):
+    """Primeira data mencionada no texto (date) ou None."""
+    today = today or date.today()
+    normalized = normalize(text)
+    for match in _DATE_RE.finditer(normalized):
+        parsed = _date_from_match(match, today)
+        if parsed:
+            return parsed
+    return None
+
+
+def _nights(normalized: str):
+    match = _NIGHTS_RE.search(normalized)
+    if match:
+        return _to_int(match.group("n"))
+    match = _WEEKS_RE.search(normalized)
+    if match:
+        return 7 * _to_int(match.group("n"))
+    return None
+
+
+def has_stay_intent(text: str) -> bool:
+    """True se a mensagem fala de hospedagem ou disponibilidade ("quero reservar", "tem vaga", "3 noites")."""
+    return bool(text and _STAY_INTENT_RE.search(normalize(text)))
+
+
+def _result(check_in, check_out, expression: str, today: date, kind: str = "dates"):
+    if not check_in or not check_out or check_in < today:
+        return None
+    if not 0 < (check_out - check_in).days <= MAX_NIGHTS:
+        return None
+    return {
+        "check_in": check_in.isoformat(),
+        "check_out": check_out.isoformat(),
+        "expression": expression.strip(),
+        "kind": kind,
+    }
+
+
+def parse_date_range(text: str, today: date = None):
+    """
+    Período de hospedagem mencionado no texto: {"check_in", "check_out" (ISO),
+    "expression", "kind"} ou None se não houver um período completo e plausível.
+    kind é "dates" para datas ditas pelo hóspede e "weekend"/"holiday" para
+    períodos deduzidos ("fim de semana", "carnaval"), que pedem confirmação.
+    """
+    if not text:
+        return None
+    today = today or date.today()
+    normalized = normalize(text)
+
+    # "de 15 a 20/12", "15 a 20 de dezembro"
+    match = _DAY_SPAN_RE.search(normalized)
+    if match:
+        month = int(match.group("m_num")) if match.group("m_num") else MONTHS[match.group("m_txt")]
+        check_out = _resolve_year(month, int(match.group("d2")), today, match.group("y"))
+        d1 = int(match.group("d1"))
+        if check_out:
+            # Check-in no mesmo mês (ou no anterior, se o dia for maior: "28 a 2/1")
+            check_in = _safe_date(check_out.year, month, d1) if d1 < check_out.day else None
+            if check_in is None and d1 > check_out.day:
+                previous = check_out.replace(day=1) - timedelta(days=1)
+                check_in = _safe_date(previous.year, previous.month, d1)
+                if check_in and (check_out - check_in).days > _MAX_CROSS_MONTH_NIGHTS:
+                    check_in = None
+            result = _result(check_in, check_out, match.group(0), today)
+            if result:
+                return result
+
+    dates = [(m, _date_from_match(m, today)) for m in _DATE_RE.finditer(normalized)]
+    dates = [(m, d) for m, d in dates if d]
+
+    # Duas datas ligadas: "20 de dezembro a 3 de janeiro", "15/12 até 20/12"
+    for (first, check_in), (second, check_out) in zip(dates, dates[1:]):
+        if _CONNECTOR_RE.match(normalized[first.end():second.start()]):
+            if check_out <= check_in and second.group("wd"):
+                # "sexta a domingo" num domingo: o domingo é o depois da sexta, não hoje
+                check_out += timedelta(days=7 * ((check_in - check_out).days // 7 + 1))
+            elif check_out <= check_in and not (second.group("iso") or second.group("num_y") or second.group("txt_y")):
+                check_out = _safe_date(check_out.year + 1, check_out.month, check_out.day)
+            result = _result(check_in, check_out, normalized[first.start():second.end()], today)
+            if result:
+                return result
+
+    nights = _nights(normalized)
+
+    # "3 noites a partir de sexta", "chego amanhã, 2 diárias"
+    if nights and dates:
+        first, check_in = dates[0]
+        result = _result(check_in, check_in + timedelta(days=nights), first.group(0), today)
+        if result:
+            return result
+
+    # "fim de semana": sexta a domingo; na sexta/sábado, "próximo" pula para a semana seguinte
+    match = _WEEKEND_RE.search(normalized)
+    if match:
+        friday = today + timedelta(days=(4 - today.weekday()) % 7)
+        if today.weekday() == 5:
+            friday = today + timedelta(days=6)
+        if (match.group("next") or match.group("after")) and today.weekday() == 4:
+            friday += timedelta(days=7)
+        check_in = today if today.weekday() == 5 and not (match.group("next") or match.group("after")) else friday
+        sunday = friday + timedelta(days=2) if check_in == friday else today + timedelta(days=1)
+        return _result(check_in, check_in + timedelta(days=nights) if nights else sunday, match.group(0), today, "weekend")
+
+    # Feriados: "carnaval", "réveillon", "páscoa"...
+    match = _HOLIDAY_RE.search(normalized)
+    if match:
+        period = _upcoming_holiday(match.group(1), today)
+        if period:
+            check_in, check_out = period
+            if nights:
+                check_out = check_in + timedelta(days=nights)
+            return _result(max(check_in, today), check_out, match.group(0), today, "holiday")
+
+    return None
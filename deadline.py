@@ -0,0 +1,124 @@
+# deadline.py
+
+import os
+import time
+from contextvars import ContextVar
+
+from app_logging import get_logger
+from metrics import Counter
+
+# ==============================================================================
+#  PRAZO DA REQUISIÇÃO
+#  Uma resposta no WhatsApp só serve se chegar em poucos segundos. Cada
+#  requisição recebe um prazo (header x-deadline-ms ou REQUEST_DEADLINE_MS) e
+#  toda chamada externa (Gateway, embedding, Gemini, fila do limitador) usa como
+#  timeout o menor entre o seu próprio e o que resta do prazo. Com pouco tempo
+#  sobrando, as etapas se adaptam em vez de estourar o timeout do Gateway depois
+#  de todo o trabalho feito:
+#    - menos de DEADLINE_SKIP_RAG_MS: responde sem a busca nos documentos;
+#    - menos de DEADLINE_FAST_MODEL_MS: usa GEMINI_FAST_MODEL (sem o cache de contexto);
+#    - menos de DEADLINE_SKIP_SECOND_CALL_MS: devolve o texto das ferramentas sem
+#      a segunda chamada ao modelo.
+#
+#  O prazo fica num ContextVar e acompanha a requisição pelas threads do FastAPI.
+#  Fora de uma requisição (filas em segundo plano) não há prazo: as tarefas que
+#  copiam o contexto da requisição (para o ID de correlação e o trace) chamam
+#  clear_deadline() ao começar.
+# ==============================================================================
+
+logger = get_logger("deadline")
+
+# Prazo padrão de cada mensagem (ms)
+REQUEST_DEADLINE_MS = int(os.getenv("REQUEST_DEADLINE_MS", "25000"))
+# Prazo máximo aceito no header x-deadline-ms (ms)
+REQUEST_DEADLINE_MAX_MS = int(os.getenv("REQUEST_DEADLINE_MAX_MS", "120000"))
+# Tempo restante abaixo do qual a busca nos documentos (RAG) é pulada (ms)
+DEADLINE_SKIP_RAG_MS = int(os.getenv("DEADLINE_SKIP_RAG_MS", "10000"))
+# Tempo restante abaixo do qual as chamadas ao Gemini usam o modelo rápido (ms)
+DEADLINE_FAST_MODEL_MS = int(os.getenv("DEADLINE_FAST_MODEL_MS", "8000"))
+# Tempo restante abaixo do qual a segunda chamada ao Gemini é pulada (ms)
+DEADLINE_SKIP_SECOND_CALL_MS = int(os.getenv("DEADLINE_SKIP_SECOND_CALL_MS", "4000"))
+# Timeout mínimo de uma chamada, mesmo com o prazo esgotado (segundos)
+DEADLINE_MIN_TIMEOUT = float(os.getenv("DEADLINE_MIN_TIMEOUT", "0.5"))
+
+DEADLINE_DEGRADATIONS = Counter(
+    "deadline_degradations_total",
+    "Etapas simplificadas por falta de prazo (skip_rag, fast_model, skip_second_call).",
+    ["action"],
+)
+DEADLINE_EXHAUSTED = Counter(
+    "deadline_exhausted_total",
+    "Requisições que terminaram depois do prazo.",
+)
+
+# (instante monotônico do fim do prazo, prazo total em ms) da requisição atual
+_deadline: ContextVar[tuple] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(budget_ms=None) -> int:
+    """
+    Inicia o prazo da requisição atual com budget_ms (ou REQUEST_DEADLINE_MS).
+    Valores inválidos usam o padrão. Retorna o prazo usado, em ms.
+    """
+    try:
+        budget = int(budget_ms) if budget_ms not in (None, "") else REQUEST_DEADLINE_MS
+    except (TypeError, ValueError):
+        logger.warning("⚠️ [PRAZO] Prazo inválido '%s', usando %d ms", budget_ms, REQUEST_DEADLINE_MS)
+        budget = REQUEST_DEADLINE_MS
+    if budget <= 0:
+        budget = REQUEST_DEADLINE_MS
+    budget = min(budget, REQUEST_DEADLINE_MAX_MS)
+    _deadline.set((time.monotonic() + budget / 1000, budget))
+    return budget
+
+
+def restart_deadline() -> int:
+    """Reinicia o prazo com o mesmo total (ex: cada mensagem de um lote tem o seu)."""
+    current = _deadline.get()
+    return start_deadline(current[1] if current else None)
+
+
+def clear_deadline():
+    """Remove o prazo do contexto atual (trabalho em segundo plano, que não responde à requisição)."""
+    _deadline.set(None)
+
+
+def remaining():
+    """Segundos restantes do prazo (pode ser negativo) ou None fora de uma requisição."""
+    current = _deadline.get()
+    return None if current is None else current[0] - time.monotonic()
+
+
+def remaining_ms():
+    left = remaining()
+    return None if left is None else int(left * 1000)
+
+
+def timeout(default: float = None):
+    """
+    Timeout de uma chamada externa: o menor entre default e o que resta do prazo
+    (nunca abaixo de DEADLINE_MIN_TIMEOUT). Sem prazo, devolve default.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    left = max(left, DEADLINE_MIN_TIMEOUT)
+    return left if default is None else min(default, left)
+
+
+def should_degrade(action: str, threshold_ms: int) -> bool:
+    """True (e registra a métrica) se restar menos de threshold_ms do prazo."""
+    left = remaining_ms()
+    if left is None or left >= threshold_ms:
+        return False
+    DEADLINE_DEGRADATIONS.inc(action=action)
+    logger.warning("⏱️ [PRAZO] Restam %d ms: %s", left, action)
+    return True
+
+
+def record_outcome():
+    """Conta a requisição se ela terminou depois do prazo."""
+    left = remaining()
+    if left is not None and left < 0:
+        DEADLINE_EXHAUSTED.inc()
+        logger.warning("⏱️ [PRAZO] Requisição terminou %d ms depois do prazo", int(-left * 1000))
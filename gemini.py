@@ -18,6 +18,20 @@ import requests
 from datetime import datetime
 from redis import Redis
 import re
+import threading
+from app_logging import get_logger, lazy
+from metrics import stage_timer, record_token_usage, CACHE_REQUESTS, ERRORS, TOOL_LATENCY
+from tracing import span, traced, inject_trace_headers
+from rate_limiter import GEMINI_LIMITER, RateLimitTimeout, is_rate_limit_error
+from hedging import hedged_call
+from conversation_history import HISTORY_CONTEXT_MESSAGES
+from date_parser import has_stay_intent, parse_date, parse_date_range
+from room_index import room_index_for
+from circuit_breaker import AVAILABILITY_BREAKER, GATEWAY_TIMEOUT, CircuitOpenError
+from cachetools import LRUCache
+import time
+from deadline import DEADLINE_FAST_MODEL_MS, DEADLINE_SKIP_SECOND_CALL_MS, should_degrade
+from deadline import timeout as deadline_timeout
 
 load_dotenv() # Carrega as variáveis de ambiente definidas no arquivo .env para o ambiente atual.
 
@@ -25,10 +39,52 @@ load_dotenv() # Carrega as variáveis de ambiente definidas no arquivo .env para
 PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT')
 LOCATION = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
 
+logger = get_logger("gemini")
 
-# Cliente para API direta (mantido para compatibilidade)
-client = genai.Client(http_options=HttpOptions(api_version="v1"))
-redis_client = Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+
+# ==============================================================================
+#  CLIENTES (INICIALIZAÇÃO SOB DEMANDA)
+#  Nada de rede na importação: os clientes são criados no primeiro uso e
+#  aquecidos pelo lifespan da API (warm_up), sem atrasar a subida do worker.
+# ==============================================================================
+
+_client = None
+_redis_client = None
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente do Gemini (google-genai), criado no primeiro uso."""
+    global _client
+    if _client is None:
+        with _clients_lock:
+            if _client is None:
+                _client = genai.Client(http_options=HttpOptions(api_version="v1"))
+    return _client
+
+
+def get_redis_client():
+    """Cliente do Redis (com pool de conexões), criado no primeiro uso."""
+    global _redis_client
+    if _redis_client is None:
+        with _clients_lock:
+            if _redis_client is None:
+                _redis_client = Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+    return _redis_client
+
+# Última disponibilidade obtida de cada hotel/período, usada (marcada como
+# desatualizada) quando o Gateway de disponibilidade está fora
+AVAILABILITY_STALE_MAX_AGE = int(os.getenv("AVAILABILITY_STALE_MAX_AGE", "900"))
+_availability_snapshots = LRUCache(maxsize=500)
+
+# Modelo usado quando o prazo da requisição está acabando (ver deadline.py)
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+
+def _stale_notice(availability_data) -> str:
+    if not isinstance(availability_data, dict) or not availability_data.get("stale"):
+        return ""
+    return (f"⚠️ Sistema de disponibilidade fora do ar: dados de {availability_data.get('snapshot_age_minutes', 0)} min atrás, "
+            "podem estar desatualizados. Avise o hóspede e confirme antes de reservar.\n\n")
 
 # --- Definição das Ferramentas ---
 def verificar_disponibilidade_geral(check_in_date: str, check_out_date: str, hotel_id: str = None, lead_whatsapp_number: str = None) -> str:
@@ -44,7 +100,7 @@ def verificar_disponibilidade_geral(check_in_date: str, check_out_date: str, hot
     
     # Se as datas são válidas, proceder com a verificação real
     if hotel_id and lead_whatsapp_number:
-        print(f"🔍 [API] Chamando API de disponibilidade para {hotel_id}")
+        logger.debug("🔍 [API] Chamando API de disponibilidade para %s", hotel_id)
         availability_result = chamar_api_disponibilidade(hotel_id, check_in_date, check_out_date, lead_whatsapp_number)
         
         if "error" in availability_result:
@@ -79,10 +135,10 @@ def verificar_disponibilidade_geral(check_in_date: str, check_out_date: str, hot
             else:
                 return f"😔 Não há quartos cadastrados no hotel para o período de {check_in_date} a {check_out_date}."
         elif availability_result and "rooms" in availability_result:
-            # Fallback para formato antigo
+            # Fallback para formato antigo (e última disponibilidade conhecida)
             rooms = availability_result["rooms"]
             if rooms:
-                response = f"✅ Encontrei {len(rooms)} quarto(s) disponível(is) para {check_in_date} a {check_out_date}:\n\n"
+                response = _stale_notice(availability_result) + f"✅ Encontrei {len(rooms)} quarto(s) disponível(is) para {check_in_date} a {check_out_date}:\n\n"
                 for room in rooms:
                     response += f"🏨 **{room.get('name', 'Quarto')}**\n"
                     response += f"   - Preço: R$ {room.get('dailyRate', 0):.2f} por noite\n"
@@ -130,7 +186,7 @@ def extrair_informacoes_reserva(room_name: str, check_in_date: str, check_out_da
         # Salvar na sessão Redis
         save_session(lead_whatsapp_number, session_data)
         
-        print(f"💾 [REDIS] Informações salvas na sessão: {session_data}")
+        logger.debug("💾 [REDIS] Informações salvas na sessão: %s", session_data)
         
         # Calcular preço total se possível
         total_price = None
@@ -145,7 +201,7 @@ def extrair_informacoes_reserva(room_name: str, check_in_date: str, check_out_da
             return f"✅ **Perfeito! Quarto selecionado com sucesso!**\n\n📋 **Resumo da Reserva:**\n🏨 Quarto: {room_name}\n📅 Check-in: {check_in_date}\n📅 Check-out: {check_out_date}\n\n**Para finalizar a reserva, me informe seu nome completo e e-mail.**"
             
     except Exception as e:
-        print(f"❌ [ERRO] Erro ao extrair informações: {e}")
+        logger.error("❌ [ERRO] Erro ao extrair informações: %s", e)
         return f"❌ Erro ao processar informações da reserva. Tente novamente."
 
 def criar_agendamento_e_gerar_pagamento(hotel_id: str, lead_whatsapp_number: str, check_in_date: str, check_out_date: str, room_type_id: str, customer_name: str, customer_email: str) -> str:
@@ -173,13 +229,10 @@ def criar_agendamento_e_gerar_pagamento(hotel_id: str, lead_whatsapp_number: str
         if not total_price:
             return "❌ Não foi possível calcular o preço total. Verifique se as informações de disponibilidade estão corretas."
         
-        print(f"🔍 [AGENDAMENTO] Criando reserva para {customer_name} ({customer_email})")
-        print(f"   - Hotel: {hotel_id}")
-        print(f"   - Quarto: {room_type_id}")
-        print(f"   - Datas: {check_in_date} a {check_out_date}")
-        print(f"   - Preço: R$ {total_price:.2f}")
-        print(f"🔍 [DEBUG] session_data keys: {list(session_data.keys())}")
-        print(f"🔍 [DEBUG] availability structure: {type(session_data.get('availability', 'Not found'))}")
+        logger.info("🔍 [AGENDAMENTO] Criando reserva para %s (%s) - Hotel: %s, Quarto: %s, Datas: %s a %s, Preço: R$ %.2f",
+                    customer_name, customer_email, hotel_id, room_type_id, check_in_date, check_out_date, total_price)
+        logger.debug("🔍 [DEBUG] session_data keys: %s", list(session_data.keys()))
+        logger.debug("🔍 [DEBUG] availability structure: %s", type(session_data.get('availability', 'Not found')))
         
         # Chamar API de agendamento
         booking_result = chamar_api_agendamento(
@@ -193,7 +246,7 @@ def criar_agendamento_e_gerar_pagamento(hotel_id: str, lead_whatsapp_number: str
         
         # Verificar se booking_result é um dicionário válido
         if not isinstance(booking_result, dict):
-            print(f"❌ [ERRO] booking_result não é um dicionário: {type(booking_result)} - {booking_result}")
+            logger.error("❌ [ERRO] booking_result não é um dicionário: %s - %s", type(booking_result), booking_result)
             return f"❌ Erro ao criar agendamento: Resposta inválida do servidor."
         
         if "error" in booking_result:
@@ -236,7 +289,7 @@ def criar_agendamento_e_gerar_pagamento(hotel_id: str, lead_whatsapp_number: str
         return response
         
     except Exception as e:
-        print(f"❌ [ERRO] Erro ao criar agendamento: {e}")
+        logger.error("❌ [ERRO] Erro ao criar agendamento: %s", e)
         return f"❌ Erro ao criar agendamento. Tente novamente ou chame um atendente."
 
 def extrair_dados_pessoais(customer_name: str, customer_email: str, hotel_id: str = None, lead_whatsapp_number: str = None) -> str:
@@ -264,7 +317,7 @@ def extrair_dados_pessoais(customer_name: str, customer_email: str, hotel_id: st
         # Salvar na sessão Redis
         save_session(lead_whatsapp_number, session_data)
         
-        print(f"💾 [REDIS] Dados pessoais salvos na sessão: {customer_name}, {customer_email}")
+        logger.debug("💾 [REDIS] Dados pessoais salvos na sessão: %s, %s", customer_name, customer_email)
         
         # Verificar se já temos todos os dados necessários para criar o agendamento
         required_fields = ["room_id", "check_in_date", "check_out_date", "customer_name", "customer_email"]
@@ -272,7 +325,7 @@ def extrair_dados_pessoais(customer_name: str, customer_email: str, hotel_id: st
         
         if not missing_fields:
             # Todos os dados estão disponíveis, criar agendamento automaticamente
-            print("🎯 [AUTO-AGENDAMENTO] Todos os dados disponíveis, criando agendamento...")
+            logger.info("🎯 [AUTO-AGENDAMENTO] Todos os dados disponíveis, criando agendamento...")
             
             # Chamar função de agendamento
             booking_result = criar_agendamento_e_gerar_pagamento(
@@ -290,7 +343,7 @@ def extrair_dados_pessoais(customer_name: str, customer_email: str, hotel_id: st
             return f"✅ Dados pessoais salvos com sucesso!\n\n📋 **Resumo:**\n👤 Nome: {customer_name}\n📧 Email: {customer_email}\n\nAgora vou processar sua reserva..."
             
     except Exception as e:
-        print(f"❌ [ERRO] Erro ao extrair dados pessoais: {e}")
+        logger.error("❌ [ERRO] Erro ao extrair dados pessoais: %s", e)
         return f"❌ Erro ao processar dados pessoais. Tente novamente."
 
 def chamar_atendente_humano_tool(hotel_id: str, lead_whatsapp_number: str):
@@ -307,7 +360,7 @@ def chamar_atendente_humano_tool(hotel_id: str, lead_whatsapp_number: str):
         })
         save_session(lead_whatsapp_number, session_data)
         
-        print(f"👤 [ATENDENTE HUMANO] Chamando atendente para hotel {hotel_id} e lead {lead_whatsapp_number}")
+        logger.info("👤 [ATENDENTE HUMANO] Chamando atendente para hotel %s e lead %s", hotel_id, lead_whatsapp_number)
         
         # Aqui você pode adicionar lógica para notificar o atendente humano
         # Por exemplo, enviar uma notificação, criar um ticket, etc.
@@ -315,7 +368,7 @@ def chamar_atendente_humano_tool(hotel_id: str, lead_whatsapp_number: str):
         return "👋 Um de nossos atendentes humanos foi notificado e entrará em contato com você em breve. Por favor, aguarde o contato direto. Obrigado!"
         
     except Exception as e:
-        print(f"❌ [ERRO] Erro ao chamar atendente humano: {e}")
+        logger.error("❌ [ERRO] Erro ao chamar atendente humano: %s", e)
         return "❌ Erro ao chamar atendente. Tente novamente mais tarde."
 
 
@@ -517,57 +570,70 @@ function_declarations = [
         }
     )
 ]
+@traced("gemini_cache_create")
 def create_cache():
     """Cria um novo cache para o Gemini"""
     try:
-        return client.caches.create(
-            model="gemini-2.5-flash",
-            config=CreateCachedContentConfig(
-                system_instruction=system_instruction,
-                tools=[Tool(function_declarations=function_declarations)],
-                ttl="86400s",
-                display_name="bot-de-reservas",
-            ),
-        )
+        with stage_timer("gemini_cache_create"):
+            return GEMINI_LIMITER.call(get_client().caches.create, 
+                model="gemini-2.5-flash",
+                config=CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    tools=[Tool(function_declarations=function_declarations)],
+                    ttl="86400s",
+                    display_name="bot-de-reservas",
+                ),
+            )
     except Exception as e:
-        print(f"❌ [ERRO] Erro ao criar cache: {e}")
+        logger.error("❌ [ERRO] Erro ao criar cache: %s", e)
         return None
 
 def is_cache_valid():
     """Verifica se o cache atual é válido"""
     global cache
     if not cache:
-        print("⚠️ [CACHE] Cache não existe")
+        logger.warning("⚠️ [CACHE] Cache não existe")
         return False
     try:
         # Verificar se o cache tem o atributo name (que indica que é válido)
         _ = cache.name
-        print("✅ [CACHE] Cache válido")
+        logger.debug("✅ [CACHE] Cache válido")
         return True
     except Exception as e:
-        print(f"⚠️ [CACHE] Cache inválido: {e}")
+        logger.warning("⚠️ [CACHE] Cache inválido: %s", e)
         return False
 
 def handle_cache_expiration():
     """Lida com expiração do cache recriando-o"""
     global cache
-    print("🔄 [CACHE] Recriando cache...")
+    logger.info("🔄 [CACHE] Recriando cache...")
     try:
         # Criar novo cache
         new_cache = create_cache()
         if new_cache:
             cache = new_cache
-            print(f"✅ [CACHE] Cache recriado com sucesso! Nome: {cache.name}")
+            logger.info("✅ [CACHE] Cache recriado com sucesso! Nome: %s", cache.name)
             return True
         else:
-            print("❌ [CACHE] Falha ao recriar cache!")
+            logger.error("❌ [CACHE] Falha ao recriar cache!")
             return False
     except Exception as e:
-        print(f"❌ [CACHE] Erro ao recriar cache: {e}")
+        logger.error("❌ [CACHE] Erro ao recriar cache: %s", e)
         return False
 
-# Criar cache inicial
-cache = create_cache()
+# Cache de contexto atual (criado sob demanda por ensure_cache)
+cache = None
+_cache_lock = threading.Lock()
+
+
+def ensure_cache() -> bool:
+    """Cria o cache de contexto se ainda não existir. Retorna True se houver cache."""
+    if cache:
+        return True
+    with _cache_lock:
+        if cache:
+            return True
+        return handle_cache_expiration()
 
 
 # Mapear nomes das funções para as implementações
@@ -580,57 +646,84 @@ function_implementations = {
 }
 
 
-# Testar conexão com Redis
-try:
-    redis_client.ping()
-    print("✅ Redis conectado com sucesso!")
-    print(f"🔍 REDIS_URL: {os.getenv('REDIS_URL')}")
-except Exception as e:
-    print(f"❌ Erro ao conectar com Redis: {e}")
-    print(f"🔍 REDIS_URL: {os.getenv('REDIS_URL')}")
-    print("💡 Verifique se o Redis está rodando e a URL está correta!")
+def warm_up() -> dict:
+    """
+    Aquece as dependências do worker: cliente do Gemini, conexão com o Redis e
+    cache de contexto. Falhas são registradas e não impedem o worker de atender;
+    o recurso é criado de novo no primeiro uso.
+    """
+    status = {}
+    try:
+        get_client()
+        status["gemini_client"] = True
+    except Exception as e:
+        logger.error("❌ Erro ao criar o cliente do Gemini: %s", e)
+        status["gemini_client"] = False
+    try:
+        get_redis_client().ping()
+        logger.info("✅ Redis conectado com sucesso!")
+        status["redis"] = True
+    except Exception as e:
+        logger.error("❌ Erro ao conectar com Redis: %s", e)
+        logger.debug("🔍 REDIS_URL: %s", os.getenv('REDIS_URL'))
+        logger.info("💡 Verifique se o Redis está rodando e a URL está correta!")
+        status["redis"] = False
+    status["gemini_cache"] = status["gemini_client"] and ensure_cache()
+    # SDK de embeddings: importado sob demanda, carregado aqui para não pesar na 1ª pergunta
+    try:
+        import google.generativeai  # noqa: F401
+    except Exception as e:
+        logger.error("❌ Erro ao carregar o SDK de embeddings: %s", e)
+    return status
 
 
 
+@traced("redis_session_save")
 def save_session(whatsapp_number: str, data: dict):
     key = f"session:{whatsapp_number}"
-    print(f"💾 [REDIS SAVE] Salvando sessão para {whatsapp_number}: {json.dumps(data, indent=2)}")
+    logger.debug("💾 [REDIS SAVE] Salvando sessão para %s: %s", whatsapp_number, lazy(json.dumps, data, indent=2))
     try:
-        redis_client.set(key, json.dumps(data), ex=3600)  # expira em 1h
-        print(f"✅ [REDIS SAVE] Sessão salva com sucesso!")
+        with stage_timer("redis_session_save"):
+            get_redis_client().set(key, json.dumps(data), ex=3600)  # expira em 1h
+        logger.debug("✅ [REDIS SAVE] Sessão salva com sucesso!")
     except Exception as e:
-        print(f"❌ [REDIS SAVE] Erro ao salvar: {e}")
+        logger.error("❌ [REDIS SAVE] Erro ao salvar: %s", e)
 
+@traced("redis_session_get")
 def get_session(whatsapp_number: str):
     key = f"session:{whatsapp_number}"
-    print(f"🔍 [REDIS GET] Buscando sessão para {whatsapp_number}")
+    logger.debug("🔍 [REDIS GET] Buscando sessão para %s", whatsapp_number)
     try:
-        session = redis_client.get(key)
+        with stage_timer("redis_session_get"):
+            session = get_redis_client().get(key)
         if session:
-            print(f"✅ [REDIS GET] Sessão encontrada: {session}")
+            logger.debug("✅ [REDIS GET] Sessão encontrada: %s", session)
             return json.loads(session)
         else:
-            print(f"⚠️ [REDIS GET] Nenhuma sessão encontrada para {whatsapp_number}")
+            logger.debug("⚠️ [REDIS GET] Nenhuma sessão encontrada para %s", whatsapp_number)
             return None
     except Exception as e:
-        print(f"❌ [REDIS GET] Erro ao buscar sessão: {e}")
+        logger.error("❌ [REDIS GET] Erro ao buscar sessão: %s", e)
         return None
 
+@traced("redis_session_update")
 def update_session(whatsapp_number: str, new_data: dict):
-    print(f"🔄 [REDIS UPDATE] Atualizando sessão para {whatsapp_number} com: {json.dumps(new_data, indent=2)}")
+    logger.debug("🔄 [REDIS UPDATE] Atualizando sessão para %s com: %s", whatsapp_number, lazy(json.dumps, new_data, indent=2))
     session = get_session(whatsapp_number) or {}
     session.update(new_data)
     save_session(whatsapp_number, session)
     return session
 
+@traced("redis_session_clear")
 def clear_session(whatsapp_number: str):
     key = f"session:{whatsapp_number}"
-    print(f"🗑️ [REDIS CLEAR] Limpando sessão para {whatsapp_number}")
+    logger.debug("🗑️ [REDIS CLEAR] Limpando sessão para %s", whatsapp_number)
     try:
-        redis_client.delete(key)
-        print(f"✅ [REDIS CLEAR] Sessão limpa com sucesso!")
+        with stage_timer("redis_session_clear"):
+            get_redis_client().delete(key)
+        logger.debug("✅ [REDIS CLEAR] Sessão limpa com sucesso!")
     except Exception as e:
-        print(f"❌ [REDIS CLEAR] Erro ao limpar: {e}")
+        logger.error("❌ [REDIS CLEAR] Erro ao limpar: %s", e)
 
 def check_booking_requirements(session_data: dict) -> dict:
     """
@@ -657,15 +750,15 @@ def reactivate_bot(whatsapp_number: str):
     Reativa o bot removendo a flag de atendente humano ativo
     """
     key = f"session:{whatsapp_number}"
-    print(f"🔄 [REATIVAR BOT] Reativando bot para {whatsapp_number}")
+    logger.info("🔄 [REATIVAR BOT] Reativando bot para %s", whatsapp_number)
     try:
         session_data = get_session(whatsapp_number) or {}
         session_data.pop("human_agent_called", None)
         session_data.pop("agent_called_at", None)
         save_session(whatsapp_number, session_data)
-        print(f"✅ [REATIVAR BOT] Bot reativado com sucesso!")
+        logger.info("✅ [REATIVAR BOT] Bot reativado com sucesso!")
     except Exception as e:
-        print(f"❌ [REATIVAR BOT] Erro ao reativar: {e}")
+        logger.error("❌ [REATIVAR BOT] Erro ao reativar: %s", e)
 
 
 def detectar_confirmacao_reserva(user_message: str) -> bool:
@@ -707,49 +800,60 @@ def detectar_confirmacao_reserva(user_message: str) -> bool:
 def convert_date_to_iso(date_str: str) -> str:
     """
     Converte datas em português para formato ISO (YYYY-MM-DD)
-    Exemplos: "20 de dezembro" -> "2024-12-20", "25 de janeiro" -> "2025-01-25"
+    Exemplos: "20 de dezembro" -> "2024-12-20", "20/12" -> "2024-12-20", "amanhã", "sexta"
+    Regras pré-compiladas em date_parser; datas já em ISO passam direto.
     """
     try:
-        # Mapear meses em português
-        months_map = {
-            'janeiro': '01', 'fevereiro': '02', 'março': '03', 'abril': '04',
-            'maio': '05', 'junho': '06', 'julho': '07', 'agosto': '08',
-            'setembro': '09', 'outubro': '10', 'novembro': '11', 'dezembro': '12'
-        }
-        
-        # Extrair dia e mês
-        match = re.search(r'(\d+)\s+de\s+(\w+)', date_str.lower())
-        if not match:
-            print(f"❌ [CONVERSÃO DATA] Formato inválido: {date_str}")
-            return date_str
-        
-        day = match.group(1).zfill(2)
-        month_name = match.group(2)
-        
-        if month_name not in months_map:
-            print(f"❌ [CONVERSÃO DATA] Mês inválido: {month_name}")
+        parsed = parse_date(date_str)
+        if not parsed:
+            logger.debug("❌ [CONVERSÃO DATA] Formato inválido: %s", date_str)
             return date_str
-        
-        month = months_map[month_name]
-        current_year = datetime.now().year
-        current_month = datetime.now().month
-        current_day = datetime.now().day
-        
-        # Se o mês já passou este ano, usar próximo ano
-        if int(month) < current_month:
-            current_year += 1
-        # Se é o mesmo mês mas o dia já passou, usar próximo ano
-        elif int(month) == current_month and int(day) < current_day:
-            current_year += 1
-        
-        iso_date = f"{current_year}-{month}-{day}"
-        print(f"✅ [CONVERSÃO DATA] {date_str} -> {iso_date}")
+        iso_date = parsed.isoformat()
+        logger.debug("✅ [CONVERSÃO DATA] %s -> %s", date_str, iso_date)
         return iso_date
         
     except Exception as e:
-        print(f"❌ [CONVERSÃO DATA] Erro ao converter {date_str}: {e}")
+        logger.error("❌ [CONVERSÃO DATA] Erro ao converter %s: %s", date_str, e)
         return date_str
 
+def stay_dates_from_message(message: str, session_data: dict):
+    """
+    Período da mensagem que vale como datas da estadia, ou None. "O restaurante
+    abre no fim de semana?" ou "fazem festa de ano novo?" citam datas sem pedir
+    hospedagem: períodos deduzidos (fim de semana, feriados) só valem com intenção
+    de hospedagem na mensagem, e datas explícitas também valem enquanto a sessão
+    não tem datas. Só as datas explícitas vão para a sessão; os períodos deduzidos
+    são uma sugestão para o modelo confirmar com o hóspede.
+    """
+    parsed_dates = parse_date_range(message)
+    if not parsed_dates:
+        return None
+    if has_stay_intent(message):
+        return parsed_dates
+    has_session_dates = session_data.get("check_in_date") or session_data.get("check_out_date")
+    if parsed_dates["kind"] == "dates" and not has_session_dates:
+        return parsed_dates
+    logger.debug("📅 [DATAS] \"%s\" ignorado: mensagem sem intenção de hospedagem", parsed_dates["expression"])
+    return None
+
+def apply_parsed_dates(whatsapp_number: str, session_data: dict, parsed_dates: dict) -> dict:
+    """
+    Grava na sessão o período interpretado da mensagem. Se as datas mudaram, a
+    disponibilidade e o preço calculados para as datas antigas deixam de valer.
+    """
+    new_data = {"check_in_date": parsed_dates["check_in"], "check_out_date": parsed_dates["check_out"]}
+    if all(session_data.get(k) == v for k, v in new_data.items()):
+        return session_data
+    logger.info("📅 [DATAS] \"%s\" interpretado como %s a %s",
+                parsed_dates["expression"], parsed_dates["check_in"], parsed_dates["check_out"])
+    session = dict(session_data)
+    if session.get("check_in_date") or session.get("check_out_date"):
+        for stale in ("availability", "total_price"):
+            session.pop(stale, None)
+    session.update(new_data)
+    save_session(whatsapp_number, session)
+    return session
+
 def validar_datas_reserva(check_in_date: str, check_out_date: str) -> dict:
     """
     Valida se as datas de reserva são válidas e futuras.
@@ -757,14 +861,14 @@ def validar_datas_reserva(check_in_date: str, check_out_date: str) -> dict:
     """
     from datetime import datetime, date
     
-    print(f"🔍 [VALIDAÇÃO] Validando datas: {check_in_date} e {check_out_date}")
+    logger.debug("🔍 [VALIDAÇÃO] Validando datas: %s e %s", check_in_date, check_out_date)
     
     try:
         # Converter strings de data para objetos datetime
         check_in = datetime.strptime(check_in_date, "%Y-%m-%d").date()
         check_out = datetime.strptime(check_out_date, "%Y-%m-%d").date()
         today = date.today()
-        print(f"✅ [VALIDAÇÃO] Datas convertidas com sucesso: {check_in} e {check_out}")
+        logger.debug("✅ [VALIDAÇÃO] Datas convertidas com sucesso: %s e %s", check_in, check_out)
         
         # Verificar se check-out é anterior ao check-in
         if check_out <= check_in:
@@ -809,39 +913,59 @@ def validar_datas_reserva(check_in_date: str, check_out_date: str) -> dict:
             "error": f"Erro ao validar datas: {str(e)}"
         }
 
+@traced()
 def chamar_api_disponibilidade(hotel_id: str, check_in_date: str, check_out_date: str, lead_whatsapp_number:str):
     
     # Validar datas antes de fazer a chamada da API
     validation_result = validar_datas_reserva(check_in_date, check_out_date)
     
     if not validation_result["valid"]:
-        print(f"⚠️ [VALIDAÇÃO] {validation_result.get('error', validation_result.get('message', 'Erro de validação'))}")
+        logger.warning("⚠️ [VALIDAÇÃO] %s", validation_result.get('error', validation_result.get('message', 'Erro de validação')))
         return {"error": validation_result.get('error', validation_result.get('message', 'Erro de validação'))}
     
-    print(f"✅ [VALIDAÇÃO] {validation_result['message']}")
+    logger.debug("✅ [VALIDAÇÃO] %s", validation_result['message'])
     
     backend_url = os.getenv("BACKEND_URL")
     api_url = f"{backend_url}/bookings/{hotel_id}/availability-report"
     backend_api_secret = os.getenv("API_SECRET_KEY")
-    headers = {"x-api-key": backend_api_secret}
+    headers = inject_trace_headers({"x-api-key": backend_api_secret})
     
     # As datas já estão no formato ISO correto, não precisam ser convertidas novamente
     body = {"checkIn": check_in_date, "checkOut": check_out_date, "leadWhatsappNumber": lead_whatsapp_number}
-    print(f"🔍 [DEBUG DISPONIBILIDADE] Body: {body}")
-    try:
-        response = requests.get(api_url, json=body, headers=headers)
-        print(f"🔍 [DEBUG DISPONIBILIDADE] Response: {response.json()}")
+    logger.debug("🔍 [DEBUG DISPONIBILIDADE] Body: %s", body)
+    snapshot_key = (hotel_id, check_in_date, check_out_date)
+
+    def fetch():
+        response = requests.get(api_url, json=body, headers=headers, timeout=deadline_timeout(GATEWAY_TIMEOUT))
+        logger.debug("🔍 [DEBUG DISPONIBILIDADE] Response: %s", lazy(response.json))
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao chamar API de disponibilidade: {e}")
+
+    try:
+        result = AVAILABILITY_BREAKER.call(fetch)
+        if isinstance(result, list):
+            _availability_snapshots[snapshot_key] = (time.time(), result)
+        return result
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        logger.error("Erro ao chamar API de disponibilidade: %s", e)
+        snapshot = _availability_snapshots.get(snapshot_key)
+        if snapshot and time.time() - snapshot[0] <= AVAILABILITY_STALE_MAX_AGE:
+            logger.warning("⚠️ [DISPONIBILIDADE] Usando a última disponibilidade conhecida de %s (%s a %s)", hotel_id, check_in_date, check_out_date)
+            return {
+                "rooms": snapshot[1],
+                "checkIn": check_in_date,
+                "checkOut": check_out_date,
+                "stale": True,
+                "snapshot_age_minutes": int((time.time() - snapshot[0]) // 60),
+            }
         return {"error": "Falha ao verificar disponibilidade no sistema."}
 
+@traced()
 def chamar_api_agendamento(hotel_id: str, lead_whatsapp_number: str, room_type_id: int, check_in_date: str, check_out_date: str, total_price: float, customer_email: str, customer_name: str):
     backend_url = os.getenv("BACKEND_URL")
     api_url = f"{backend_url}/bookings/create"
     backend_api_secret = os.getenv("API_SECRET_KEY")
-    headers = {"x-api-key": backend_api_secret}
+    headers = inject_trace_headers({"x-api-key": backend_api_secret})
     
     # As datas já estão no formato ISO correto, não precisam ser convertidas novamente
     body = {
@@ -857,8 +981,8 @@ def chamar_api_agendamento(hotel_id: str, lead_whatsapp_number: str, room_type_i
 
     try:
         response = requests.post(api_url, headers=headers, json=body)
-        print(f"🔍 [DEBUG AGENDAMENTO] Status Code: {response.status_code}")
-        print(f"🔍 [DEBUG AGENDAMENTO] Response Text: {response.text}")
+        logger.debug("🔍 [DEBUG AGENDAMENTO] Status Code: %s", response.status_code)
+        logger.debug("🔍 [DEBUG AGENDAMENTO] Response Text: %s", response.text)
         
         # Tratar erro 500 especificamente
         if response.status_code == 500:
@@ -866,10 +990,10 @@ def chamar_api_agendamento(hotel_id: str, lead_whatsapp_number: str, room_type_i
                 error_data = response.json()
                 if "message" in error_data:
                     if "INDISPONIBILIDADE" in error_data["message"]:
-                        print(f"⚠️ [INDISPONIBILIDADE] {error_data['message']}")
+                        logger.warning("⚠️ [INDISPONIBILIDADE] %s", error_data['message'])
                         return {"error": "indisponibilidade", "message": error_data["message"]}
                     else:
-                        print(f"❌ [ERRO 500] {error_data['message']}")
+                        logger.error("❌ [ERRO 500] %s", error_data['message'])
                         return {"error": "server_error", "message": error_data["message"]}
                 else:
                     return {"error": "server_error", "message": "Erro interno do servidor"}
@@ -881,16 +1005,17 @@ def chamar_api_agendamento(hotel_id: str, lead_whatsapp_number: str, room_type_i
         # Verificar se a resposta é JSON válido
         try:
             json_response = response.json()
-            print(f"🔍 [DEBUG AGENDAMENTO] JSON Response: {json_response}")
+            logger.debug("🔍 [DEBUG AGENDAMENTO] JSON Response: %s", json_response)
             return json_response
         except ValueError as json_error:
-            print(f"❌ [DEBUG AGENDAMENTO] Erro ao parsear JSON: {json_error}")
+            logger.error("❌ [DEBUG AGENDAMENTO] Erro ao parsear JSON: %s", json_error)
             return {"error": f"Resposta inválida do servidor: {response.text}"}
             
     except requests.exceptions.RequestException as e:
-        print(f"❌ [DEBUG AGENDAMENTO] Erro na requisição: {e}")
+        logger.error("❌ [DEBUG AGENDAMENTO] Erro na requisição: %s", e)
         return {"error": "Falha ao criar agendamento no sistema."}
 
+@traced()
 def chamar_api_cancelar_agendamento(booking_id: str):
     """
     Chama a API para cancelar um agendamento pelo ID
@@ -898,55 +1023,51 @@ def chamar_api_cancelar_agendamento(booking_id: str):
     backend_url = os.getenv("BACKEND_URL")
     api_url = f"{backend_url}/bookings/cancel/{booking_id}"
     backend_api_secret = os.getenv("API_SECRET_KEY")
-    headers = {"x-api-key": backend_api_secret}
+    headers = inject_trace_headers({"x-api-key": backend_api_secret})
 
     try:
-        print(f"🗑️ [API] Cancelando agendamento ID: {booking_id}")
+        logger.info("🗑️ [API] Cancelando agendamento ID: %s", booking_id)
         response = requests.delete(api_url, headers=headers)
-        print(f"🔍 [DEBUG CANCELAMENTO] Response: {response.json()}")
+        logger.debug("🔍 [DEBUG CANCELAMENTO] Response: %s", lazy(response.json))
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"❌ [API] Erro ao cancelar agendamento: {e}")
+        logger.error("❌ [API] Erro ao cancelar agendamento: %s", e)
         return {"error": "Falha ao cancelar agendamento no sistema."}
 
+@traced()
 def chamar_atendente_humano(hotel_id: str, lead_whatsapp_number: str):
     backend_url = os.getenv("BACKEND_URL")
     api_url = f"{backend_url}/bookings/call-human-agent"
     backend_api_secret = os.getenv("API_SECRET_KEY")
-    headers = {"x-api-key": backend_api_secret}
+    headers = inject_trace_headers({"x-api-key": backend_api_secret})
     body = {"hotel_id": hotel_id, "lead_whatsapp_number": lead_whatsapp_number}
 
     response = requests.post(api_url, headers=headers, json=body)
-    print(f"🔍 [DEBUG ATENDENTE HUMANO] Response: {response.json()}")
+    logger.debug("🔍 [DEBUG ATENDENTE HUMANO] Response: %s", lazy(response.json))
     response.raise_for_status()
     return response.json()
 
 def get_room_id_from_name(availability_report: list, room_name_mentioned: str) -> int | None:
+    """
+    ID do quarto citado, tolerando acentos, plural, erros de digitação e frases
+    ("quero a suite master"). Usa o índice de room_index, montado uma vez por lista de quartos.
+    """
     if not availability_report or not room_name_mentioned: 
         return None
     
-    search_name = room_name_mentioned.lower().strip()
-    print(f"🔍 [BUSCA QUARTO] Procurando por: '{search_name}'")
-    
-    for room in availability_report:
-        room_name = room.get("name", "").lower()
-        room_id = room.get("id")
-        is_available = room.get("isAvailable", False)
-        
-        print(f"🔍 [BUSCA QUARTO] Verificando: '{room_name}' (ID: {room_id}, Disponível: {is_available})")
-        
-        if search_name in room_name:
-            if is_available:
-                print(f"✅ [BUSCA QUARTO] Encontrado e disponível: {room_name} (ID: {room_id})")
-                return room_id
-            else:
-                print(f"⚠️ [BUSCA QUARTO] Encontrado mas indisponível: {room_name} (ID: {room_id})")
-                # Retorna o ID mesmo se não estiver disponível, para mostrar erro específico
-                return room_id
-    
-    print(f"❌ [BUSCA QUARTO] Quarto não encontrado: '{search_name}'")
-    return None
+    match = room_index_for(availability_report).resolve(room_name_mentioned)
+    if not match:
+        logger.warning("❌ [BUSCA QUARTO] Quarto não encontrado: '%s'", room_name_mentioned)
+        return None
+
+    is_available = any(room.get("id") == match.room_id and room.get("isAvailable", False) for room in availability_report)
+    if is_available:
+        logger.debug("✅ [BUSCA QUARTO] '%s' -> %s (ID: %s, confiança %.2f)", room_name_mentioned, match.name, match.room_id, match.score)
+    else:
+        # Retorna o ID mesmo se não estiver disponível, para mostrar erro específico
+        logger.debug("⚠️ [BUSCA QUARTO] '%s' -> %s (ID: %s, confiança %.2f) indisponível", room_name_mentioned, match.name, match.room_id, match.score)
+    return match.room_id
 
 def calculate_total_price(check_in_date: str, check_out_date: str, room_id: int, availability_report: list) -> float | None:
     try:
@@ -955,7 +1076,7 @@ def calculate_total_price(check_in_date: str, check_out_date: str, room_id: int,
         num_nights = (end_date - start_date).days
 
         if num_nights <= 0:
-            print(f"❌ [CÁLCULO PREÇO] Número de noites inválido: {num_nights}")
+            logger.error("❌ [CÁLCULO PREÇO] Número de noites inválido: %s", num_nights)
             return None
 
         daily_rate = None
@@ -965,42 +1086,197 @@ def calculate_total_price(check_in_date: str, check_out_date: str, room_id: int,
                 daily_rate = room.get("dailyRate")
                 is_available = room.get("isAvailable", False)
                 room_found = True
-                print(f"🔍 [CÁLCULO PREÇO] Quarto encontrado: ID {room_id}, Diária: R$ {daily_rate}, Disponível: {is_available}")
+                logger.debug("🔍 [CÁLCULO PREÇO] Quarto encontrado: ID %s, Diária: R$ %s, Disponível: %s", room_id, daily_rate, is_available)
                 break
         
         if not room_found:
-            print(f"❌ [CÁLCULO PREÇO] Quarto ID {room_id} não encontrado no relatório")
+            logger.error("❌ [CÁLCULO PREÇO] Quarto ID %s não encontrado no relatório", room_id)
             return None
             
         if daily_rate is None:
-            print(f"❌ [CÁLCULO PREÇO] Diária não encontrada para quarto ID {room_id}")
+            logger.error("❌ [CÁLCULO PREÇO] Diária não encontrada para quarto ID %s", room_id)
             return None
 
         total_price = daily_rate * num_nights
-        print(f"💰 [CÁLCULO PREÇO] Total: R$ {daily_rate} × {num_nights} noites = R$ {total_price:.2f}")
+        logger.debug("💰 [CÁLCULO PREÇO] Total: R$ %s × %s noites = R$ %.2f", daily_rate, num_nights, total_price)
         return total_price
         
     except (ValueError, TypeError) as e:
-        print(f"❌ [CÁLCULO PREÇO] Erro ao calcular preço: {e}")
+        logger.error("❌ [CÁLCULO PREÇO] Erro ao calcular preço: %s", e)
         return None
 
-def generate_response_with_gemini(rag_context: str, user_question: str, chat_history: list = None, knowledge: dict = None, hotel_id: str = None, lead_whatsapp_number: str = None):
-    print(f"\n--- NOVA REQUISIÇÃO PARA {lead_whatsapp_number} ---")
-    print(f"🔍 [DEBUG] lead_whatsapp_number: {lead_whatsapp_number}")
-    print(f"🔍 [DEBUG] hotel_id: {hotel_id}")
+def _is_cache_error(error: Exception) -> bool:
+    error_str = str(error)
+    return "expired" in error_str or "INVALID_ARGUMENT" in error_str or "Cache content" in error_str
+
+
+def _generate_content(call_site: str, **kwargs):
+    """generate_content com limite de taxa e hedging (opcional): a geração não tem efeitos colaterais."""
+    return hedged_call(call_site, GEMINI_LIMITER.call, get_client().models.generate_content, **kwargs)
+
+
+def _model_config(**config) -> GenerateContentConfig:
+    """Config da chamada com o timeout limitado pelo que resta do prazo da requisição."""
+    request_timeout = deadline_timeout()
+    if request_timeout is not None:
+        config["http_options"] = HttpOptions(timeout=int(request_timeout * 1000))
+    return GenerateContentConfig(**config)
+
+
+def generate_with_cache(contents: list, stage: str):
+    """
+    Chama o Gemini usando o cache de contexto (system_instruction + ferramentas) quando
+    disponível. Se o cache tiver expirado, recria e tenta de novo; se não conseguir,
+    segue sem cache. Com o prazo da requisição acabando, usa GEMINI_FAST_MODEL.
+    O 'stage' identifica a chamada nas métricas (ex: gemini_call_1).
+    """
+    fast = should_degrade("fast_model", DEADLINE_FAST_MODEL_MS)
+    model = GEMINI_FAST_MODEL if fast else "gemini-2.5-flash"
+    with stage_timer(stage), span(stage, model=model) as current_span:
+        try:
+            if fast:
+                # O cache de contexto é do modelo principal: instruções e ferramentas vão na chamada
+                response = _generate_content(stage,
+                    model=GEMINI_FAST_MODEL,
+                    contents=contents,
+                    config=_model_config(
+                        system_instruction=system_instruction,
+                        tools=[Tool(function_declarations=function_declarations)],
+                    ),
+                )
+            elif cache and is_cache_valid():
+                logger.debug("🔄 [CACHE] Usando cache (%s): %s", stage, cache.name)
+                CACHE_REQUESTS.inc(cache="gemini_cached_content", result="hit")
+                response = _generate_content(stage, 
+                    model="gemini-2.5-flash",
+                    contents=contents,
+                    config=_model_config(
+                        cached_content=cache.name,  # ✅ usa cache diretamente
+                    ),
+                )
+            else:
+                logger.warning("⚠️ [CACHE] Usando modelo sem cache (%s)", stage)
+                CACHE_REQUESTS.inc(cache="gemini_cached_content", result="miss")
+                response = _generate_content(stage, 
+                    model="gemini-2.5-flash",
+                    contents=contents,
+                    config=_model_config(),
+                )
+        except Exception as e:
+            logger.error("❌ [ERRO] Erro na chamada %s: %s", stage, e)
+            if not _is_cache_error(e):
+                logger.error("❌ [ERRO] Erro não relacionado ao cache: %s", e)
+                raise e
+            logger.info("🔄 [CACHE EXPIRADO] Detectado erro de cache expirado: %s", e)
+            CACHE_REQUESTS.inc(cache="gemini_cached_content", result="expired")
+            if current_span is not None:
+                current_span.set_attribute("cache_recreated", True)
+            if handle_cache_expiration():
+                logger.info("🔄 [CACHE] Tentando novamente com o novo cache...")
+                response = _generate_content(stage, 
+                    model="gemini-2.5-flash",
+                    contents=contents,
+                    config=_model_config(
+                        cached_content=cache.name,  # ✅ usa cache diretamente
+                    ),
+                )
+                logger.info("✅ [CACHE] Sucesso com o novo cache!")
+            else:
+                # Se não conseguir recriar o cache, usar sem cache
+                logger.warning("⚠️ [CACHE] Usando modelo sem cache devido à falha na recriação")
+                response = _generate_content(stage, 
+                    model="gemini-2.5-flash",
+                    contents=contents,
+                    config=_model_config(),
+                )
+
+    # Monitorar o uso de tokens (Vertex AI)
+    usage_metadata = getattr(response, 'usage_metadata', None)
+    if usage_metadata:
+        record_token_usage(usage_metadata)
+        logger.info("🔢 [TOKEN USAGE] %s - Prompt tokens: %s, Candidates tokens: %s, Total tokens: %s",
+                    stage,
+                    getattr(usage_metadata, 'prompt_token_count', None),
+                    getattr(usage_metadata, 'candidates_token_count', None),
+                    getattr(usage_metadata, 'total_token_count', None))
+    else:
+        logger.warning("⚠️ [TOKEN USAGE] Não foi possível obter informações de uso de tokens.")
+    return response
+
+def build_system_context(current_date: str, hotel_id: str, lead_whatsapp_number: str, knowledge: dict, rag_context: str,
+                         session_data: dict, booking_status: dict, chat_context: str, user_question: str,
+                         parsed_dates: dict = None) -> str:
+    """
+    Monta o prompt do turno: contexto do hotel, dados da sessão, status do agendamento,
+    histórico da conversa e a pergunta atual.
+    """
+    parsed_dates_line = ""
+    if parsed_dates:
+        if parsed_dates["kind"] == "dates":
+            parsed_dates_line = (
+                f"\n        - Datas já interpretadas da mensagem (\"{parsed_dates['expression']}\"): "
+                f"check-in {parsed_dates['check_in']}, check-out {parsed_dates['check_out']}. Use-as sem pedir confirmação das datas"
+            )
+        else:
+            # Fim de semana e feriados são deduzidos: ainda não estão na sessão
+            parsed_dates_line = (
+                f"\n        - Sugestão de datas para \"{parsed_dates['expression']}\": "
+                f"check-in {parsed_dates['check_in']}, check-out {parsed_dates['check_out']}. "
+                "Confirme essas datas com o hóspede antes de consultar disponibilidade ou reservar"
+            )
+    return f"""
+        **CONTEXTO ATUAL:**
+       
+        - Data de hoje: {current_date}
+        - Hotel ID: {hotel_id}
+        - Número do WhatsApp do lead: {lead_whatsapp_number}
+        - Quartos disponíveis: {json.dumps(knowledge, ensure_ascii=False)}
+        - Regras e informações do hotel: {rag_context}{parsed_dates_line}
+        
+        **DADOS DA SESSÃO (REDIS):**
+        {json.dumps(session_data, indent=2, ensure_ascii=False)}
+
+        **STATUS DO AGENDAMENTO:**
+        - Pronto para agendamento: {booking_status['ready']}
+        - {booking_status['message']}
+        - Dados faltando: {booking_status.get('missing', []) if not booking_status['ready'] else 'Nenhum'}
+
+        **HISTÓRICO DA CONVERSA (ANALISE ANTES DE RESPONDER):**
+        {chat_context}
+
+        **PERGUNTA ATUAL DO USUÁRIO:**
+        {user_question}
+        
+        **INSTRUÇÕES IMPORTANTES:**
+        - ANALISE o histórico da conversa antes de responder
+        - Se há histórico de conversa, NÃO cumprimente novamente
+        - Responda diretamente à pergunta atual baseada no contexto
+        - Continue o fluxo da conversa anterior
+        - Se é primeira mensagem, cumprimente normalmente
+        - Use a data atual ({current_date}) para determinar anos de datas mencionadas
+        - Se o usuário mencionar "a 25 de janeiro", interprete como "até 25 de janeiro" e peça a data de check-in
+        - Se já tem customer_name e customer_email na sessão, NÃO peça novamente
+        - Se tem todos os dados necessários, prossiga diretamente para o agendamento
+        - Use as ferramentas disponíveis quando necessário
+    """
+
+@traced()
+def generate_response_with_gemini(rag_context: str, user_question: str, chat_history: list = None, knowledge: dict = None, hotel_id: str = None, lead_whatsapp_number: str = None,
+                                  conversation_summary: str = None, session_data: dict = None):
+    logger.info("--- NOVA REQUISIÇÃO PARA %s ---", lead_whatsapp_number)
+    logger.debug("🔍 [DEBUG] lead_whatsapp_number: %s", lead_whatsapp_number)
+    logger.debug("🔍 [DEBUG] hotel_id: %s", hotel_id)
     current_date = datetime.now().strftime("%Y-%m-%d")
     
-    # Sempre recriar o cache para evitar problemas de expiração
-    print("🔄 [CACHE] Recriando cache para evitar problemas de expiração...")
-    if not handle_cache_expiration():
-        print("❌ [CACHE] Falha ao recriar cache, continuando sem cache")
-    else:
-        print("✅ [CACHE] Cache recriado com sucesso!")
+    # Cria o cache se ainda não existir; expiração é tratada em generate_with_cache
+    if not ensure_cache():
+        logger.error("❌ [CACHE] Cache indisponível, continuando sem cache")
     
     try:
-        # Obter dados da sessão do Redis
-        session_data = get_session(lead_whatsapp_number) or {}
-        print(f"📋 [SESSÃO REDIS] Dados para {lead_whatsapp_number}: {json.dumps(session_data, indent=2)}")
+        # Obter dados da sessão do Redis (se quem chamou ainda não obteve)
+        if session_data is None:
+            session_data = get_session(lead_whatsapp_number) or {}
+        logger.debug("📋 [SESSÃO REDIS] Dados para %s: %s", lead_whatsapp_number, lazy(json.dumps, session_data, indent=2))
         
         # Verificar se o atendente humano já foi chamado
         if session_data.get("human_agent_called"):
@@ -1009,14 +1285,17 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                 reactivate_bot(lead_whatsapp_number)
                 return "🤖 Bot reativado! Como posso ajudar você hoje?"
             
-            print(f"🤖 [ATENDENTE HUMANO ATIVO] Não processando mensagem - atendente humano já foi chamado")
+            logger.info("🤖 [ATENDENTE HUMANO ATIVO] Não processando mensagem - atendente humano já foi chamado")
             return "👋 Um de nossos atendentes humanos já foi notificado e entrará em contato com você em breve. Por favor, aguarde o contato direto. Obrigado!"
 
         # Construir contexto da conversa
         chat_context = ""
+        if conversation_summary:
+            # Mensagens antigas, já resumidas (ver conversation_history)
+            chat_context += f"Resumo da conversa até aqui: {conversation_summary}\n\nMensagens mais recentes:\n"
         if chat_history and len(chat_history) > 0:
-            print(f"🔍 [CHAT HISTORY] Processando {len(chat_history)} mensagens do histórico")
-            for i, msg in enumerate(chat_history[-10:]):  # Aumentado para 10 mensagens
+            logger.debug("🔍 [CHAT HISTORY] Processando %s mensagens do histórico", len(chat_history))
+            for i, msg in enumerate(chat_history[-HISTORY_CONTEXT_MESSAGES:]):
                 role = msg.get("role", "user")
                 
                 # Extrair conteúdo da mensagem
@@ -1028,51 +1307,34 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                     # Formato: {"role": "user", "parts": [{"text": "texto"}]}
                     content = msg["parts"][0].get("text", "")
                 
-                print(f"🔍 [CHAT HISTORY] {i+1}. {role}: {content[:100]}...")
+                logger.debug("🔍 [CHAT HISTORY] %s. %s: %s...", i+1, role, content[:100])
                 chat_context += f"{role}: {content}\n"
         
         if not chat_context:
             chat_context = "Nova conversa - sem histórico anterior"
        
+        # Datas/períodos resolvidos localmente ("amanhã", "de 15 a 20/12", "carnaval"...)
+        parsed_dates = stay_dates_from_message(user_question, session_data)
+        if parsed_dates and parsed_dates["kind"] == "dates":
+            # Fim de semana e feriados só entram na sessão depois que o hóspede confirma
+            session_data = apply_parsed_dates(lead_whatsapp_number, session_data, parsed_dates)
+
         # Verificar status dos dados da sessão
         booking_status = check_booking_requirements(session_data)
         
         # Construir contexto completo para o modelo
-        system_context = f"""
-            **CONTEXTO ATUAL:**
-           
-            - Data de hoje: {current_date}
-            - Hotel ID: {hotel_id}
-            - Número do WhatsApp do lead: {lead_whatsapp_number}
-            - Quartos disponíveis: {json.dumps(knowledge, ensure_ascii=False)}
-            - Regras e informações do hotel: {rag_context}
-            
-            **DADOS DA SESSÃO (REDIS):**
-            {json.dumps(session_data, indent=2, ensure_ascii=False)}
-
-            **STATUS DO AGENDAMENTO:**
-            - Pronto para agendamento: {booking_status['ready']}
-            - {booking_status['message']}
-            - Dados faltando: {booking_status.get('missing', []) if not booking_status['ready'] else 'Nenhum'}
-
-            **HISTÓRICO DA CONVERSA (ANALISE ANTES DE RESPONDER):**
-            {chat_context}
-
-            **PERGUNTA ATUAL DO USUÁRIO:**
-            {user_question}
-            
-            **INSTRUÇÕES IMPORTANTES:**
-            - ANALISE o histórico da conversa antes de responder
-            - Se há histórico de conversa, NÃO cumprimente novamente
-            - Responda diretamente à pergunta atual baseada no contexto
-            - Continue o fluxo da conversa anterior
-            - Se é primeira mensagem, cumprimente normalmente
-            - Use a data atual ({current_date}) para determinar anos de datas mencionadas
-            - Se o usuário mencionar "a 25 de janeiro", interprete como "até 25 de janeiro" e peça a data de check-in
-            - Se já tem customer_name e customer_email na sessão, NÃO peça novamente
-            - Se tem todos os dados necessários, prossiga diretamente para o agendamento
-            - Use as ferramentas disponíveis quando necessário
-        """
+        system_context = build_system_context(
+            current_date=current_date,
+            hotel_id=hotel_id,
+            lead_whatsapp_number=lead_whatsapp_number,
+            knowledge=knowledge,
+            rag_context=rag_context,
+            session_data=session_data,
+            booking_status=booking_status,
+            chat_context=chat_context,
+            user_question=user_question,
+            parsed_dates=parsed_dates,
+        )
 
         
  
@@ -1084,64 +1346,8 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
             )
         ]
   
-        try:
-            if cache and is_cache_valid():
-                print(f"🔄 [CACHE] Usando cache: {cache.name}")
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=contents,
-                    config=GenerateContentConfig(
-                        cached_content=cache.name,  # ✅ usa cache diretamente
-                    ),
-                )
-            else:
-                print("⚠️ [CACHE] Usando modelo sem cache")
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=contents,
-                )
-        except Exception as e:
-            error_str = str(e)
-            print(f"❌ [ERRO] Erro na primeira chamada: {e}")
-            if "expired" in error_str or "INVALID_ARGUMENT" in error_str or "Cache content" in error_str:
-                print(f"🔄 [CACHE EXPIRADO] Detectado erro de cache expirado: {e}")
-                print("🔄 [CACHE] Forçando recriação do cache...")
-                if handle_cache_expiration():
-                    print("🔄 [CACHE] Tentando novamente com o novo cache...")
-                    # Tentar novamente com o novo cache
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=contents,
-                        config=GenerateContentConfig(
-                            cached_content=cache.name,  # ✅ usa cache diretamente
-                        ),
-                    )
-                    print("✅ [CACHE] Sucesso com o novo cache!")
-                else:
-                    # Se não conseguir recriar o cache, usar sem cache
-                    print("⚠️ [CACHE] Usando modelo sem cache devido à falha na recriação")
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=contents,
-                    )
-            else:
-                print(f"❌ [ERRO] Erro não relacionado ao cache: {e}")
-                raise e
-        print(response.usage_metadata)
-      
+        response = generate_with_cache(contents, stage="gemini_call_1")
 
-        # Monitorar o uso de tokens (Vertex AI)
-        try:
-            usage_metadata = getattr(response, 'usage_metadata', None)
-            if usage_metadata:
-                prompt_tokens = getattr(usage_metadata, 'prompt_token_count', None)
-                candidates_tokens = getattr(usage_metadata, 'candidates_token_count', None)
-                total_tokens = getattr(usage_metadata, 'total_token_count', None)
-                print(f"🔢 [TOKEN USAGE] Prompt tokens: {prompt_tokens}, Candidates tokens: {candidates_tokens}, Total tokens: {total_tokens}")
-            else:
-                print("⚠️ [TOKEN USAGE] Não foi possível obter informações de uso de tokens.")
-        except Exception as e:
-            print(f"❌ [TOKEN USAGE] Erro ao monitorar tokens: {e}")
         # Processar function calls com Vertex AI
         if response.candidates and response.candidates[0].content.parts:
             function_calls = []
@@ -1150,24 +1356,25 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
             for part in response.candidates[0].content.parts:
                 if hasattr(part, 'function_call') and part.function_call:
                     function_calls.append(part.function_call)
-                    print(f"🛠️ [CHAMADA DE FERRAMENTA]: {part.function_call.name}")
-                    print(f"   - Argumentos: {part.function_call.args}")
+                    logger.info("🛠️ [CHAMADA DE FERRAMENTA]: %s", part.function_call.name)
+                    logger.info("   - Argumentos: %s", part.function_call.args)
                 elif hasattr(part, 'text') and part.text:
                     text_parts.append(part.text)
-                    print(f"🤖 [RESPOSTA DA IA]: {part.text}")
+                    logger.info("🤖 [RESPOSTA DA IA]: %s", part.text)
             
             # Se há function calls, processar elas
             if function_calls:
                 # Adicionar a resposta do modelo ao conteúdo
                 contents.append(response.candidates[0].content)
+                tool_results = []
                 
                 # Processar cada function call
                 for function_call in function_calls:
                     function_name = function_call.name
                     function_args = function_call.args
                     
-                    print(f"🔧 [EXECUTANDO FUNÇÃO]: {function_name}")
-                    print(f"   - Argumentos: {function_args}")
+                    logger.info("🔧 [EXECUTANDO FUNÇÃO]: %s", function_name)
+                    logger.info("   - Argumentos: %s", function_args)
                     
                     try:
                         # Criar um objeto function_call compatível
@@ -1179,21 +1386,24 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                         function_call_obj = FunctionCall(function_name, function_args)
                         
                         # Usar a função process_function_call existente
-                        result = process_function_call(
-                            function_call_obj,
-                            hotel_id,
-                            lead_whatsapp_number,
-                            session_data,
-                            user_question
-                        )
+                        with TOOL_LATENCY.time(tool=function_name):
+                            result = process_function_call(
+                                function_call_obj,
+                                hotel_id,
+                                lead_whatsapp_number,
+                                session_data,
+                                user_question
+                            )
                         
-                        print(f"✅ [RESULTADO DA FUNÇÃO]: {result}")
+                        logger.info("✅ [RESULTADO DA FUNÇÃO]: %s", result)
                         
                         # Se o resultado da função contém link de pagamento, retornar diretamente
                         if "Link para pagamento:" in result or "Link de Pagamento:" in result:
-                            print(f"🚀 [RETORNO DIRETO] Função retornou resultado completo com link de pagamento")
+                            logger.info("🚀 [RETORNO DIRETO] Função retornou resultado completo com link de pagamento")
                             return result
                         
+                        tool_results.append(result)
+
                         # Criar resposta da função
                         function_response_part = Part.from_function_response(
                             name=function_name,
@@ -1207,57 +1417,19 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                         ))
                         
                     except Exception as e:
-                        print(f"❌ [ERRO NA FUNÇÃO]: {e}")
+                        logger.error("❌ [ERRO NA FUNÇÃO]: %s", e)
                         error_response = f"Erro ao executar {function_name}: {str(e)}"
                         contents.append(Content(
                             role="user",
                             parts=[Part.from_text(error_response)]
                         ))
                 
+                # Sem prazo para a segunda chamada, o texto das ferramentas já é a resposta
+                if tool_results and should_degrade("skip_second_call", DEADLINE_SKIP_SECOND_CALL_MS):
+                    return "\n\n".join(tool_results)
+
                 # Gerar resposta final com os resultados das funções
-                try:
-                    if cache and is_cache_valid():
-                        print(f"🔄 [CACHE] Usando cache para resposta final: {cache.name}")
-                        final_response = client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=contents,
-                            config=GenerateContentConfig(
-                                cached_content=cache.name,  # ✅ usa cache diretamente
-                            ),
-                        )
-                    else:
-                        print("⚠️ [CACHE] Usando modelo sem cache para resposta final")
-                        final_response = client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=contents,
-                        )
-                except Exception as e:
-                    error_str = str(e)
-                    print(f"❌ [ERRO] Erro na segunda chamada: {e}")
-                    if "expired" in error_str or "INVALID_ARGUMENT" in error_str or "Cache content" in error_str:
-                        print(f"🔄 [CACHE EXPIRADO] Detectado erro de cache expirado na resposta final: {e}")
-                        print("🔄 [CACHE] Forçando recriação do cache...")
-                        if handle_cache_expiration():
-                            print("🔄 [CACHE] Tentando novamente com o novo cache...")
-                            # Tentar novamente com o novo cache
-                            final_response = client.models.generate_content(
-                                model="gemini-2.5-flash",
-                                contents=contents,
-                                config=GenerateContentConfig(
-                                    cached_content=cache,  # ✅ usa cache diretamente
-                                ),
-                            )
-                            print("✅ [CACHE] Sucesso com o novo cache na resposta final!")
-                        else:
-                            # Se não conseguir recriar o cache, usar sem cache
-                            print("⚠️ [CACHE] Usando modelo sem cache devido à falha na recriação")
-                            final_response = client.models.generate_content(
-                                model="gemini-2.5-flash",
-                                contents=contents,
-                            )
-                    else:
-                        print(f"❌ [ERRO] Erro não relacionado ao cache: {e}")
-                        raise e
+                final_response = generate_with_cache(contents, stage="gemini_call_2")
                 
                 # Verificar se há texto na resposta - extrair apenas as partes de texto
                 try:
@@ -1269,14 +1441,14 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                         
                         if text_parts:
                             final_text = "\n".join(text_parts)
-                            print(f"🤖 [RESPOSTA FINAL]: {final_text}")
+                            logger.info("🤖 [RESPOSTA FINAL]: %s", final_text)
                             return final_text
                         else:
                             return "Desculpe, não consegui processar sua solicitação."
                     else:
                         return "Desculpe, não consegui processar sua solicitação."
                 except (ValueError, AttributeError) as e:
-                    print(f"⚠️ [AVISO] Erro ao extrair texto da resposta: {e}")
+                    logger.warning("⚠️ [AVISO] Erro ao extrair texto da resposta: %s", e)
                     return "Desculpe, não consegui processar sua solicitação."
             
             # Se não há function calls, retornar texto direto
@@ -1293,17 +1465,19 @@ def generate_response_with_gemini(rag_context: str, user_question: str, chat_his
                 
                 if text_parts:
                     final_text = "\n".join(text_parts)
-                    print(f"🤖 [RESPOSTA DA IA]: {final_text}")
+                    logger.info("🤖 [RESPOSTA DA IA]: %s", final_text)
                     return final_text
         except (ValueError, AttributeError) as e:
-            print(f"⚠️ [AVISO] Erro ao extrair texto da resposta: {e}")
+            logger.warning("⚠️ [AVISO] Erro ao extrair texto da resposta: %s", e)
 
         return "Desculpe, não consegui processar sua mensagem. Tente novamente."
 
     except Exception as e:
-        print(f"❌ [ERRO CRÍTICO] em generate_response_with_gemini: {e}")
-        import traceback
-        traceback.print_exc()
+        ERRORS.inc(stage="generate_response", error=type(e).__name__)
+        if isinstance(e, RateLimitTimeout) or is_rate_limit_error(e):
+            logger.error("🐢 [RATE LIMIT] Cota do Gemini esgotada: %s", e)
+            return "Estamos com muitas mensagens no momento. Por favor, aguarde um instante e envie novamente."
+        logger.exception("❌ [ERRO CRÍTICO] em generate_response_with_gemini: %s", e)
         return "Ocorreu um erro inesperado ao processar sua solicitação. Por favor, tente novamente."
 
 
@@ -1314,8 +1488,13 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
     function_name = function_call.name
     args = dict(function_call.args)
     
-    print(f"🔄 [PROCESSANDO FUNÇÃO] {function_name} com args: {args}")
-    
+    logger.info("🔄 [PROCESSANDO FUNÇÃO] %s com args: %s", function_name, args)
+
+    with span("process_function_call", tool=function_name):
+        return _process_function_call(function_name, args, hotel_id, lead_whatsapp_number)
+
+
+def _process_function_call(function_name: str, args: dict, hotel_id: str, lead_whatsapp_number: str):
     try:
         if function_name == "verificar_disponibilidade_geral":
             check_in = args.get("check_in_date")
@@ -1327,8 +1506,8 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             # Converter datas para formato ISO antes de processar
             converted_check_in = convert_date_to_iso(check_in)
             converted_check_out = convert_date_to_iso(check_out)
-            print(f"🔄 [CONVERSÃO] {check_in} -> {converted_check_in}")
-            print(f"🔄 [CONVERSÃO] {check_out} -> {converted_check_out}")
+            logger.debug("🔄 [CONVERSÃO] %s -> %s", check_in, converted_check_in)
+            logger.debug("🔄 [CONVERSÃO] %s -> %s", check_out, converted_check_out)
             
             # Atualizar sessão com datas convertidas
             update_session(lead_whatsapp_number, {"check_in_date": converted_check_in, "check_out_date": converted_check_out})
@@ -1414,7 +1593,7 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
                 current_session["customer_name"] = customer_name.strip()
                 current_session["personal_data_completed"] = True
                 save_session(lead_whatsapp_number, current_session)
-                print(f"💾 [REDIS] Nome salvo: {customer_name}")
+                logger.debug("💾 [REDIS] Nome salvo: %s", customer_name)
                 return f"✅ Nome salvo com sucesso!\n\n👤 Nome: {customer_name}\nAgora, por favor, me informe seu e-mail para continuar a reserva."
 
             # Se veio apenas o email (nome nulo ou vazio)
@@ -1425,7 +1604,7 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
                 current_session["customer_email"] = customer_email.strip().lower()
                 current_session["personal_data_completed"] = True
                 save_session(lead_whatsapp_number, current_session)
-                print(f"💾 [REDIS] Email salvo: {customer_email}")
+                logger.debug("💾 [REDIS] Email salvo: %s", customer_email)
                 return f"✅ Email salvo com sucesso!\n\n📧 Email: {customer_email}\nAgora, por favor, me informe seu nome completo para continuar a reserva."
 
             # Se vieram ambos, segue fluxo normal (continua código existente)
@@ -1442,7 +1621,7 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             
             # Salvar na sessão Redis
             save_session(lead_whatsapp_number, current_session)
-            print(f"💾 [REDIS] Dados pessoais salvos: {customer_name}, {customer_email}")
+            logger.debug("💾 [REDIS] Dados pessoais salvos: %s, %s", customer_name, customer_email)
             
             
             current_session = get_session(lead_whatsapp_number) or {}
@@ -1471,24 +1650,24 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             if not total_price:
                 return "❌ Não foi possível calcular o preço total. Verifique as datas e o quarto."
             
-            print(f"🏨 [RESERVA] Criando reserva para quarto {room_id} de {check_in} a {check_out} - R$ {total_price:.2f}")
+            logger.info("🏨 [RESERVA] Criando reserva para quarto %s de %s a %s - R$ %.2f", room_id, check_in, check_out, total_price)
             
             # Criar agendamento
             booking_result = chamar_api_agendamento(hotel_id, lead_whatsapp_number, int(room_id), check_in, check_out, total_price, customer_email,customer_name)
-            print(f"🔍 [DEBUG RESERVA] Booking result: {booking_result}")
+            logger.debug("🔍 [DEBUG RESERVA] Booking result: %s", booking_result)
             if "error" not in booking_result:
                 payment_url = booking_result.get('paymentUrl')
                 booking_id = booking_result.get('bookingId')
                 
                 if not payment_url or payment_url == 'Link não disponível':
-                    print(f"⚠️ [AVISO] Link de pagamento não gerado. Cancelando agendamento {booking_id}")
+                    logger.warning("⚠️ [AVISO] Link de pagamento não gerado. Cancelando agendamento %s", booking_id)
                     
                     if booking_id:
                         cancel_result = chamar_api_cancelar_agendamento(booking_id)
                         if "error" in cancel_result:
-                            print(f"❌ [ERRO] Falha ao cancelar agendamento {booking_id}: {cancel_result.get('error')}")
+                            logger.error("❌ [ERRO] Falha ao cancelar agendamento %s: %s", booking_id, cancel_result.get('error'))
                         else:
-                            print(f"✅ [SUCESSO] Agendamento {booking_id} cancelado com sucesso")
+                            logger.info("✅ [SUCESSO] Agendamento %s cancelado com sucesso", booking_id)
                     
                     return "❌ Erro ao gerar link de pagamento. A reserva foi cancelada automaticamente. Tente novamente em alguns instantes."
                 
@@ -1527,24 +1706,24 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             if not total_price:
                 return "❌ Não foi possível calcular o preço total. Verifique as datas e o quarto."
             
-            print(f"🏨 [RESERVA] Criando reserva para quarto {room_id} de {check_in} a {check_out} - R$ {total_price:.2f}")
+            logger.info("🏨 [RESERVA] Criando reserva para quarto %s de %s a %s - R$ %.2f", room_id, check_in, check_out, total_price)
             
             # Criar agendamento
             booking_result = chamar_api_agendamento(hotel_id, lead_whatsapp_number, int(room_id), check_in, check_out, total_price, customer_email,customer_name)
-            print(f"🔍 [DEBUG RESERVA] Booking result: {booking_result}")
+            logger.debug("🔍 [DEBUG RESERVA] Booking result: %s", booking_result)
             if "error" not in booking_result:
                 payment_url = booking_result.get('paymentUrl')
                 booking_id = booking_result.get('bookingId')
                 
                 if not payment_url or payment_url == 'Link não disponível':
-                    print(f"⚠️ [AVISO] Link de pagamento não gerado. Cancelando agendamento {booking_id}")
+                    logger.warning("⚠️ [AVISO] Link de pagamento não gerado. Cancelando agendamento %s", booking_id)
                     
                     if booking_id:
                         cancel_result = chamar_api_cancelar_agendamento(booking_id)
                         if "error" in cancel_result:
-                            print(f"❌ [ERRO] Falha ao cancelar agendamento {booking_id}: {cancel_result.get('error')}")
+                            logger.error("❌ [ERRO] Falha ao cancelar agendamento %s: %s", booking_id, cancel_result.get('error'))
                         else:
-                            print(f"✅ [SUCESSO] Agendamento {booking_id} cancelado com sucesso")
+                            logger.info("✅ [SUCESSO] Agendamento %s cancelado com sucesso", booking_id)
                     
                     return "❌ Erro ao gerar link de pagamento. A reserva foi cancelada automaticamente. Tente novamente em alguns instantes."
                 
@@ -1558,7 +1737,7 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             hotel_id = args.get("hotel_id")
             lead_whatsapp_number = args.get("lead_whatsapp_number")
             response = chamar_atendente_humano(hotel_id, lead_whatsapp_number)
-            print(f"🔍 [DEBUG ATENDENTE HUMANO] Response: {response}")
+            logger.debug("🔍 [DEBUG ATENDENTE HUMANO] Response: %s", response)
             
             # Marcar na sessão que o atendente humano foi chamado
             update_session(lead_whatsapp_number, {"human_agent_called": True, "agent_called_at": datetime.now().isoformat()})
@@ -1566,7 +1745,7 @@ def process_function_call(function_call, hotel_id: str, lead_whatsapp_number: st
             return "✅ Em breve um de nossos atendentes irá entrar em contato, por favor aguarde. Obrigado pela sua paciência! 😊"
             
     except Exception as e:
-        print(f"❌ [ERRO] ao processar função {function_name}: {e}")
+        logger.error("❌ [ERRO] ao processar função %s: %s", function_name, e)
         return f"❌ Erro ao processar {function_name}: {str(e)}"
     
     return None
@@ -1581,6 +1760,9 @@ def format_availability_response(availability_data):
     if not availability_data or "error" in availability_data:
         return "❌ Nenhum quarto disponível para essas datas."
     
+    if isinstance(availability_data, dict) and "rooms" in availability_data:
+        return _stale_notice(availability_data) + format_availability_response(availability_data["rooms"])
+
     if isinstance(availability_data, list):
         response = "🏨 Quartos disponíveis:\n\n"
         available_rooms = []
@@ -1623,9 +1805,11 @@ def format_availability_response(availability_data):
     return "❌ Dados de disponibilidade inválidos."
 
 
+@traced()
 def process_google_event(payload: dict) -> dict:
     """
     Processa o evento recebido do Google Calendar e gera uma resposta usando o modelo Gemini.
+    Eventos sem mudança relevante devolvem a extração guardada (ver calendar_jobs).
     
     Args:
         payload (dict): Payload do evento do Google Calendar
@@ -1633,71 +1817,90 @@ def process_google_event(payload: dict) -> dict:
     Returns:
         dict: Resposta gerada pelo modelo Gemini
     """
+    from calendar_jobs import extract_events
+
     try:
         # Extrai os dados do payload recebido do seu backend Node.js
         event = payload.get('event', {})
         user = payload.get('user', {})
         available_rooms = user.get('availableRooms', [])
 
-        # 1. MONTAGEM DO PROMPT PARA A IA
-        # Este prompt é a "alma" da sua lógica de tradução.
-        prompt = f"""
-        Você é um assistente especialista em processar dados de reservas de hotel para um sistema de automação.
-        Analise os dados de um evento do Google Calendar e a lista de quartos disponíveis para extrair informações em um formato JSON específico.
+        # Saída JSON com schema: o parse não falha por texto fora do formato
+        processed_data = extract_events([event], available_rooms)[0]
+        if processed_data is None:
+            raise ValueError("O modelo não retornou dados para o evento.")
+        logger.info("--- DADOS PROCESSADOS --- %s", processed_data)
+        return processed_data
+    except Exception as e:
+        logger.error("Erro ao processar evento do Google Calendar: %s", e)
+        return {
+            "response_gemini": "Desculpe, ocorreu um erro ao processar o evento. Tente novamente."
+        }
 
-        **Dados do Evento Recebido:**
-        - Título (summary): "{event.get('summary', '')}"
-        - Descrição (description): "{event.get('description', '')}"
-        - Data de Início: "{event.get('start', '')}"
-        - Data de Fim: "{event.get('end', '')}"
+
+# Campos extraídos de cada evento do Google Calendar
+_GOOGLE_EVENT_FIELDS = {
+    "roomName": {"type": "STRING", "nullable": True},
+    "leadName": {"type": "STRING", "nullable": True},
+    "leadEmail": {"type": "STRING", "nullable": True},
+    "leadWhatsapp": {"type": "STRING", "nullable": True},
+}
+GOOGLE_EVENTS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"eventIndex": {"type": "INTEGER"}, **_GOOGLE_EVENT_FIELDS},
+        "required": ["eventIndex"],
+    },
+}
+
+@traced()
+def extract_google_events(events: list, available_rooms: list) -> list:
+    """
+    Extrai quarto, nome, e-mail e WhatsApp de vários eventos do Google Calendar do
+    mesmo hotel numa única chamada ao modelo, com saída JSON estruturada.
+
+    Returns:
+        list: Um dicionário por evento, na ordem recebida (None se o modelo omitiu o evento)
+    """
+    listed_events = "\n".join(
+        f"[{i}] Título: \"{event.get('summary', '')}\" | Descrição: \"{event.get('description', '')}\" | "
+        f"Início: \"{event.get('start', '')}\" | Fim: \"{event.get('end', '')}\""
+        for i, event in enumerate(events)
+    )
+    prompt = f"""
+        Você é um assistente especialista em processar dados de reservas de hotel para um sistema de automação.
+        Analise os eventos do Google Calendar abaixo e a lista de quartos válidos para extrair as informações de cada evento.
 
         **Lista de Nomes de Quartos Válidos neste Hotel:**
         - {', '.join(available_rooms)}
 
+        **Eventos do Google Calendar (índice entre colchetes):**
+        {listed_events}
+
         **Sua Tarefa:**
-        Baseado nos dados acima, retorne um objeto JSON contendo as seguintes chaves. Se uma informação não puder ser extraída, retorne null para o campo correspondente.
+        Retorne um objeto por evento, com "eventIndex" igual ao índice do evento. Se uma informação não puder ser extraída, use null.
         1.  "roomName": A partir do Título do evento, identifique o nome do quarto mais provável da lista de quartos válidos.
         2.  "leadName": A partir da Descrição ou do Título, extraia o nome completo do hóspede.
         3.  "leadEmail": Extraia o endereço de e-mail do hóspede da Descrição.
         4.  "leadWhatsapp": Extraia um número de telefone no formato WhatsApp (apenas dígitos) da Descrição.
-        
-        Responda APENAS com o objeto JSON. Não inclua texto adicional ou formatação.
-        Exemplo de resposta:
-        {{
-        "roomName": "Suíte Master",
-        "leadName": "Ana Clara Medeiros",
-        "leadEmail": "anaclara.medeiros@example.com",
-        "leadWhatsapp": "5521987654321"
-        }}
         """
 
-        print("--- PROMPT ENVIADO PARA A IA ---")
-        print(prompt)
-        print("-------------------------------")
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            
-        )
-        # Limpa a resposta para garantir que seja um JSON válido
-        cleaned_response_text = response.text.strip().replace('```json', '').replace('```', '')
-            
-        print("--- RESPOSTA DA IA (JSON Mastigado) ---")
-        print(cleaned_response_text)
-        print("--------------------------------------")
-            
-        # 3. CONVERTE A RESPOSTA DE TEXTO PARA UM DICIONÁRIO PYTHON
-        processed_data = json.loads(cleaned_response_text)
-        print("--- DADOS PROCESSADOS ---")
-        print(processed_data)
-        print("-------------------------")
-        return processed_data
-    except Exception as e:
-        print(f"Erro ao processar evento do Google Calendar: {e}")
-        return {
-            "response_gemini": "Desculpe, ocorreu um erro ao processar o evento. Tente novamente."
-        }
+    response = _generate_content("google_event_batch",
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=GenerateContentConfig(response_mime_type="application/json", response_schema=GOOGLE_EVENTS_SCHEMA),
+    )
+    record_token_usage(getattr(response, "usage_metadata", None))
+    items = response.parsed if isinstance(getattr(response, "parsed", None), list) else json.loads(response.text)
+
+    results = [None] * len(events)
+    for item in items:
+        index = item.get("eventIndex") if isinstance(item, dict) else None
+        if isinstance(index, int) and 0 <= index < len(events):
+            results[index] = {field: item.get(field) for field in _GOOGLE_EVENT_FIELDS}
+    logger.info("--- %d EVENTOS PROCESSADOS EM UMA CHAMADA ---", len(events))
+    return results
 
 
 def test_booking_flow():
@@ -1,7 +1,12 @@
 # generateChunks.py
 
-import numpy as np
-import google.generativeai as genai
+from app_logging import get_logger
+from rate_limiter import EMBEDDING_LIMITER
+
+logger = get_logger("generate_chunks")
+
+# Máximo de textos por chamada de embedding (limite do batch da API)
+EMBEDDING_BATCH_SIZE = 100
 
 # ==============================================================================
 #  FUNÇÕES DE SUPORTE (O MOTOR DA FÁBRICA)
@@ -10,7 +15,7 @@ import google.generativeai as genai
 def get_text_chunks(text: str, chunk_size=1000, chunk_overlap=200) -> list[str]:
     """Divide um texto longo em pedaços (chunks) menores e sobrepostos."""
     if not text or not text.strip():
-        print("AVISO: Texto de entrada para chunking está vazio.")
+        logger.warning("AVISO: Texto de entrada para chunking está vazio.")
         return []
         
     chunks = []
@@ -24,20 +29,22 @@ def get_text_chunks(text: str, chunk_size=1000, chunk_overlap=200) -> list[str]:
 
 def generate_embeddings(text_chunks: list[str], task_type: str = "RETRIEVAL_DOCUMENT") -> list[list[float]]:
     """Gera embeddings para uma lista de textos usando a API do Google."""
-    print(f"Gerando embeddings para {len(text_chunks)} chunks (tarefa: {task_type})...")
+    logger.info("Gerando embeddings para %s chunks (tarefa: %s)...", len(text_chunks), task_type)
     if not text_chunks:
         return []
 
     embedding_model = "models/text-embedding-004"
     try:
-        result = genai.embed_content(
+        # Importado aqui: o pacote é pesado e só é usado nos embeddings
+        import google.generativeai as genai
+        result = EMBEDDING_LIMITER.call(genai.embed_content, 
             model=embedding_model,
             content=text_chunks,
             task_type=task_type
         )
         return result['embedding']
     except Exception as e:
-        print(f"ERRO ao gerar embeddings: {e}")
+        logger.error("ERRO ao gerar embeddings: %s", e)
         # Lança o erro para a camada superior tratar
         raise e
 
@@ -45,10 +52,11 @@ def generate_embeddings(text_chunks: list[str], task_type: str = "RETRIEVAL_DOCU
 #  FUNÇÃO PRINCIPAL (O PRODUTO FINAL DA FÁBRICA)
 # ==============================================================================
 
-def generate_vectorized_chunks(full_text: str) -> list[dict]:
+def generate_vectorized_chunks(full_text: str, on_progress=None) -> list[dict]:
     """
     Orquestra o processo completo de chunking e embedding.
     Recebe um texto e retorna uma lista de dicionários com os chunks e seus vetores.
+    Se informado, on_progress(feitos, total) é chamado após cada lote de embeddings.
     """
     if not full_text.strip():
         raise ValueError("O texto do documento está vazio ou inválido.")
@@ -58,8 +66,12 @@ def generate_vectorized_chunks(full_text: str) -> list[dict]:
     if not chunks:
         raise ValueError("Não foi possível gerar chunks a partir do texto.")
 
-    # 2. Criar os vetores (embeddings)
-    embeddings = generate_embeddings(chunks)
+    # 2. Criar os vetores (embeddings), em lotes
+    embeddings = []
+    for start in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
+        embeddings.extend(generate_embeddings(chunks[start:start + EMBEDDING_BATCH_SIZE]))
+        if on_progress:
+            on_progress(min(start + EMBEDDING_BATCH_SIZE, len(chunks)), len(chunks))
     if not embeddings or len(chunks) != len(embeddings):
         raise RuntimeError("Falha ao gerar embeddings ou incompatibilidade de tamanho.")
 
@@ -69,5 +81,5 @@ def generate_vectorized_chunks(full_text: str) -> list[dict]:
         for chunk, embedding in zip(chunks, embeddings)
     ]
     
-    print(f"✅ Indexação concluída. Retornando {len(vectorized_chunks)} chunks com embeddings.")
+    logger.info("✅ Indexação concluída. Retornando %s chunks com embeddings.", len(vectorized_chunks))
     return vectorized_chunks
\ No newline at end of file
@@ -0,0 +1,86 @@
+# gunicorn.conf.py
+#
+# Produção: gunicorn -c gunicorn.conf.py
+# Toda a configuração vem do ambiente (ver README, seção "Produção").
+
+import gc
+import os
+
+# ==============================================================================
+#  DIMENSIONAMENTO DOS WORKERS
+#  Cada worker atende o chat no event loop + threadpool, quase sempre esperando
+#  o Gemini, o Gateway e o Redis; por isso WORKERS_PER_CORE > 1. O total é
+#  limitado pela memória disponível (limite do cgroup em containers).
+# ==============================================================================
+
+
+def _cpu_count() -> int:
+    try:
+        # cgroup v2: "quota período" (ex: "200000 100000" = 2 CPUs) ou "max"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _memory_bytes():
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != "max" and int(value) < 1 << 60:
+                return int(value)
+        except (OSError, ValueError):
+            pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _default_workers() -> int:
+    by_cpu = int(_cpu_count() * float(os.getenv("WORKERS_PER_CORE", "2")))
+    memory = _memory_bytes()
+    # Memória estimada por worker (o que não é compartilhado via copy-on-write)
+    by_memory = memory // (int(os.getenv("WORKER_MEMORY_MB", "256")) * 1024 * 1024) if memory else by_cpu
+    return max(1, min(by_cpu, by_memory, int(os.getenv("MAX_WORKERS", "32"))))
+
+
+wsgi_app = "api:app"
+worker_class = "gunicorn_worker.ApiWorker"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+
+# Carrega a aplicação uma vez no master: módulos, prompts e declarações de
+# ferramentas ficam compartilhados entre os workers (copy-on-write). Conexões e
+# clientes são criados depois do fork, no lifespan de cada worker.
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+# Tempo para um worker terminar as requisições em andamento ao receber SIGTERM
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Worker sem sinal de vida por mais que isso é reiniciado
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+# Recicla workers periodicamente (vazamentos de memória, fragmentação)
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "200"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+accesslog = "-" if os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes") else None
+errorlog = "-"
+# Heartbeat dos workers em memória: evita travas de disco em containers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def when_ready(server):
+    # Com a aplicação já carregada no master: coleta o lixo e congela os objetos
+    # sobreviventes, para que o GC dos workers não toque (e copie) essas páginas
+    gc.collect()
+    gc.freeze()
+    server.log.info("Workers: %s | preload: %s | objetos congelados: %s", workers, preload_app, gc.get_freeze_count())
@@ -0,0 +1,24 @@
+# gunicorn_worker.py
+
+import os
+
+from uvicorn.workers import UvicornWorker
+
+# ==============================================================================
+#  WORKER DO GUNICORN PARA PRODUÇÃO
+#  Usa uvloop e httptools quando instalados ("auto") e limita o desligamento
+#  gracioso do uvicorn a um pouco menos que o graceful_timeout do gunicorn, para
+#  que as requisições em andamento (chamadas ao Gemini) terminem e o lifespan
+#  finalize antes de o master matar o processo.
+# ==============================================================================
+
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+
+class ApiWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": max(1, GRACEFUL_TIMEOUT - 5),
+    }
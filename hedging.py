@@ -0,0 +1,139 @@
+# hedging.py
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app_logging import get_logger
+from metrics import Counter, Histogram
+
+# ==============================================================================
+#  HEDGING DAS CHAMADAS AO MODELO
+#  A latência do Gemini tem cauda longa. Com hedging habilitado, se a chamada
+#  não voltar até o percentil configurado da latência recente daquele ponto de
+#  chamada, uma cópia é disparada e vale a que terminar primeiro. As cópias são
+#  limitadas a uma fração das chamadas. Use APENAS em chamadas sem efeitos
+#  colaterais (geração de texto); nunca na execução de ferramentas.
+# ==============================================================================
+
+logger = get_logger("hedging")
+
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Percentil da latência recente a partir do qual a cópia é disparada
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.95"))
+# Fração máxima de chamadas que podem gerar cópia (carga extra)
+GEMINI_HEDGE_MAX_RATIO = float(os.getenv("GEMINI_HEDGE_MAX_RATIO", "0.1"))
+# Espera mínima antes da cópia, para não duplicar chamadas rápidas (ms)
+GEMINI_HEDGE_MIN_DELAY_MS = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "500"))
+# Amostras necessárias antes de começar a fazer hedging num ponto de chamada
+_MIN_SAMPLES = 20
+_WINDOW = 500
+
+HEDGES = Counter(
+    "gemini_hedges_total",
+    "Cópias de chamadas ao modelo por ponto de chamada e resultado (sent, won, skipped_budget).",
+    ["call_site", "result"],
+)
+HEDGED_LATENCY = Histogram(
+    "gemini_hedged_call_duration_seconds",
+    "Latência por ponto de chamada: 'primary' é a chamada original, 'effective' a obtida com hedging.",
+    ["call_site", "kind"],
+    buckets=(0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0),
+)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GEMINI_HEDGE_POOL", "32")), thread_name_prefix="hedge")
+
+
+class _CallSiteStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=_WINDOW)
+        self.calls = 0
+        self.hedges = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def hedge_delay(self):
+        """Atraso até a cópia, ou None se ainda não há amostras suficientes."""
+        with self.lock:
+            if len(self.latencies) < _MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * GEMINI_HEDGE_PERCENTILE))
+        return max(ordered[index], GEMINI_HEDGE_MIN_DELAY_MS / 1000)
+
+    def try_reserve_hedge(self) -> bool:
+        with self.lock:
+            if self.hedges + 1 > GEMINI_HEDGE_MAX_RATIO * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+
+_stats: dict[str, _CallSiteStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _stats_for(call_site: str) -> _CallSiteStats:
+    with _stats_lock:
+        stats = _stats.get(call_site)
+        if stats is None:
+            stats = _stats[call_site] = _CallSiteStats()
+        return stats
+
+
+def _submit(fn, *args, **kwargs):
+    # Cada tentativa roda em sua thread com o contexto (logs/trace) da requisição
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def hedged_call(call_site: str, fn, *args, **kwargs):
+    """
+    Executa fn(*args, **kwargs) com hedging, se habilitado. fn não pode ter efeitos
+    colaterais: as duas tentativas podem ser concluídas.
+    """
+    if not GEMINI_HEDGE_ENABLED:
+        return fn(*args, **kwargs)
+
+    stats = _stats_for(call_site)
+    with stats.lock:
+        stats.calls += 1
+    delay = stats.hedge_delay()
+    start = time.perf_counter()
+
+    def on_primary_done(_):
+        latency = time.perf_counter() - start
+        stats.record(latency)
+        HEDGED_LATENCY.observe(latency, call_site=call_site, kind="primary")
+
+    primary = _submit(fn, *args, **kwargs)
+    primary.add_done_callback(on_primary_done)
+    attempts = [primary]
+
+    if delay is not None:
+        done, _ = wait(attempts, timeout=delay)
+        if not done:
+            if stats.try_reserve_hedge():
+                HEDGES.inc(call_site=call_site, result="sent")
+                logger.info("🪞 [HEDGE] %s sem resposta após %.2fs, disparando cópia", call_site, delay)
+                attempts.append(_submit(fn, *args, **kwargs))
+            else:
+                HEDGES.inc(call_site=call_site, result="skipped_budget")
+
+    # Vale a primeira tentativa concluída com sucesso; se todas falharem, o erro da original
+    pending = set(attempts)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is not primary:
+                    HEDGES.inc(call_site=call_site, result="won")
+                HEDGED_LATENCY.observe(time.perf_counter() - start, call_site=call_site, kind="effective")
+                return future.result()
+    HEDGED_LATENCY.observe(time.perf_counter() - start, call_site=call_site, kind="effective")
+    return primary.result()
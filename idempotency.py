@@ -0,0 +1,164 @@
+# idempotency.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from app_logging import get_logger
+from metrics import Counter
+
+# ==============================================================================
+#  IDEMPOTÊNCIA DAS MENSAGENS DO WHATSAPP
+#  O Gateway e o WhatsApp reenviam mensagens em timeouts. Uma reentrega com a
+#  mesma chave:
+#    - se ainda está em processamento, espera o resultado da primeira;
+#    - se terminou há pouco, recebe a resposta guardada no Redis.
+#  Assim o reenvio não gera outra chamada ao modelo nem agendamento duplicado.
+# ==============================================================================
+
+logger = get_logger("idempotency")
+
+# Janela para agrupar reenvios sem message_id (segundos)
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "120"))
+# Por quanto tempo a resposta pronta fica disponível para reenvios (segundos)
+IDEMPOTENCY_RESULT_TTL = int(os.getenv("IDEMPOTENCY_RESULT_TTL", "600"))
+# Tempo máximo que uma requisição pode ficar marcada como "em andamento"
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "90"))
+_POLL_INTERVAL = 0.2
+
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Mensagens por resultado da verificação de idempotência.",
+    ["result"],
+)
+
+# Requisições em andamento neste worker: chave -> Future com a resposta
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def idempotency_key(hotel_id: str, lead_whatsapp_number: str, message: str, turn: int = None, message_id: str = None,
+                    message_timestamp: str = None) -> str:
+    """
+    Usa o ID da mensagem quando o Gateway envia. Sem ele, usa um hash do lead, da
+    mensagem, do horário da mensagem no WhatsApp (igual nos reenvios, diferente
+    em cada envio do hóspede) e do número do turno do lead no servidor
+    (turn_count) dentro de uma janela de tempo.
+
+    Sem message_id nem message_timestamp, só o turno separa mensagens iguais: um
+    "sim" repetido depois da resposta cai no turno seguinte, mas dois "ok" na
+    mesma rajada (antes da resposta) viram um só, e um reenvio que chega depois
+    de a original terminar é processado de novo.
+    """
+    if message_id:
+        return f"msg:{hotel_id}:{message_id}"
+    window = int(time.time() // IDEMPOTENCY_WINDOW_SECONDS)
+    digest = hashlib.sha256(
+        "\x1f".join(
+            [str(hotel_id), str(lead_whatsapp_number), message, str(message_timestamp or ""), str(turn), str(window)]
+        ).encode("utf-8")
+    ).hexdigest()
+    return f"hash:{digest[:32]}"
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _load(key: str):
+    raw = _redis().get(f"idem:{key}")
+    return json.loads(raw) if raw else None
+
+
+def _claim(key: str) -> bool:
+    return bool(_redis().set(f"idem:{key}", json.dumps({"status": "pending"}), nx=True, ex=IDEMPOTENCY_PENDING_TTL))
+
+
+def _store(key: str, response):
+    _redis().set(f"idem:{key}", json.dumps({"status": "done", "response": response}, ensure_ascii=False), ex=IDEMPOTENCY_RESULT_TTL)
+
+
+def _release(key: str):
+    _redis().delete(f"idem:{key}")
+
+
+async def _wait_other_worker(key: str):
+    """Espera outro worker concluir a mesma mensagem. Retorna a resposta ou None se desistir."""
+    deadline = time.monotonic() + IDEMPOTENCY_PENDING_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_INTERVAL)
+        record = await run_in_threadpool(_load, key)
+        if record is None:
+            return None  # O outro worker falhou e liberou a chave
+        if record.get("status") == "done":
+            return record["response"]
+    return None
+
+
+async def _execute(key: str, fn):
+    try:
+        record = await run_in_threadpool(_load, key)
+        if record and record.get("status") == "done":
+            IDEMPOTENT_REQUESTS.inc(result="stored")
+            logger.info("♻️ [IDEMPOTÊNCIA] Resposta reaproveitada do Redis para %s", key)
+            return record["response"]
+        if not await run_in_threadpool(_claim, key):
+            IDEMPOTENT_REQUESTS.inc(result="other_worker")
+            logger.info("⏳ [IDEMPOTÊNCIA] Mensagem %s em processamento em outro worker, aguardando", key)
+            response = await _wait_other_worker(key)
+            if response is not None:
+                return response
+            logger.warning("⚠️ [IDEMPOTÊNCIA] Sem resultado do outro worker para %s, processando aqui", key)
+    except Exception as e:
+        # Sem Redis, processa normalmente (a deduplicação é uma otimização)
+        logger.warning("⚠️ [IDEMPOTÊNCIA] Redis indisponível, processando sem deduplicação: %s", e)
+        return await fn()
+
+    IDEMPOTENT_REQUESTS.inc(result="miss")
+    try:
+        response = await fn()
+    except BaseException:
+        await run_in_threadpool(_safe, _release, key)
+        raise
+    await run_in_threadpool(_safe, _store, key, response)
+    return response
+
+
+def _safe(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        logger.warning("⚠️ [IDEMPOTÊNCIA] Falha ao atualizar o Redis: %s", e)
+
+
+async def run_once(key: str, fn):
+    """
+    Aguarda fn() (uma corrotina) uma única vez por chave. Reenvios
+    simultâneos no mesmo worker aguardam o mesmo resultado (ou a mesma exceção).
+    """
+    existing = _inflight.get(key)
+    if existing is not None:
+        IDEMPOTENT_REQUESTS.inc(result="inflight")
+        logger.info("🔁 [IDEMPOTÊNCIA] Reenvio de %s anexado à requisição em andamento", key)
+        return await asyncio.shield(existing)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        response = await _execute(key, fn)
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Evita o aviso de exceção não lida quando não há reenvios aguardando
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
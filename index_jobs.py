@@ -0,0 +1,188 @@
+# index_jobs.py
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import get_logger
+from callbacks import allowed_callback_url, post_callback
+from deadline import clear_deadline
+from generateChunks import generate_vectorized_chunks
+from lexical_index import store_document_index
+from metrics import Counter, Gauge, stage_timer
+
+# ==============================================================================
+#  FILA DE INDEXAÇÃO EM SEGUNDO PLANO
+#  Documentos grandes demoram para fatiar e vetorizar. No modo assíncrono o
+#  POST /index-document devolve um job_id na hora e um pool próprio (separado
+#  do threadpool que atende o chat) processa o job, gravando status, progresso
+#  e resultado no Redis. O resultado é lido em GET /index-jobs/{id} ou enviado
+#  para a callback_url informada.
+#
+#  Com o hotel informado, os chunks também entram no índice BM25 do hotel
+#  (lexical_index), usado junto com a busca vetorial no RAG.
+# ==============================================================================
+
+logger = get_logger("index_jobs")
+
+# Jobs processados ao mesmo tempo por worker
+INDEX_JOB_WORKERS = int(os.getenv("INDEX_JOB_WORKERS", "2"))
+# Jobs aguardando na fila antes de recusar novos
+INDEX_JOB_MAX_QUEUE = int(os.getenv("INDEX_JOB_MAX_QUEUE", "20"))
+# Por quanto tempo status e resultado ficam no Redis (segundos)
+INDEX_JOB_TTL = int(os.getenv("INDEX_JOB_TTL", "86400"))
+
+INDEX_JOBS = Counter(
+    "index_jobs_total",
+    "Jobs de indexação por status final.",
+    ["status"],
+)
+INDEX_JOBS_QUEUED = Gauge(
+    "index_jobs_queued",
+    "Jobs de indexação aguardando ou em execução neste worker.",
+)
+
+_executor = ThreadPoolExecutor(max_workers=INDEX_JOB_WORKERS, thread_name_prefix="index-job")
+_queued = 0
+_queued_lock = threading.Lock()
+# Jobs ainda na fila (não iniciados): job_id -> Future do executor
+_waiting = {}
+
+
+class QueueFullError(RuntimeError):
+    """A fila de indexação deste worker está cheia."""
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _save(job_id: str, job: dict):
+    _redis().set(f"index_job:{job_id}", json.dumps(job, ensure_ascii=False), ex=INDEX_JOB_TTL)
+
+
+def get_job(job_id: str):
+    """Retorna o job salvo no Redis ou None se não existir (ou tiver expirado)."""
+    raw = _redis().get(f"index_job:{job_id}")
+    return json.loads(raw) if raw else None
+
+
+def _notify(job: dict, callback_url: str):
+    try:
+        # Corpo assinado (HMAC): a callback_url vem do cliente e não recebe a API_SECRET_KEY
+        post_callback(callback_url, job)
+        logger.info("📨 [INDEXAÇÃO] Resultado do job %s enviado para o callback", job["job_id"])
+    except Exception as e:
+        logger.error("❌ [INDEXAÇÃO] Falha ao chamar o callback do job %s: %s", job["job_id"], e)
+
+
+def store_lexical_index(hotel_id: str, vectorized_chunks: list[dict], document_id: str = None):
+    """Indexa os chunks no BM25 do hotel; uma falha aqui não invalida os embeddings gerados."""
+    try:
+        store_document_index(
+            hotel_id,
+            [chunk["content"] for chunk in vectorized_chunks],
+            document_id,
+            [chunk["embedding"] for chunk in vectorized_chunks],
+        )
+    except Exception as e:
+        logger.error("❌ [INDEXAÇÃO] Falha ao montar o índice lexical do hotel %s: %s", hotel_id, e)
+
+
+def _run_job(job: dict, full_text: str, callback_url: str = None, hotel_id: str = None, document_id: str = None):
+    global _queued
+    # O job herda o contexto da requisição, mas não o prazo dela
+    clear_deadline()
+    job_id = job["job_id"]
+    with _queued_lock:
+        _waiting.pop(job_id, None)
+    try:
+        job.update(status="running", started_at=time.time())
+        _save(job_id, job)
+
+        def on_progress(done: int, total: int):
+            job["progress"] = {"done": done, "total": total}
+            _save(job_id, job)
+
+        try:
+            with stage_timer("index_job"):
+                job["result"] = generate_vectorized_chunks(full_text, on_progress=on_progress)
+                if hotel_id:
+                    store_lexical_index(hotel_id, job["result"], document_id)
+            job["status"] = "done"
+        except Exception as e:
+            logger.error("❌ [INDEXAÇÃO] Job %s falhou: %s", job_id, e)
+            job.update(status="failed", error=str(e))
+        job["finished_at"] = time.time()
+        INDEX_JOBS.inc(status=job["status"])
+        _save(job_id, job)
+        logger.info("🏭 [INDEXAÇÃO] Job %s finalizado com status %s", job_id, job["status"])
+
+        if callback_url:
+            _notify(job, callback_url)
+    except Exception as e:
+        # Falha ao gravar no Redis: o job fica sem status consultável
+        logger.error("❌ [INDEXAÇÃO] Erro ao atualizar o job %s: %s", job_id, e)
+    finally:
+        with _queued_lock:
+            _queued -= 1
+            INDEX_JOBS_QUEUED.set(_queued)
+
+
+def submit_index_job(full_text: str, callback_url: str = None, hotel_id: str = None, document_id: str = None) -> dict:
+    """
+    Registra o job no Redis e agenda o processamento. Levanta QueueFullError se
+    a fila deste worker estiver cheia e ValueError se a callback_url não for do
+    Gateway (callbacks.allowed_callback_url).
+    """
+    global _queued
+    if not full_text.strip():
+        raise ValueError("O texto do documento está vazio ou inválido.")
+    if callback_url and not allowed_callback_url(callback_url):
+        raise ValueError("callback_url não permitida: use o host do Gateway ou um de CALLBACK_ALLOWED_HOSTS.")
+
+    with _queued_lock:
+        if _queued >= INDEX_JOB_WORKERS + INDEX_JOB_MAX_QUEUE:
+            raise QueueFullError("Fila de indexação cheia, tente novamente mais tarde.")
+        _queued += 1
+        INDEX_JOBS_QUEUED.set(_queued)
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "created_at": time.time(),
+        "progress": {"done": 0, "total": 0},
+    }
+    try:
+        _save(job["job_id"], job)
+        # Leva o ID de correlação e o trace da requisição para a thread do job
+        with _queued_lock:
+            _waiting[job["job_id"]] = _executor.submit(contextvars.copy_context().run, _run_job, dict(job), full_text, callback_url, hotel_id, document_id)
+    except Exception:
+        with _queued_lock:
+            _queued -= 1
+            INDEX_JOBS_QUEUED.set(_queued)
+        raise
+    logger.info("🏭 [INDEXAÇÃO] Job %s enfileirado (%s caracteres)", job["job_id"], len(full_text))
+    return job
+
+
+def shutdown():
+    """
+    Desligamento do worker: espera os jobs em execução e marca como falhos os que
+    ainda não começaram (o cliente deve reenviá-los).
+    """
+    for job_id, future in list(_waiting.items()):
+        if future.cancel():
+            try:
+                job = get_job(job_id) or {"job_id": job_id}
+                job.update(status="failed", error="Worker encerrado antes do início da indexação; envie o documento novamente.")
+                _save(job_id, job)
+            except Exception as e:
+                logger.error("❌ [INDEXAÇÃO] Erro ao marcar o job %s como interrompido: %s", job_id, e)
+    _executor.shutdown(wait=True)
@@ -5,18 +5,31 @@ import requests # Para chamar seu Gateway Node.js
 # maxsize=100: Guarda os dados dos 100 hotéis mais recentemente ativos.
 # Quando o 101º chegar, o menos usado recentemente é removido automaticamente.
 hotel_cache = LRUCache(maxsize=100) 
+# Último conhecimento obtido com sucesso de cada hotel (não é limpo pela invalidação):
+# usado quando o Gateway está fora, marcado como desatualizado
+last_good_knowledge = LRUCache(maxsize=100)
 from dotenv import load_dotenv
 load_dotenv()
 import os
+from app_logging import get_logger
+from metrics import stage_timer, CACHE_REQUESTS
+from tracing import traced, inject_trace_headers
+from room_index import room_index_for
+from circuit_breaker import GATEWAY_TIMEOUT, KNOWLEDGE_BREAKER
+from deadline import timeout as deadline_timeout
+
+logger = get_logger("knowledge_service")
 API_SECRET_KEY = os.getenv("API_SECRET_KEY")
 
+@traced()
 def get_knowledge_for_hotel(user_id: str):
     """
     Função principal. Busca o conhecimento de um hotel, usando o cache primeiro.
     """
     # Passo 1: Tenta buscar do cache primeiro
     if user_id in hotel_cache:
-        print(f"✅ [Cache HIT] Conhecimento encontrado no cache para o hotel {user_id}.")
+        CACHE_REQUESTS.inc(cache="hotel_cache", result="hit")
+        logger.info("✅ [Cache HIT] Conhecimento encontrado no cache para o hotel %s.", user_id)
         return hotel_cache[user_id]
 
     auth_headers = {
@@ -26,20 +39,33 @@ def get_knowledge_for_hotel(user_id: str):
     }
 
     # Passo 2: Se não está no cache (Cache MISS), busca nos serviços externos
-    print(f"⚠️ [Cache MISS] Buscando conhecimento do banco para o hotel {user_id}.")
+    logger.info("⚠️ [Cache MISS] Buscando conhecimento do banco para o hotel %s.", user_id)
+    CACHE_REQUESTS.inc(cache="hotel_cache", result="miss")
 
    
 
     # Chamada para buscar a lista de quartos no seu Gateway
-    rooms_response = requests.post(f"{os.getenv('BACKEND_URL')}/rooms/get-catalog", headers=auth_headers)
-    rooms_list = rooms_response.json()
+    try:
+        with stage_timer("gateway_rooms_catalog"):
+            rooms_list = KNOWLEDGE_BREAKER.call(_fetch_rooms_catalog, auth_headers)
+    except Exception as e:
+        stale = last_good_knowledge.get(user_id)
+        if stale is None:
+            raise
+        logger.warning("⚠️ [Cache STALE] Gateway indisponível (%s), usando o último catálogo do hotel %s.", e, user_id)
+        # Não vai para o hotel_cache: a próxima mensagem tenta o Gateway de novo
+        return dict(stale, aviso="Catálogo da última consulta bem-sucedida; pode estar desatualizado. Confirme disponibilidade e preços antes de reservar.")
 
    
 
     # Formata a lista de quartos para texto (como discutimos)
     formatted_rooms = _format_rooms_for_llm(rooms_list)
 
-    print(f"🛏️ Lista de quartos para o hotel {user_id}: {formatted_rooms}")  # Log da lista de quartos
+    # Índice de nomes dos quartos, pronto para resolver o quarto citado pelo hóspede
+    if isinstance(rooms_list, dict) and rooms_list.get('data'):
+        room_index_for(rooms_list['data'])
+
+    logger.debug("🛏️ Lista de quartos para o hotel %s: %s", user_id, formatted_rooms)  # Log da lista de quartos
 
     knowledge = {       
         "contexto_quartos": formatted_rooms
@@ -47,17 +73,27 @@ def get_knowledge_for_hotel(user_id: str):
 
     # Passo 3: Salva o conhecimento recém-buscado no cache para a próxima vez
     hotel_cache[user_id] = knowledge
-    print(f"🧠 Conhecimento armazenado no cache para o hotel {user_id}.", hotel_cache[user_id])
+    last_good_knowledge[user_id] = knowledge
+    logger.info("🧠 Conhecimento armazenado no cache para o hotel %s.", user_id)
 
     return knowledge
 
+def _fetch_rooms_catalog(auth_headers: dict):
+    rooms_response = requests.post(
+        f"{os.getenv('BACKEND_URL')}/rooms/get-catalog",
+        headers=inject_trace_headers(auth_headers),
+        timeout=deadline_timeout(GATEWAY_TIMEOUT),
+    )
+    rooms_response.raise_for_status()
+    return rooms_response.json()
+
 def invalidate_cache_for_hotel(user_id: str):
     """
     Remove o conhecimento de um hotel específico do cache.
     """
     if user_id in hotel_cache:
         del hotel_cache[user_id]
-        print(f"🧹 [Cache CLEARED] Cache invalidado para o hotel {user_id}.")
+        logger.info("🧹 [Cache CLEARED] Cache invalidado para o hotel %s.", user_id)
         return True
     return False
 
@@ -0,0 +1,161 @@
+# lead_queue.py
+
+import asyncio
+import os
+import time
+import uuid
+
+from redis import WatchError
+from starlette.concurrency import run_in_threadpool
+
+from app_logging import get_logger
+from metrics import Counter, STAGE_LATENCY
+
+# ==============================================================================
+#  EXECUÇÃO ORDENADA POR LEAD
+#  Hóspedes costumam mandar várias mensagens seguidas. Processadas em paralelo,
+#  elas disputam a mesma sessão (session:{número}) e podem ser respondidas fora
+#  de ordem. Aqui os turnos de um mesmo lead entram em fila (lock por lead neste
+#  worker + lease no Redis entre workers); leads diferentes seguem em paralelo.
+#
+#  Com LEAD_BURST_WINDOW_MS > 0, mensagens do mesmo lead que chegam dentro da
+#  janela (ou enquanto um turno dele está em andamento) viram um único turno.
+# ==============================================================================
+
+logger = get_logger("lead_queue")
+
+# Espera por mensagens seguidas antes de iniciar o turno (0 = não agrupar)
+LEAD_BURST_WINDOW_MS = int(os.getenv("LEAD_BURST_WINDOW_MS", "0"))
+# Validade do lease no Redis; deve cobrir um turno inteiro (segundos)
+LEAD_LEASE_TTL = int(os.getenv("LEAD_LEASE_TTL", "120"))
+# Tempo máximo esperando o lease de outro worker antes de seguir sem ele (segundos)
+LEAD_LEASE_WAIT = float(os.getenv("LEAD_LEASE_WAIT", "60"))
+_POLL_INTERVAL = 0.05
+
+MERGED_MESSAGES = Counter(
+    "lead_merged_messages_total",
+    "Mensagens agrupadas no turno de outra mensagem do mesmo lead.",
+)
+
+
+class _LeadState:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = []  # [(mensagem, Future)] aguardando turno, em ordem de chegada
+        self.users = 0
+
+
+# Filas ativas neste worker: número do lead -> estado
+_leads: dict[str, _LeadState] = {}
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _try_lease(key: str, token: str) -> bool:
+    return bool(_redis().set(key, token, nx=True, ex=LEAD_LEASE_TTL))
+
+
+def _release_lease(key: str, token: str):
+    # Só apaga se o lease ainda for nosso (pode ter expirado e sido pego por outro worker)
+    with _redis().pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.get(key) == token:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+            else:
+                pipe.unwatch()
+        except WatchError:
+            pass
+
+
+async def _acquire_lease(lead: str):
+    """Obtém o lease do lead no Redis. Retorna o token ou None se seguir sem ele."""
+    key = f"lease:lead:{lead}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LEAD_LEASE_WAIT
+    try:
+        while not await run_in_threadpool(_try_lease, key, token):
+            if time.monotonic() >= deadline:
+                logger.warning("⚠️ [FILA] Lease de %s não liberado em %ss, seguindo sem ele", lead, LEAD_LEASE_WAIT)
+                return None
+            await asyncio.sleep(_POLL_INTERVAL)
+    except Exception as e:
+        # Sem Redis, a ordem fica garantida apenas dentro deste worker
+        logger.warning("⚠️ [FILA] Redis indisponível para o lease de %s: %s", lead, e)
+        return None
+    return token
+
+
+async def _run_turn(lead: str, message: str, fn):
+    token = await _acquire_lease(lead)
+    try:
+        return await run_in_threadpool(fn, message)
+    finally:
+        if token:
+            try:
+                await run_in_threadpool(_release_lease, f"lease:lead:{lead}", token)
+            except Exception as e:
+                logger.warning("⚠️ [FILA] Falha ao liberar o lease de %s: %s", lead, e)
+
+
+async def run_for_lead(lead: str, message: str, fn):
+    """
+    Executa fn(mensagem) (síncrona, no threadpool) na vez do lead. Sem número de
+    lead, executa direto. Quando mensagens são agrupadas, fn recebe os textos
+    unidos por quebra de linha; a resposta vai para a última mensagem e as
+    anteriores recebem {"response_gemini": "", "merged": True}.
+    """
+    if not lead:
+        return await run_in_threadpool(fn, message)
+
+    state = _leads.get(lead)
+    if state is None:
+        state = _leads[lead] = _LeadState()
+    state.users += 1
+    entry = asyncio.get_running_loop().create_future()
+    state.pending.append((message, entry))
+    queued_at = time.perf_counter()
+    try:
+        async with state.lock:
+            STAGE_LATENCY.observe(time.perf_counter() - queued_at, stage="lead_queue_wait")
+            if entry.done():
+                # Já respondida no turno de uma mensagem anterior
+                return entry.result()
+
+            if LEAD_BURST_WINDOW_MS > 0:
+                await asyncio.sleep(LEAD_BURST_WINDOW_MS / 1000)
+                batch, state.pending = state.pending, []
+            else:
+                batch = [(message, entry)]
+                state.pending.remove(batch[0])
+
+            if len(batch) > 1:
+                MERGED_MESSAGES.inc(len(batch) - 1)
+                logger.info("🧩 [FILA] %d mensagens de %s agrupadas em um turno", len(batch), lead)
+
+            try:
+                response = await _run_turn(lead, "\n".join(m for m, _ in batch), fn)
+            except asyncio.CancelledError:
+                # As demais mensagens do grupo voltam para a fila
+                state.pending[:0] = [item for item in batch if item[1] is not entry]
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if future is not entry and not future.done():
+                        future.set_exception(e)
+                raise
+            for _, future in batch[:-1]:
+                if not future.done():
+                    future.set_result({"response_gemini": "", "merged": True})
+            if not batch[-1][1].done():
+                batch[-1][1].set_result(response)
+            return entry.result()
+    finally:
+        state.users -= 1
+        if state.users == 0:
+            _leads.pop(lead, None)
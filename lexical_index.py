@@ -0,0 +1,189 @@
+# lexical_index.py
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter as TermCounter
+from collections import defaultdict
+
+from cachetools import LRUCache
+
+from app_logging import get_logger
+from date_parser import normalize
+
+# ==============================================================================
+#  ÍNDICE LEXICAL (BM25) DOS DOCUMENTOS DO HOTEL
+#  A busca vetorial do Gateway erra perguntas de termo exato ("estacionamento",
+#  "taxa de pet", horários como "13:43"). Na indexação, os mesmos chunks enviados
+#  ao Gateway são tokenizados aqui e guardados no Redis (rag_lexical:{hotel}, um
+#  campo por documento). Cada worker monta o índice invertido BM25 do hotel na
+#  primeira consulta e o reaproveita até a próxima indexação (campo _version).
+#  O resultado da busca lexical é combinado com o vetorial por reciprocal rank
+#  fusion (RRF), o que dá mais precisão com poucos chunks no prompt. Os
+#  embeddings dos chunks vão junto, para a seleção do contexto sem redundância.
+# ==============================================================================
+
+logger = get_logger("lexical_index")
+
+# Parâmetros do BM25: saturação da frequência do termo e normalização pelo tamanho do chunk
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Constante do RRF: quanto maior, menos peso para as primeiras posições de cada lista
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+_VERSION_FIELD = "_version"
+# Horários ("13:43", "22h") contam como um termo só
+_TOKEN_RE = re.compile(r"\d{1,2}(?::\d{2}|h\d{0,2})|[a-z0-9]+")
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "da", "do", "das", "dos", "e", "ou", "em", "no", "na",
+    "nos", "nas", "por", "para", "pra", "com", "sem", "que", "se", "ao", "aos", "qual", "quais", "como",
+    "eu", "voce", "voces", "meu", "minha", "seu", "sua", "ser", "ter", "tem", "ha", "ja", "mais", "muito",
+    "isso", "esse", "essa", "este", "esta", "ai", "ate", "sao", "foi", "pode", "posso", "sobre",
+}
+
+# Índices por hotel neste worker: hotel -> (versão, índice)
+_indexes = LRUCache(maxsize=int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", "128")))
+_indexes_lock = threading.Lock()
+
+
+def _stem(token: str) -> str:
+    # Plurais comuns: "regras" -> "regra", "animais" -> "animal", "refeicoes" -> "refeicao"
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("oes") or token.endswith("aes"):
+        return token[:-3] + "ao"
+    if token.endswith("ais"):
+        return token[:-2] + "l"
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Termos do texto: sem acentos, minúsculas, sem stopwords e no singular."""
+    return [_stem(t) for t in _TOKEN_RE.findall(normalize(text or "")) if t not in _STOPWORDS]
+
+
+class Bm25Index:
+    """Índice invertido BM25 de uma lista de chunks (com as frequências já calculadas na indexação)."""
+
+    def __init__(self, chunks: list[str], term_frequencies: list[dict] = None, embeddings: list = None):
+        self.chunks = chunks
+        # Embedding de cada chunk (quando guardado na indexação), para a seleção do contexto
+        self.embeddings = {chunk: vector for chunk, vector in zip(chunks, embeddings or []) if vector}
+        term_frequencies = term_frequencies or [TermCounter(tokenize(chunk)) for chunk in chunks]
+        self._postings = defaultdict(list)  # termo -> [(chunk, frequência)]
+        self._lengths = []
+        for i, frequencies in enumerate(term_frequencies):
+            for term, count in frequencies.items():
+                self._postings[term].append((i, count))
+            self._lengths.append(sum(frequencies.values()))
+        total = len(chunks)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, limit: int = 3) -> list[str]:
+        """Chunks mais relevantes para a consulta, do melhor para o pior (só os que têm algum termo)."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, count in self._postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self._lengths[i] / self._avg_length
+                scores[i] += idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.chunks[i] for i, _ in ranked[:limit]]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], limit: int = None) -> list[tuple[str, float]]:
+    """
+    Combina listas ordenadas de chunks: cada chunk soma 1 / (RRF_K + posição) em
+    cada lista. Retorna [(chunk, pontuação)] da maior para a menor pontuação.
+    """
+    scores = {}
+    for ranking in rankings:
+        for position, chunk in enumerate(ranking, start=1):
+            scores[chunk] = scores.get(chunk, 0.0) + 1.0 / (RRF_K + position)
+    # Empates mantêm a ordem de chegada (a busca vetorial vem primeiro)
+    return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+
+def _redis():
+    from gemini import get_redis_client
+    return get_redis_client()
+
+
+def _key(hotel_id: str) -> str:
+    return f"rag_lexical:{hotel_id}"
+
+
+def _check_document_id(document_id: str):
+    if not document_id or document_id == _VERSION_FIELD:
+        raise ValueError("document_id inválido ou ausente.")
+
+
+def store_document_index(hotel_id: str, chunks: list[str], document_id: str = None, embeddings: list = None):
+    """
+    Guarda os chunks de um documento do hotel já tokenizados, com os embeddings
+    (substitui a versão anterior do mesmo document_id), e invalida os índices
+    montados nos workers. O document_id é obrigatório: sem ele não há como
+    substituir ou remover o documento depois.
+    """
+    _check_document_id(document_id)
+    entry = {"chunks": chunks, "terms": [TermCounter(tokenize(chunk)) for chunk in chunks]}
+    if embeddings:
+        # 5 casas bastam para comparar chunks e reduzem o JSON pela metade
+        entry["embeddings"] = [[round(x, 5) for x in vector] for vector in embeddings]
+    pipe = _redis().pipeline(transaction=True)
+    pipe.hset(_key(hotel_id), document_id, json.dumps(entry, ensure_ascii=False))
+    pipe.hincrby(_key(hotel_id), _VERSION_FIELD, 1)
+    pipe.execute()
+    logger.info("🔤 [BM25] %d chunks do documento '%s' indexados para o hotel %s",
+                len(chunks), document_id, hotel_id)
+
+
+def delete_document_index(hotel_id: str, document_id: str) -> bool:
+    """Remove o documento do índice do hotel (e invalida os índices montados). False se ele não existia."""
+    _check_document_id(document_id)
+    redis_client = _redis()
+    removed = redis_client.hdel(_key(hotel_id), document_id)
+    if removed:
+        redis_client.hincrby(_key(hotel_id), _VERSION_FIELD, 1)
+    logger.info("🔤 [BM25] Documento '%s' %s do índice do hotel %s",
+                document_id, "removido" if removed else "não encontrado", hotel_id)
+    return bool(removed)
+
+
+def index_version(hotel_id: str) -> int:
+    """Versão do índice lexical do hotel (0 se ele nunca foi indexado com hotel)."""
+    return int(_redis().hget(_key(hotel_id), _VERSION_FIELD) or 0)
+
+
+def lexical_index_for(hotel_id: str, version: int):
+    """Índice BM25 do hotel na versão informada (montado uma vez por worker) ou None se não houver."""
+    with _indexes_lock:
+        cached = _indexes.get(hotel_id)
+    if cached and cached[0] == version:
+        return cached[1]
+    if not version:
+        return None
+
+    chunks, term_frequencies, embeddings = [], [], []
+    for field, raw in sorted(_redis().hgetall(_key(hotel_id)).items()):
+        if field == _VERSION_FIELD:
+            continue
+        entry = json.loads(raw)
+        chunks.extend(entry["chunks"])
+        term_frequencies.extend(entry["terms"])
+        embeddings.extend(entry.get("embeddings") or [None] * len(entry["chunks"]))
+    index = Bm25Index(chunks, term_frequencies, embeddings)
+    with _indexes_lock:
+        _indexes[hotel_id] = (version, index)
+    logger.debug("🔤 [BM25] Índice do hotel %s montado (versão %s, %d chunks)", hotel_id, version, len(chunks))
+    return index
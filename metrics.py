@@ -0,0 +1,210 @@
+# metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ==============================================================================
+#  MÉTRICAS EM PROCESSO (FORMATO PROMETHEUS)
+#  Agregação leve em memória, exposta em texto pelo endpoint /metrics.
+#  Cada worker mantém os próprios contadores; o Prometheus soma entre workers.
+# ==============================================================================
+
+# Buckets em segundos: cobrem desde operações de Redis (ms) até chamadas lentas ao Gemini.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Para cada combinação de labels: [contagens por bucket (+Inf no fim), soma, total]
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> dict:
+        """Cópia dos valores atuais: {labels: {"count", "sum", "buckets"}}."""
+        with self._lock:
+            return {
+                key: {"count": s[2], "sum": s[1], "buckets": list(s[0])}
+                for key, s in self._series.items()
+            }
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total_sum, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total_sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Gera o texto no formato de exposição do Prometheus com todas as métricas registradas."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas da aplicação ---
+
+STAGE_LATENCY = Histogram(
+    "whatsapp_stage_duration_seconds",
+    "Duração de cada etapa do processamento de uma mensagem.",
+    ["stage"],
+)
+TOOL_LATENCY = Histogram(
+    "gemini_tool_duration_seconds",
+    "Duração da execução de cada ferramenta chamada pelo modelo.",
+    ["tool"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Consultas a caches (hotel_cache, gemini_cached_content) por resultado.",
+    ["cache", "result"],
+)
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total",
+    "Tokens consumidos nas chamadas ao Gemini por tipo.",
+    ["type"],
+)
+ERRORS = Counter(
+    "errors_total",
+    "Erros por etapa e classe de exceção.",
+    ["stage", "error"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Mede a duração de uma etapa e conta a exceção, se houver, antes de repassá-la."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.inc(stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_token_usage(usage_metadata):
+    """Soma os tokens de uma resposta do Gemini (usage_metadata) por tipo."""
+    if not usage_metadata:
+        return
+    for token_type, attr in (
+        ("prompt", "prompt_token_count"),
+        ("candidates", "candidates_token_count"),
+        ("cached", "cached_content_token_count"),
+        ("thoughts", "thoughts_token_count"),
+        ("total", "total_token_count"),
+    ):
+        value = getattr(usage_metadata, attr, None)
+        if value:
+            GEMINI_TOKENS.inc(value, type=token_type)
@@ -0,0 +1,201 @@
+# rate_limiter.py
+
+import os
+import random
+import threading
+import time
+
+from app_logging import get_logger
+from deadline import timeout as request_timeout
+from metrics import Counter, Gauge, Histogram
+
+# ==============================================================================
+#  LIMITADOR DE TAXA ADAPTATIVO (CLIENTE)
+#  As chamadas ao Gemini passam por dois baldes de fichas: requisições e tokens
+#  por minuto. O custo em tokens é estimado pela média do usage_metadata das
+#  respostas anteriores e corrigido quando a resposta chega. Em 429 /
+#  RESOURCE_EXHAUSTED a taxa cai pela metade e volta a subir aos poucos (AIMD).
+#  Excesso de tráfego espera na fila (até um prazo) em vez de falhar na hora.
+#
+#  Os limites valem por worker: com N workers, configure cota / N.
+# ==============================================================================
+
+logger = get_logger("rate_limiter")
+
+# Fração mínima da taxa configurada após reduções seguidas
+_MIN_FACTOR = 0.05
+# Quanto a taxa volta a subir a cada chamada bem-sucedida (fração da configurada)
+_ADDITIVE_INCREASE = 0.02
+# Intervalo mínimo entre duas reduções (vários 429 simultâneos contam como um)
+_DECREASE_COOLDOWN = 1.0
+# Rajada permitida: segundos de taxa acumulados no balde
+_BURST_SECONDS = 5
+
+RATE_LIMIT_WAIT = Histogram(
+    "rate_limit_wait_seconds",
+    "Tempo de espera na fila do limitador antes da chamada.",
+    ["limiter"],
+)
+RATE_LIMITED = Counter(
+    "rate_limited_total",
+    "Chamadas por limitador e resultado (throttled = 429 do provedor, timeout = prazo da fila esgotado).",
+    ["limiter", "result"],
+)
+RATE_LIMIT_FACTOR = Gauge(
+    "rate_limit_factor",
+    "Fração da taxa configurada em uso pelo limitador (1 = sem redução).",
+    ["limiter"],
+)
+
+
+class RateLimitTimeout(RuntimeError):
+    """A chamada não conseguiria ser feita dentro do prazo da fila."""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Reconhece 429 / RESOURCE_EXHAUSTED do google-genai e do google-generativeai."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    error_str = str(error)
+    return "RESOURCE_EXHAUSTED" in error_str or "429" in error_str[:20]
+
+
+class TokenBucket:
+    """Balde de fichas com reserva: quem chega reserva a vez e dorme o tempo devido."""
+
+    def __init__(self, per_minute: float):
+        self.base_rate = per_minute / 60
+        self.rate = self.base_rate
+        self.capacity = max(self.base_rate * _BURST_SECONDS, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float):
+        # Pode ficar negativo: o déficit é a fila dos próximos
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        # Corrige a reserva quando o custo real é conhecido (negativo devolve fichas)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def set_factor(self, factor: float, now: float):
+        self._refill(now)
+        self.rate = self.base_rate * factor
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float = 0,
+                 initial_token_estimate: float = 2000, max_wait: float = 10.0, max_retries: int = 2):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.token_estimate = initial_token_estimate
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.factor = 1.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        RATE_LIMIT_FACTOR.set(1.0, limiter=name)
+
+    def _buckets(self):
+        return [b for b in (self.requests, self.tokens) if b is not None]
+
+    def acquire(self, deadline: float) -> float:
+        """Reserva uma requisição e os tokens estimados. Retorna a estimativa usada."""
+        with self._lock:
+            now = time.monotonic()
+            estimate = self.token_estimate
+            wait = max((b.wait_time(1 if b is self.requests else estimate, now) for b in self._buckets()), default=0.0)
+            if now + wait > deadline:
+                RATE_LIMITED.inc(limiter=self.name, result="timeout")
+                raise RateLimitTimeout(f"Limite de taxa de {self.name}: espera de {wait:.1f}s excede o prazo")
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(estimate)
+        RATE_LIMIT_WAIT.observe(wait, limiter=self.name)
+        if wait > 0:
+            time.sleep(wait)
+        return estimate
+
+    def record_usage(self, estimate: float, actual_tokens):
+        if not actual_tokens:
+            return
+        with self._lock:
+            if self.tokens:
+                self.tokens.adjust(actual_tokens - estimate)
+            # Média móvel exponencial do custo real
+            self.token_estimate = 0.8 * self.token_estimate + 0.2 * actual_tokens
+
+    def on_success(self):
+        if self.factor >= 1.0:
+            return
+        with self._lock:
+            self._set_factor(min(1.0, self.factor + _ADDITIVE_INCREASE))
+
+    def on_rate_limited(self):
+        RATE_LIMITED.inc(limiter=self.name, result="throttled")
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < _DECREASE_COOLDOWN:
+                return
+            self._last_decrease = now
+            self._set_factor(max(_MIN_FACTOR, self.factor / 2))
+            logger.warning("🐢 [RATE LIMIT] %s recebeu 429, taxa reduzida para %.0f%%", self.name, self.factor * 100)
+
+    def _set_factor(self, factor: float):
+        self.factor = factor
+        now = time.monotonic()
+        for bucket in self._buckets():
+            bucket.set_factor(factor, now)
+        RATE_LIMIT_FACTOR.set(round(factor, 3), limiter=self.name)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Executa fn(*args, **kwargs) respeitando o limite. Em 429, reduz a taxa e tenta
+        de novo (até max_retries) enquanto houver prazo; depois repassa o erro.
+        """
+        # A espera na fila também respeita o prazo da requisição
+        deadline = time.monotonic() + request_timeout(self.max_wait)
+        attempt = 0
+        while True:
+            estimate = self.acquire(deadline)
+            try:
+                response = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self.on_rate_limited()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                # Pequeno jitter para os que receberam 429 juntos não voltarem juntos
+                time.sleep(random.uniform(0, 0.25 * attempt))
+                continue
+            self.on_success()
+            usage = getattr(response, "usage_metadata", None)
+            self.record_usage(estimate, getattr(usage, "total_token_count", None))
+            return response
+
+
+GEMINI_LIMITER = AdaptiveRateLimiter(
+    "gemini",
+    requests_per_minute=float(os.getenv("GEMINI_RPM", "1000")),
+    tokens_per_minute=float(os.getenv("GEMINI_TPM", "1000000")),
+    initial_token_estimate=float(os.getenv("GEMINI_TOKEN_ESTIMATE", "4000")),
+    max_wait=float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", "10")),
+)
+EMBEDDING_LIMITER = AdaptiveRateLimiter(
+    "embedding",
+    requests_per_minute=float(os.getenv("EMBEDDING_RPM", "1500")),
+    max_wait=float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", "10")),
+)
@@ -0,0 +1,191 @@
+# retrieval_gate.py
+
+import math
+import operator
+import os
+import re
+import threading
+from typing import NamedTuple
+
+from cachetools import LRUCache
+
+from app_logging import get_logger
+from date_parser import normalize, parse_date
+from metrics import Counter
+
+# ==============================================================================
+#  PORTÃO DA BUSCA NOS DOCUMENTOS
+#  Toda mensagem pagava um embedding e uma busca vetorial no Gateway, inclusive
+#  "sim", "meu email é x@y.com", "Quero a suíte master" e datas no meio de uma
+#  reserva. Antes do RAG, regras locais (estado da reserva na sessão, palavras
+#  de assunto e formato da mensagem) decidem se o turno precisa dos documentos.
+#  Na dúvida, busca. Com RAG_GATE_EMBEDDING=true, as mensagens que as regras
+#  não decidem são comparadas com os chunks do hotel (embeddings guardados na
+#  indexação) e só buscam se forem parecidas com algum deles.
+#
+#  Respostas de "não tenho essa informação" em turnos sem busca são contadas
+#  como possíveis erros do portão (rag_gate_misses_total).
+# ==============================================================================
+
+logger = get_logger("retrieval_gate")
+
+# Liga o portão (false = todo turno busca nos documentos)
+RAG_GATE_ENABLED = os.getenv("RAG_GATE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Compara as mensagens indecisas com os chunks do hotel (custa um embedding, reaproveitado na busca)
+RAG_GATE_EMBEDDING = os.getenv("RAG_GATE_EMBEDDING", "false").lower() in ("1", "true", "yes")
+# Semelhança (cosseno) mínima com algum chunk do hotel para buscar
+RAG_GATE_MIN_SIMILARITY = float(os.getenv("RAG_GATE_MIN_SIMILARITY", "0.55"))
+
+RAG_GATE_DECISIONS = Counter(
+    "rag_gate_decisions_total",
+    "Decisões do portão da busca nos documentos por decisão (retrieve, skip) e motivo.",
+    ["decision", "reason"],
+)
+RAG_GATE_MISSES = Counter(
+    "rag_gate_misses_total",
+    "Turnos sem busca nos documentos em que o modelo disse não ter a informação.",
+)
+
+# Assuntos que estão nos documentos do hotel (regras, estrutura, políticas)
+_TOPIC_RE = re.compile(
+    r"\b(regras?|politicas?|horarios?|check-?in|check-?out|cancel\w*|reembols\w*|multas?|taxas?|pets?|animal|animais"
+    r"|cachorros?|gatos?|estacionamento|vagas?|garagem|cafe|almoco|jantar|refeic\w*|restaurante|piscinas?|academia"
+    r"|wi-?fi|internet|fum\w*|cigarro|visitas?|visitantes?|barulho|ruido|silencio|criancas?|idade|documentos?"
+    r"|endereco|localiza\w*|fica|chegar|transfer|aeroporto|praia|acessibilidade|cadeirantes?|lavanderia"
+    r"|toalhas?|roupas?\s+de\s+cama|ar[\s-]condicionado|frigobar|cofre|recepcao|funciona\w*|permitid\w*|pode\s+levar"
+    r"|aceita\w*|dinheiro|pix|cartao|parcel\w*|deposito|caucao)\b"
+)
+# Respostas curtas de confirmação, cumprimento ou agradecimento ("sim, pode", "ok obrigado")
+_ACK_RE = re.compile(
+    r"^(?:(?:sim|s|nao|ok|okay|blz|beleza|certo|isso|mesmo|pode|ser|claro|perfeito|otimo|show|massa|combinado"
+    r"|confirmo|confirmado|fechado|obrigad[oa]|muito|valeu|vlw|oi|ola|bom|boa|dia|tarde|noite|tchau|ate|mais|por|favor"
+    r"|\d+)\s*)+$"
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_PHONE_RE = re.compile(r"^\+?[\d\s().-]{8,}$")
+_NAME_RE = re.compile(r"^(meu nome (e|eh)|me chamo|sou (o|a))\b")
+# Pedidos de reserva sem dúvida sobre o hotel ("quero a suíte master", "fico com o quarto duplo")
+_BOOKING_RE = re.compile(r"\b(reserv\w*|quero|queria|gostaria|gostei|prefiro|escolho|fico com|pode fechar|quartos?|suites?)\b")
+# Perguntas, com ou sem "?" ("gostaria de saber se tem spa")
+_QUESTION_RE = re.compile(
+    r"\?|^(qual|quais|como|onde|quando|quanto|quantos|quantas|tem|voces|existe|ha|e possivel|posso)\b"
+    r"|\b(saber|duvidas?|informac\w*)\b"
+)
+_NON_WORD_RE = re.compile(r"[^\w@?+./:-]+")
+# Respostas do modelo que indicam falta de informação no contexto
+_MISS_RE = re.compile(
+    r"nao (tenho|possuo|encontrei|encontro|sei)\b.{0,40}\binforma|nao (tenho|possuo) (acesso a )?(essa|esta|esse|este) (informacao|dado)"
+    r"|sem informac\w* sobre|nao consta"
+)
+# Campos da sessão que indicam uma reserva em andamento
+_BOOKING_FIELDS = ("check_in_date", "check_out_date", "room_name", "room_id", "customer_name", "customer_email")
+
+# Embeddings das perguntas (texto normalizado -> vetor) e dos chunks dos hotéis ((hotel, versão) -> vetores)
+_question_embeddings = LRUCache(maxsize=int(os.getenv("RAG_GATE_EMBEDDING_CACHE_SIZE", "2048")))
+_topic_vectors = LRUCache(maxsize=128)
+_cache_lock = threading.Lock()
+
+
+class GateDecision(NamedTuple):
+    retrieve: bool
+    reason: str
+    # Embedding da pergunta, quando o portão já calculou (reaproveitado na busca)
+    query_embedding: list = None
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.hypot(*vector)
+    return [x / norm for x in vector] if norm else vector
+
+
+def _rule_decision(text: str, session_data: dict):
+    """(buscar?, motivo) pelas regras locais, ou None se elas não decidem."""
+    if _TOPIC_RE.search(text):
+        return True, "topic"
+    if _EMAIL_RE.search(text) or _PHONE_RE.match(text) or _NAME_RE.match(text):
+        return False, "personal_data"
+    is_question = bool(_QUESTION_RE.search(text))
+    if parse_date(text) and not is_question:
+        return False, "dates"
+    if _ACK_RE.match(text) or len(text) <= 2:
+        return False, "acknowledgement"
+    if is_question:
+        # "O quarto tem varanda?" cita o quarto, mas é dúvida sobre o hotel
+        return True, "question"
+    if _BOOKING_RE.search(text):
+        return False, "booking"
+    if any(session_data.get(field) for field in _BOOKING_FIELDS):
+        # No meio de uma reserva, mensagens que não são perguntas seguem o fluxo da reserva
+        return False, "booking_flow"
+    return None
+
+
+def _hotel_vectors(hotel_id: str):
+    from lexical_index import index_version, lexical_index_for
+
+    version = index_version(str(hotel_id))
+    if not version:
+        return None
+    with _cache_lock:
+        cached = _topic_vectors.get((hotel_id, version))
+    if cached is None:
+        index = lexical_index_for(str(hotel_id), version)
+        cached = [_unit(vector) for vector in index.embeddings.values()] if index else []
+        with _cache_lock:
+            _topic_vectors[(hotel_id, version)] = cached
+    return cached or None
+
+
+def _question_embedding(text: str, question: str):
+    from ExtractFromFile import generate_embeddings
+
+    with _cache_lock:
+        cached = _question_embeddings.get(text)
+    if cached is None:
+        cached = generate_embeddings([question], task_type="RETRIEVAL_QUERY")[0]
+        with _cache_lock:
+            _question_embeddings[text] = cached
+    return cached
+
+
+def _embedding_decision(hotel_id: str, text: str, question: str):
+    """Decisão pela semelhança com os chunks do hotel, ou None se não houver embeddings."""
+    try:
+        vectors = _hotel_vectors(hotel_id)
+        if not vectors:
+            return None
+        embedding = _question_embedding(text, question)
+        query = _unit(embedding)
+        best = max(sum(map(operator.mul, query, vector)) for vector in vectors)
+    except Exception as e:
+        logger.warning("⚠️ [PORTÃO RAG] Comparação com os tópicos do hotel falhou: %s", e)
+        return None
+    if best >= RAG_GATE_MIN_SIMILARITY:
+        return GateDecision(True, "similar_topic", embedding)
+    return GateDecision(False, "unrelated_topic", embedding)
+
+
+def gate_retrieval(hotel_id: str, question: str, session_data: dict = None) -> GateDecision:
+    """Decide se o turno precisa da busca nos documentos e registra a decisão."""
+    if not RAG_GATE_ENABLED:
+        decision = GateDecision(True, "disabled")
+    else:
+        text = _NON_WORD_RE.sub(" ", normalize(question or "")).strip(" .")
+        rule = _rule_decision(text, session_data or {})
+        if rule is not None:
+            decision = GateDecision(*rule)
+        else:
+            decision = (RAG_GATE_EMBEDDING and _embedding_decision(hotel_id, text, question)) or GateDecision(True, "default")
+    RAG_GATE_DECISIONS.inc(decision="retrieve" if decision.retrieve else "skip", reason=decision.reason)
+    if not decision.retrieve:
+        logger.info("🚪 [PORTÃO RAG] Turno sem busca nos documentos (%s)", decision.reason)
+    return decision
+
+
+def record_gate_reply(decision: GateDecision, reply: str):
+    """Conta como possível erro do portão a resposta sem informação num turno sem busca."""
+    if decision.retrieve or not reply:
+        return
+    if _MISS_RE.search(normalize(reply)):
+        RAG_GATE_MISSES.inc()
+        logger.warning("🚪 [PORTÃO RAG] Possível erro: turno sem busca (%s) respondeu sem a informação", decision.reason)
@@ -0,0 +1,203 @@
+# room_index.py
+
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+
+from cachetools import LRUCache
+
+from app_logging import get_logger
+from date_parser import normalize
+from metrics import Counter
+
+# ==============================================================================
+#  ÍNDICE DE NOMES DE QUARTOS
+#  O hóspede (e o modelo) escrevem o nome do quarto do jeito que der: sem
+#  acento, no plural, com erro de digitação ou dentro de uma frase ("quero a
+#  suite master"). O índice é montado uma vez por lista de quartos (catálogo do
+#  hotel ou disponibilidade) com nomes sem acento, tokens no singular e
+#  trigramas, e resolve o nome com uma pontuação de confiança. Nome ambíguo ou
+#  fraco não resolve: é melhor o modelo perguntar do que reservar o quarto errado.
+# ==============================================================================
+
+logger = get_logger("room_index")
+
+# Pontuação mínima (0 a 1) para aceitar um quarto
+ROOM_MATCH_MIN_SCORE = float(os.getenv("ROOM_MATCH_MIN_SCORE", "0.55"))
+# Diferença mínima para o segundo colocado; abaixo disso o nome é ambíguo
+ROOM_MATCH_MIN_MARGIN = float(os.getenv("ROOM_MATCH_MIN_MARGIN", "0.1"))
+# Semelhança (trigramas) para um token com erro de digitação contar como o token do nome
+_TOKEN_SIMILARITY = 0.5
+_STOPWORDS = {"a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "com", "para", "um", "uma", "no", "na"}
+# Palavras de pedido que aparecem junto do nome ("quero o duplo") e não são parte dele
+_REQUEST_WORDS = {
+    "quero", "queria", "gostaria", "reservar", "reserva", "prefiro", "escolho", "fico", "pode", "ser",
+    "esse", "essa", "este", "esta", "mesmo", "sim", "por", "favor", "opcao", "pessoa", "adulto", "crianca",
+}
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+ROOM_RESOLUTIONS = Counter(
+    "room_resolutions_total",
+    "Resoluções de nome de quarto por resultado (exact, fuzzy, ambiguous, not_found).",
+    ["result"],
+)
+
+# Índices por lista de quartos (id e nome); catálogo e disponibilidade do mesmo hotel compartilham
+_indexes = LRUCache(maxsize=int(os.getenv("ROOM_INDEX_CACHE_SIZE", "256")))
+_indexes_lock = threading.Lock()
+
+
+class RoomMatch(NamedTuple):
+    room_id: object
+    name: str
+    score: float
+
+
+def _fold(text: str) -> str:
+    return _NON_WORD_RE.sub(" ", normalize(text)).strip()
+
+
+def _singular(token: str) -> str:
+    # "suites" -> "suite", "duplos" -> "duplo", "chales" -> "chale"
+    return token[:-1] if len(token) > 3 and token.endswith("s") else token
+
+
+def _tokens(folded: str) -> list[str]:
+    return [_singular(t) for t in folded.split() if t not in _STOPWORDS]
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+class RoomIndex:
+    """Índice dos nomes de uma lista de quartos ({"id", "name", ...})."""
+
+    def __init__(self, rooms: list[dict]):
+        # Só id e nome: a disponibilidade muda a cada consulta, o índice não
+        self.rooms = [(room.get("id"), room["name"]) for room in rooms if room.get("name")]
+        self._exact = {}
+        self._trigram_postings = defaultdict(set)
+        self._room_tokens = []
+        self._room_trigrams = []
+        document_frequency = defaultdict(int)
+        for i, (_, name) in enumerate(self.rooms):
+            tokens = _tokens(_fold(name))
+            key = " ".join(tokens)
+            self._exact.setdefault(key, i)
+            trigrams = _trigrams(key)
+            for trigram in trigrams:
+                self._trigram_postings[trigram].add(i)
+            self._room_tokens.append(tokens)
+            self._room_trigrams.append(trigrams)
+            for token in set(tokens):
+                document_frequency[token] += 1
+        # Tokens presentes em muitos quartos ("quarto", "suite") pesam menos
+        total = len(self.rooms)
+        self._idf = {t: math.log(1 + total / df) for t, df in document_frequency.items()}
+        self._token_trigrams = {t: _trigrams(t) for t in document_frequency}
+
+    def _match(self, i: int, score: float) -> RoomMatch:
+        room_id, name = self.rooms[i]
+        return RoomMatch(room_id, name, round(min(score, 1.0), 3))
+
+    def _token_coverage(self, i: int, query_tokens: list[str], query_token_trigrams: list[tuple]):
+        """
+        Fração (ponderada) dos tokens do nome do quarto encontrados na consulta e
+        os tokens da consulta que corresponderam a algum deles.
+        """
+        tokens = self._room_tokens[i]
+        if not tokens:
+            return 0.0, set()
+        covered, used = 0.0, set()
+        for token in tokens:
+            if token in query_tokens:
+                covered += self._idf[token]
+                used.add(token)
+            elif len(token) >= 4:
+                best, query_token = max(
+                    ((_similarity(self._token_trigrams[token], trigrams), q) for q, trigrams in query_token_trigrams),
+                    default=(0.0, None),
+                )
+                if best >= _TOKEN_SIMILARITY:
+                    covered += self._idf[token] * best
+                    used.add(query_token)
+        return covered / sum(self._idf[t] for t in tokens), used
+
+    def matches(self, text: str, limit: int = 3) -> list[RoomMatch]:
+        """Quartos candidatos para o texto, do mais para o menos provável."""
+        query_tokens = _tokens(_fold(text or ""))
+        if not query_tokens:
+            return []
+        key = " ".join(query_tokens)
+        exact = self._exact.get(key)
+        if exact is not None:
+            return [self._match(exact, 1.0)]
+
+        query_trigrams = _trigrams(key)
+        candidates = set()
+        for trigram in query_trigrams:
+            candidates |= self._trigram_postings.get(trigram, set())
+        query_token_trigrams = [(t, _trigrams(t)) for t in query_tokens if len(t) >= 4]
+
+        scored = []
+        for i in candidates:
+            room_trigrams = self._room_trigrams[i]
+            # Quanto do nome do quarto aparece na consulta (a consulta pode ter palavras a mais)
+            containment = len(query_trigrams & room_trigrams) / len(room_trigrams)
+            coverage, used = self._token_coverage(i, query_tokens, query_token_trigrams)
+            score = 0.5 * containment + 0.5 * coverage
+            if coverage < 1.0 and any(
+                t not in used and t not in _REQUEST_WORDS and not t.isdigit() for t in query_tokens
+            ):
+                # Palavra da consulta no lugar de uma do nome ("quarto triplo" x "quarto duplo"): é outro quarto
+                score *= coverage
+            if f" {key} " in f" {' '.join(self._room_tokens[i])} ":
+                # A consulta é parte do nome ("master" em "suite master")
+                score = max(score, 0.8)
+            scored.append((score, i))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self._match(i, score) for score, i in scored[:limit]]
+
+    def resolve(self, text: str):
+        """Melhor quarto para o texto (RoomMatch) ou None se fraco ou ambíguo."""
+        candidates = self.matches(text, limit=2)
+        if not candidates:
+            ROOM_RESOLUTIONS.inc(result="not_found")
+            return None
+        best = candidates[0]
+        # Só o nome igual (sem acento, no singular) é exato; a pontuação aproximada
+        # também chega a 1.0 ("suite master luxo" cobre "suite master" inteiro)
+        if " ".join(_tokens(_fold(text or ""))) in self._exact:
+            ROOM_RESOLUTIONS.inc(result="exact")
+            return best
+        if best.score < ROOM_MATCH_MIN_SCORE:
+            ROOM_RESOLUTIONS.inc(result="not_found")
+            return None
+        if len(candidates) > 1 and best.score - candidates[1].score < ROOM_MATCH_MIN_MARGIN:
+            ROOM_RESOLUTIONS.inc(result="ambiguous")
+            logger.info("🤔 [QUARTOS] '%s' é ambíguo: %s (%.2f) ou %s (%.2f)",
+                        text, best.name, best.score, candidates[1].name, candidates[1].score)
+            return None
+        ROOM_RESOLUTIONS.inc(result="fuzzy")
+        return best
+
+
+def room_index_for(rooms: list[dict]) -> RoomIndex:
+    """Índice da lista de quartos, montado uma vez e reaproveitado enquanto os quartos forem os mesmos."""
+    signature = tuple((room.get("id"), room.get("name")) for room in rooms)
+    with _indexes_lock:
+        index = _indexes.get(signature)
+    if index is None:
+        index = RoomIndex(rooms)
+        with _indexes_lock:
+            _indexes[signature] = index
+    return index
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 # Carrega as variáveis de ambiente
 load_dotenv()
 
+# Servidor de desenvolvimento. Em produção use: gunicorn -c gunicorn.conf.py
+
 if __name__ == "__main__":
     # Configurações do servidor
     host = "0.0.0.0"  # Permite acesso externo
@@ -21,6 +23,6 @@ if __name__ == "__main__":
         "api:app",
         host=host,
         port=port,
-        reload=True,  # Recarrega automaticamente quando há mudanças
-        log_level="info"
+        reload=os.getenv("API_RELOAD", "true").lower() in ("1", "true", "yes"),  # Recarrega automaticamente quando há mudanças
+        log_level=os.getenv("LOG_LEVEL", "info").lower()
     ) 
\ No newline at end of file
@@ -0,0 +1,132 @@
+# tests/test_circuit_breaker.py
+
+import pytest
+import requests
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _ok():
+    return "ok"
+
+
+def _fail():
+    raise requests.exceptions.ConnectionError("gateway fora")
+
+
+def _http_error(status: int):
+    response = requests.Response()
+    response.status_code = status
+    raise requests.exceptions.HTTPError(response=response)
+
+
+def _breaker(**kwargs):
+    options = {"failure_rate": 0.5, "min_calls": 4, "window_seconds": 30, "open_seconds": 15}
+    options.update(kwargs)
+    return CircuitBreaker("teste", **options)
+
+
+def _open(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = _breaker()
+    for _ in range(breaker.min_calls - 1):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == CLOSED
+
+
+def test_stays_closed_below_failure_rate(clock):
+    breaker = _breaker()
+    for fn in (_ok, _ok, _ok, _fail):
+        try:
+            breaker.call(fn)
+        except requests.exceptions.ConnectionError:
+            pass
+    assert breaker.state == CLOSED
+
+
+def test_opens_and_rejects_without_calling(clock):
+    breaker = _breaker()
+    _open(breaker)
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+
+
+def test_client_errors_do_not_open(clock):
+    breaker = _breaker()
+    for _ in range(breaker.min_calls):
+        with pytest.raises(requests.exceptions.HTTPError):
+            breaker.call(_http_error, 404)
+    assert breaker.state == CLOSED
+    for _ in range(breaker.min_calls):
+        with pytest.raises(requests.exceptions.HTTPError):
+            breaker.call(_http_error, 503)
+    assert breaker.state == OPEN
+
+
+def test_old_failures_leave_the_window(clock):
+    breaker = _breaker()
+    for _ in range(breaker.min_calls - 1):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call(_fail)
+    clock[0] += breaker.window_seconds + 1
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == CLOSED
+
+
+def test_probe_success_closes(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += breaker.open_seconds
+    assert breaker.call(_ok) == "ok"
+    assert breaker.state == CLOSED
+    # A janela recomeça: uma falha isolada não reabre
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += breaker.open_seconds
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(_ok)
+
+
+def test_only_one_probe_while_half_open(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += breaker.open_seconds
+    seen = []
+
+    def probe():
+        # Enquanto o teste não termina, as demais chamadas são recusadas
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(_ok)
+        seen.append(True)
+        return "ok"
+
+    assert breaker.call(probe) == "ok"
+    assert seen == [True]
+    assert breaker.state == CLOSED
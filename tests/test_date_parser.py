@@ -0,0 +1,74 @@
+# tests/test_date_parser.py
+
+from datetime import date
+
+import pytest
+
+from date_parser import has_stay_intent, parse_date, parse_date_range
+
+# Domingo
+TODAY = date(2026, 10, 18)
+
+
+def _range(text: str):
+    parsed = parse_date_range(text, TODAY)
+    return parsed and (parsed["check_in"], parsed["check_out"], parsed["kind"])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("de 15 a 20/12", ("2026-12-15", "2026-12-20", "dates")),
+    ("15 a 20 de dezembro", ("2026-12-15", "2026-12-20", "dates")),
+    ("20 de dezembro a 3 de janeiro", ("2026-12-20", "2027-01-03", "dates")),
+    ("15/12 até 18/12", ("2026-12-15", "2026-12-18", "dates")),
+    ("28 a 2/1", ("2026-12-28", "2027-01-02", "dates")),
+    ("3 noites a partir de amanhã", ("2026-10-19", "2026-10-22", "dates")),
+    ("duas semanas a partir de 01/11", ("2026-11-01", "2026-11-15", "dates")),
+])
+def test_explicit_ranges(text, expected):
+    assert _range(text) == expected
+
+
+def test_weekday_range_rolls_end_past_start():
+    # Hoje é domingo: "domingo" é o depois da sexta, não hoje
+    assert _range("sexta a domingo") == ("2026-10-23", "2026-10-25", "dates")
+    assert _range("sábado a segunda") == ("2026-10-24", "2026-10-26", "dates")
+
+
+@pytest.mark.parametrize("text", [
+    "de 5 a 1 de janeiro",  # 27 noites atravessando o mês: provável erro
+    "de 1/11 a 15/12",      # acima de MAX_NIGHTS
+    "15/12",                # uma data só
+    "de 20 a 15/12",        # mesmo mês com dias trocados
+    "",
+])
+def test_rejected_ranges(text):
+    assert parse_date_range(text, TODAY) is None
+
+
+def test_weekend_and_holidays_are_deduced():
+    assert _range("próximo fim de semana") == ("2026-10-23", "2026-10-25", "weekend")
+    assert _range("no carnaval") == ("2027-02-06", "2027-02-10", "holiday")
+    assert _range("réveillon") == ("2026-12-30", "2027-01-02", "holiday")
+    assert _range("para o Natal") == ("2026-12-24", "2026-12-26", "holiday")
+
+
+def test_natal_city_is_not_a_holiday():
+    assert parse_date_range("Sou de Natal, quero reservar um quarto", TODAY) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("quero reservar para o carnaval", True),
+    ("tem vaga no fim de semana?", True),
+    ("3 noites", True),
+    ("o restaurante abre no fim de semana?", False),
+    ("vocês fazem festa de ano novo?", False),
+])
+def test_stay_intent(text, expected):
+    assert has_stay_intent(text) is expected
+
+
+def test_single_dates():
+    assert parse_date("amanhã", TODAY) == date(2026, 10, 19)
+    assert parse_date("próxima sexta", TODAY) == date(2026, 10, 23)
+    assert parse_date("dia 2026-11-03") == date(2026, 11, 3)
+    assert parse_date("sem data") is None
@@ -0,0 +1,97 @@
+# tests/test_hedging.py
+
+import itertools
+import threading
+
+import pytest
+
+import hedging
+from hedging import hedged_call
+
+_sites = itertools.count()
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """Ponto de chamada novo, com latência recente de 10 ms e hedging habilitado."""
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_MIN_DELAY_MS", 20)
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_MAX_RATIO", 1.0)
+    name = f"teste_{next(_sites)}"
+    hedging._stats_for(name).latencies.extend([0.01] * hedging._MIN_SAMPLES)
+    return name
+
+
+class SlowFirst:
+    """A primeira tentativa só termina quando liberada; as seguintes respondem na hora."""
+
+    def __init__(self, fail_first=False, fail_copy=False):
+        self.release = threading.Event()
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.fail_first = fail_first
+        self.fail_copy = fail_copy
+
+    def __call__(self, value):
+        with self.lock:
+            self.calls += 1
+            attempt = self.calls
+        if attempt == 1:
+            self.release.wait(5)
+            if self.fail_first:
+                raise RuntimeError("primeira falhou")
+            return f"primeira:{value}"
+        if self.fail_copy:
+            raise RuntimeError("cópia falhou")
+        return f"cópia:{value}"
+
+
+def test_disabled_calls_directly(monkeypatch):
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_ENABLED", False)
+    assert hedged_call("desligado", threading.current_thread) is threading.current_thread()
+
+
+def test_no_hedge_before_enough_samples(monkeypatch):
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_ENABLED", True)
+    fn = SlowFirst()
+    threading.Timer(0.1, fn.release.set).start()
+    assert hedged_call(f"sem_amostras_{next(_sites)}", fn, "x") == "primeira:x"
+    assert fn.calls == 1
+
+
+def test_slow_primary_is_hedged_and_copy_wins(site):
+    fn = SlowFirst()
+    try:
+        assert hedged_call(site, fn, "x") == "cópia:x"
+        assert fn.calls == 2
+    finally:
+        fn.release.set()
+
+
+def test_fast_primary_is_not_hedged(site):
+    fn = SlowFirst()
+    fn.release.set()
+    assert hedged_call(site, fn, "x") == "primeira:x"
+    assert fn.calls == 1
+
+
+def test_budget_exhausted_waits_for_primary(site, monkeypatch):
+    monkeypatch.setattr(hedging, "GEMINI_HEDGE_MAX_RATIO", 0.0)
+    fn = SlowFirst()
+    threading.Timer(0.1, fn.release.set).start()
+    assert hedged_call(site, fn, "x") == "primeira:x"
+    assert fn.calls == 1
+
+
+def test_failed_copy_falls_back_to_primary(site):
+    fn = SlowFirst(fail_copy=True)
+    threading.Timer(0.1, fn.release.set).start()
+    assert hedged_call(site, fn, "x") == "primeira:x"
+    assert fn.calls == 2
+
+
+def test_all_attempts_failing_raises_the_primary_error(site):
+    fn = SlowFirst(fail_first=True, fail_copy=True)
+    threading.Timer(0.1, fn.release.set).start()
+    with pytest.raises(RuntimeError, match="primeira falhou"):
+        hedged_call(site, fn, "x")
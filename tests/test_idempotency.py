@@ -0,0 +1,119 @@
+# tests/test_idempotency.py
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+import idempotency
+from idempotency import idempotency_key, run_once
+
+
+def test_message_id_wins():
+    assert idempotency_key("h1", "55", "oi", turn=3, message_id="wamid.1") == "msg:h1:wamid.1"
+    assert idempotency_key("h1", "55", "outra", turn=4, message_id="wamid.1") == "msg:h1:wamid.1"
+
+
+def test_retry_without_message_id_has_the_same_key():
+    first = idempotency_key("h1", "55", "sim", turn=3, message_timestamp="1760828400")
+    retry = idempotency_key("h1", "55", "sim", turn=3, message_timestamp="1760828400")
+    assert first == retry
+
+
+def test_repeated_reply_after_the_answer_is_a_new_turn():
+    assert idempotency_key("h1", "55", "sim", turn=3) != idempotency_key("h1", "55", "sim", turn=4)
+
+
+def test_identical_messages_in_a_burst_are_separate_deliveries():
+    # "ok", "ok" antes da resposta: mesmo turno, horários diferentes no WhatsApp
+    first = idempotency_key("h1", "55", "ok", turn=3, message_timestamp="1760828400")
+    second = idempotency_key("h1", "55", "ok", turn=3, message_timestamp="1760828401")
+    assert first != second
+
+
+def test_key_depends_on_hotel_and_lead():
+    base = idempotency_key("h1", "55", "oi", turn=0)
+    assert base != idempotency_key("h2", "55", "oi", turn=0)
+    assert base != idempotency_key("h1", "56", "oi", turn=0)
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(idempotency, "_redis", lambda: client)
+    monkeypatch.setattr(idempotency, "_POLL_INTERVAL", 0.01)
+    return client
+
+
+class Turn:
+    """Turno falso: conta as execuções e demora um pouco para os reenvios chegarem antes do fim."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.error:
+            raise self.error
+        return {"response_gemini": f"resposta {self.calls}"}
+
+
+def test_concurrent_resends_share_one_execution(redis_client):
+    turn = Turn()
+
+    async def main():
+        return await asyncio.gather(*(run_once("msg:h1:w1", turn) for _ in range(3)))
+
+    assert asyncio.run(main()) == [{"response_gemini": "resposta 1"}] * 3
+    assert turn.calls == 1
+
+
+def test_late_resend_reuses_the_stored_response(redis_client):
+    turn = Turn()
+    first = asyncio.run(run_once("msg:h1:w1", turn))
+    assert asyncio.run(run_once("msg:h1:w1", turn)) == first
+    assert turn.calls == 1
+    assert asyncio.run(run_once("msg:h1:w2", turn)) == {"response_gemini": "resposta 2"}
+
+
+def test_failure_is_shared_and_releases_the_key(redis_client):
+    turn = Turn(error=RuntimeError("falhou"))
+
+    async def main():
+        return await asyncio.gather(*(run_once("msg:h1:w1", turn) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert turn.calls == 1
+    assert redis_client.get("idem:msg:h1:w1") is None
+
+    turn.error = None
+    assert asyncio.run(run_once("msg:h1:w1", turn)) == {"response_gemini": "resposta 2"}
+
+
+def test_waits_for_the_worker_that_claimed_the_message(redis_client):
+    redis_client.set("idem:msg:h1:w1", json.dumps({"status": "pending"}))
+    turn = Turn()
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.05)
+        redis_client.set("idem:msg:h1:w1", json.dumps({"status": "done", "response": {"response_gemini": "outro"}}))
+
+    async def main():
+        result, _ = await asyncio.gather(run_once("msg:h1:w1", turn), other_worker_finishes())
+        return result
+
+    assert asyncio.run(main()) == {"response_gemini": "outro"}
+    assert turn.calls == 0
+
+
+def test_runs_without_redis(monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis fora")
+
+    monkeypatch.setattr(idempotency, "_redis", unavailable)
+    turn = Turn()
+    assert asyncio.run(run_once("msg:h1:w1", turn)) == {"response_gemini": "resposta 1"}
@@ -0,0 +1,18 @@
+# tests/test_import_budget.py
+"""
+A importação da API fica dentro do orçamento (IMPORT_BUDGET_MS, padrão 1500 ms)
+sem abrir conexões: roda num processo limpo, com Redis inacessível e sem chave
+do Google (ver benchmarks/import_budget.py).
+"""
+
+from benchmarks.import_budget import IMPORT_BUDGET_MS, measure_import, total_import_ms
+
+
+def test_api_import_within_budget():
+    rows = measure_import("api")
+    total_ms = total_import_ms(rows, "api")
+    slowest = sorted(rows, key=lambda r: r[1], reverse=True)[:5]
+    assert total_ms <= IMPORT_BUDGET_MS, (
+        f"Importação da API levou {total_ms:.1f} ms (orçamento: {IMPORT_BUDGET_MS:.0f} ms). Mais caros: "
+        + ", ".join(f"{name.strip()} {cumulative / 1000:.1f} ms" for _, cumulative, name in slowest)
+    )
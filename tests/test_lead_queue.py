@@ -0,0 +1,114 @@
+# tests/test_lead_queue.py
+
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import lead_queue
+from lead_queue import run_for_lead
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(lead_queue, "_redis", lambda: client)
+    return client
+
+
+class Turn:
+    """Turno falso (síncrono, no threadpool): registra a ordem e os turnos simultâneos."""
+
+    def __init__(self, seconds=0.03, error=None):
+        self.seconds = seconds
+        self.error = error
+        self.messages = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, message):
+        with self.lock:
+            self.messages.append(message)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        if self.error:
+            raise self.error
+        return {"response_gemini": f"resposta: {message}"}
+
+
+async def _send(lead, messages, turn, gap=0.005):
+    """Envia as mensagens com um pequeno intervalo, na ordem, sem esperar as respostas."""
+    tasks = []
+    for message in messages:
+        tasks.append(asyncio.create_task(run_for_lead(lead, message, turn)))
+        await asyncio.sleep(gap)
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_same_lead_runs_in_arrival_order_one_at_a_time(redis_client):
+    turn = Turn()
+    results = asyncio.run(_send("5511", ["oi", "quero reservar", "para 2 pessoas"], turn))
+    assert turn.messages == ["oi", "quero reservar", "para 2 pessoas"]
+    assert turn.max_running == 1
+    assert results[2] == {"response_gemini": "resposta: para 2 pessoas"}
+    # Fila e lease liberados ao final
+    assert lead_queue._leads == {}
+    assert redis_client.keys("lease:lead:*") == []
+
+
+def test_different_leads_run_in_parallel(redis_client):
+    turn = Turn(seconds=0.1)
+
+    async def main():
+        await asyncio.gather(run_for_lead("5511", "oi", turn), run_for_lead("5522", "olá", turn))
+
+    asyncio.run(main())
+    assert turn.max_running == 2
+
+
+def test_burst_is_merged_into_one_turn(redis_client, monkeypatch):
+    monkeypatch.setattr(lead_queue, "LEAD_BURST_WINDOW_MS", 50)
+    turn = Turn()
+    results = asyncio.run(_send("5511", ["oi", "tem vaga", "em dezembro?"], turn))
+    assert turn.messages == ["oi\ntem vaga\nem dezembro?"]
+    assert results == [
+        {"response_gemini": "", "merged": True},
+        {"response_gemini": "", "merged": True},
+        {"response_gemini": "resposta: oi\ntem vaga\nem dezembro?"},
+    ]
+
+
+def test_merged_turn_failure_reaches_every_message(redis_client, monkeypatch):
+    monkeypatch.setattr(lead_queue, "LEAD_BURST_WINDOW_MS", 50)
+    turn = Turn(error=RuntimeError("falhou"))
+    results = asyncio.run(_send("5511", ["oi", "tudo bem?"], turn))
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(turn.messages) == 1
+    assert lead_queue._leads == {}
+
+
+def test_lease_of_another_worker_is_awaited(redis_client, monkeypatch):
+    monkeypatch.setattr(lead_queue, "_POLL_INTERVAL", 0.01)
+    redis_client.set("lease:lead:5511", "outro-worker")
+    threading.Timer(0.1, redis_client.delete, args=["lease:lead:5511"]).start()
+    turn = Turn(seconds=0)
+    started = time.perf_counter()
+    asyncio.run(run_for_lead("5511", "oi", turn))
+    assert time.perf_counter() - started >= 0.1
+    assert turn.messages == ["oi"]
+
+
+def test_runs_without_redis_or_lead(monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis fora")
+
+    monkeypatch.setattr(lead_queue, "_redis", unavailable)
+    turn = Turn(seconds=0)
+    assert asyncio.run(run_for_lead("5511", "oi", turn)) == {"response_gemini": "resposta: oi"}
+    assert asyncio.run(run_for_lead("", "olá", turn)) == {"response_gemini": "resposta: olá"}
@@ -0,0 +1,90 @@
+# tests/test_lexical_index.py
+
+import fakeredis
+import pytest
+
+import lexical_index
+from lexical_index import Bm25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "O check-in começa às 14:00 e o check-out vai até 12h.",
+    "Aceitamos animais de pequeno porte com taxa de pet de R$ 50 por diária.",
+    "O estacionamento é gratuito para hóspedes, com vagas cobertas.",
+    "O café da manhã é servido das 7h às 10h no restaurante.",
+]
+
+
+def test_tokenize_normalizes_and_stems():
+    assert tokenize("Regras para ANIMAIS e refeições") == ["regra", "animal", "refeicao"]
+    # Horários são um termo só
+    assert tokenize("às 13:43 ou 22h") == ["13:43", "22h"]
+    assert tokenize("") == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("tem estacionamento?", 2),
+    ("qual a taxa de pet", 1),
+    ("Aceitam animal?", 1),
+    ("horário do café", 3),
+    ("check-in às 14:00", 0),
+])
+def test_search_ranks_the_chunk_with_the_term_first(query, expected):
+    assert Bm25Index(CHUNKS).search(query)[0] == CHUNKS[expected]
+
+
+def test_search_only_returns_chunks_with_some_term():
+    index = Bm25Index(CHUNKS)
+    assert index.search("piscina aquecida") == []
+    assert len(index.search("o check", limit=10)) == 1
+
+
+def test_rare_term_weighs_more_than_common_term():
+    chunks = ["quarto com varanda", "quarto com ar", "quarto com frigobar"]
+    assert Bm25Index(chunks).search("quarto varanda", limit=3)[0] == "quarto com varanda"
+
+
+def test_rrf_sums_positions_across_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    assert [chunk for chunk, _ in fused] == ["b", "a", "d", "c"]
+    scores = dict(fused)
+    k = lexical_index.RRF_K
+    assert scores["b"] == pytest.approx(1 / (k + 2) + 1 / (k + 1))
+    assert scores["d"] == pytest.approx(1 / (k + 2))
+
+
+def test_rrf_ties_keep_arrival_order_and_limit():
+    assert [c for c, _ in reciprocal_rank_fusion([["v1"], ["l1"]])] == ["v1", "l1"]
+    assert len(reciprocal_rank_fusion([["a", "b", "c"]], limit=2)) == 2
+    assert reciprocal_rank_fusion([]) == []
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(lexical_index, "_redis", lambda: client)
+    lexical_index._indexes.clear()
+    return client
+
+
+def test_store_replace_and_delete_document(redis_client):
+    lexical_index.store_document_index("h1", CHUNKS[:2], document_id="regras")
+    lexical_index.store_document_index("h1", CHUNKS[2:], document_id="servicos")
+    index = lexical_index.lexical_index_for("h1", lexical_index.index_version("h1"))
+    assert index.search("estacionamento") == [CHUNKS[2]]
+
+    # Reindexar o mesmo document_id substitui os chunks anteriores
+    lexical_index.store_document_index("h1", ["Estacionamento com manobrista."], document_id="servicos")
+    index = lexical_index.lexical_index_for("h1", lexical_index.index_version("h1"))
+    assert index.search("estacionamento") == ["Estacionamento com manobrista."]
+
+    assert lexical_index.delete_document_index("h1", "servicos") is True
+    assert lexical_index.delete_document_index("h1", "servicos") is False
+    index = lexical_index.lexical_index_for("h1", lexical_index.index_version("h1"))
+    assert index.search("estacionamento") == []
+    assert index.chunks == CHUNKS[:2]
+
+
+@pytest.mark.parametrize("document_id", [None, "", "_version"])
+def test_document_id_is_required(redis_client, document_id):
+    with pytest.raises(ValueError):
+        lexical_index.store_document_index("h1", CHUNKS, document_id=document_id)
@@ -0,0 +1,130 @@
+# tests/test_rate_limiter.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limiter import _ADDITIVE_INCREASE, _MIN_FACTOR, AdaptiveRateLimiter, RateLimitTimeout, is_rate_limit_error
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class Response:
+    def __init__(self, tokens):
+        self.usage_metadata = SimpleNamespace(total_token_count=tokens)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio parado: time.sleep só avança o tempo."""
+    now = [1000.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr("rate_limiter.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("rate_limiter.time.sleep", sleep)
+    return SimpleNamespace(now=now, slept=slept)
+
+
+def test_recognizes_rate_limit_errors():
+    assert is_rate_limit_error(ResourceExhausted())
+    assert is_rate_limit_error(RuntimeError("429 RESOURCE_EXHAUSTED: quota"))
+    assert not is_rate_limit_error(RuntimeError("500 internal error, retry after 429 ms"))
+
+
+def test_multiplicative_decrease_with_cooldown(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600)
+    limiter.on_rate_limited()
+    assert limiter.factor == 0.5
+    assert limiter.requests.rate == pytest.approx(5.0)
+    # 429 simultâneos contam como um
+    limiter.on_rate_limited()
+    assert limiter.factor == 0.5
+    clock.now[0] += 1.0
+    limiter.on_rate_limited()
+    assert limiter.factor == 0.25
+
+
+def test_decrease_stops_at_min_factor(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600)
+    for _ in range(20):
+        limiter.on_rate_limited()
+        clock.now[0] += 1.0
+    assert limiter.factor == _MIN_FACTOR
+
+
+def test_additive_increase_up_to_configured_rate(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600)
+    limiter.on_rate_limited()
+    limiter.on_success()
+    assert limiter.factor == pytest.approx(0.5 + _ADDITIVE_INCREASE)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.factor == 1.0
+    assert limiter.requests.rate == pytest.approx(10.0)
+
+
+def test_burst_then_queue_then_timeout(clock):
+    # 60/min = 1/s com rajada de 5
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=60)
+    for _ in range(5):
+        limiter.acquire(deadline=clock.now[0] + 10)
+    assert clock.slept == []
+    limiter.acquire(deadline=clock.now[0] + 10)
+    assert clock.slept == [pytest.approx(1.0)]
+    # Espera maior que o prazo: falha sem consumir a vez
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(deadline=clock.now[0] + 0.5)
+
+
+def test_call_retries_429_and_reduces_rate(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600, max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ResourceExhausted("429")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 2
+    assert limiter.factor == pytest.approx(0.5 + _ADDITIVE_INCREASE)
+
+
+def test_call_gives_up_after_max_retries(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600, max_retries=1)
+    attempts = []
+
+    def always_429():
+        attempts.append(1)
+        raise ResourceExhausted("429")
+
+    with pytest.raises(ResourceExhausted):
+        limiter.call(always_429)
+    assert len(attempts) == 2
+
+
+def test_other_errors_pass_through(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600)
+
+    def invalid():
+        raise ValueError("erro")
+
+    with pytest.raises(ValueError):
+        limiter.call(invalid)
+    assert limiter.factor == 1.0
+
+
+def test_token_estimate_follows_actual_usage(clock):
+    limiter = AdaptiveRateLimiter("teste", requests_per_minute=600, tokens_per_minute=60000,
+                                  initial_token_estimate=1000)
+    limiter.call(lambda: Response(2000))
+    assert limiter.token_estimate == pytest.approx(1200)
+    # Reserva de 1000 corrigida para os 2000 usados
+    assert limiter.tokens.tokens == pytest.approx(limiter.tokens.capacity - 2000)
@@ -0,0 +1,56 @@
+# tests/test_room_index.py
+
+import pytest
+
+from room_index import RoomIndex
+
+ROOMS = [
+    {"id": 1, "name": "Suíte Master"},
+    {"id": 2, "name": "Suíte Luxo"},
+    {"id": 3, "name": "Chalé Família"},
+    {"id": 4, "name": "Quarto Duplo"},
+    {"id": 5, "name": "Quarto Triplo"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return RoomIndex(ROOMS)
+
+
+@pytest.mark.parametrize("text", ["Suíte Master", "suite master", "SUITES MASTER"])
+def test_exact_name_ignores_accents_case_and_plural(index, text):
+    match = index.resolve(text)
+    assert match.room_id == 1
+    assert match.score == 1.0
+
+
+@pytest.mark.parametrize("text, room_id", [
+    ("quero a suite master", 1),
+    ("chale", 3),
+    ("quarto tripo", 5),
+    ("triplo", 5),
+])
+def test_fuzzy_name(index, text, room_id):
+    match = index.resolve(text)
+    assert match is not None and match.room_id == room_id
+    assert match.score < 1.0
+
+
+def test_two_close_rooms_are_ambiguous(index):
+    # Master pontua 1.0 e Luxo 0.95: nenhum dos dois é escolhido
+    scores = [m.score for m in index.matches("Suíte Master Luxo", limit=2)]
+    assert scores[0] - scores[1] < 0.1
+    assert index.resolve("Suíte Master Luxo") is None
+
+
+def test_other_word_in_place_of_name_does_not_resolve():
+    # "Triplo" no lugar de "Duplo" é outro quarto, mesmo sem um segundo candidato próximo
+    index = RoomIndex([{"id": 1, "name": "Quarto Duplo"}, {"id": 2, "name": "Suíte Master"}])
+    assert index.resolve("Quarto Triplo") is None
+    assert index.resolve("quero o duplo").room_id == 1
+
+
+def test_unknown_room(index):
+    assert index.resolve("cobertura presidencial") is None
+    assert index.resolve("") is None
@@ -0,0 +1,69 @@
+# tests/test_select_context.py
+
+import ExtractFromFile
+from ExtractFromFile import _merge_spans, select_context
+
+# Três chunks vizinhos como a fábrica corta: os 60 últimos caracteres de um abrem o seguinte
+TEXT = "".join(f"Parágrafo {i}: " + "regras da casa e horários do hotel " * 3 for i in range(3))
+A, B, C = TEXT[0:150], TEXT[90:240], TEXT[180:]
+
+
+def test_merge_joins_overlapping_neighbours():
+    assert _merge_spans([A], B) == [TEXT[0:240]]
+    # Vizinho que chega antes do trecho também é juntado, na posição do primeiro
+    assert _merge_spans([B], A) == [TEXT[0:240]]
+
+
+def test_merge_cascades_through_a_middle_chunk():
+    # A e C não se tocam; B liga os dois e os três viram um trecho só
+    spans = _merge_spans([A], C)
+    assert spans == [A, C]
+    assert _merge_spans(spans, B) == [TEXT]
+
+
+def test_merge_drops_contained_chunks():
+    assert _merge_spans([TEXT], B) == [TEXT]
+    assert _merge_spans([B], TEXT) == [TEXT]
+
+
+def test_merge_keeps_unrelated_chunks_apart():
+    assert _merge_spans(["Estacionamento gratuito."], "Café das 7h às 10h.") == [
+        "Estacionamento gratuito.", "Café das 7h às 10h."
+    ]
+
+
+def test_empty_candidates():
+    assert select_context([], {}) == []
+
+
+def test_mmr_skips_near_duplicates(monkeypatch):
+    monkeypatch.setattr(ExtractFromFile, "RAG_TOP_K", 2)
+    candidates = [("piscina aberta das 8h às 20h", 1.0), ("piscina aberta das 8h as 20h!", 0.95),
+                  ("estacionamento gratuito para hospedes", 0.9)]
+    embeddings = {"piscina aberta das 8h às 20h": [1.0, 0.0], "piscina aberta das 8h as 20h!": [0.99, 0.1],
+                  "estacionamento gratuito para hospedes": [0.0, 1.0]}
+    assert select_context(candidates, embeddings) == [
+        "piscina aberta das 8h às 20h", "estacionamento gratuito para hospedes"
+    ]
+
+
+def test_falls_back_to_term_overlap_without_embeddings(monkeypatch):
+    monkeypatch.setattr(ExtractFromFile, "RAG_TOP_K", 2)
+    candidates = [("piscina aberta das 8h às 20h", 1.0), ("a piscina aberta das 8h às 20h", 0.95),
+                  ("estacionamento gratuito", 0.9)]
+    assert select_context(candidates, {}) == ["piscina aberta das 8h às 20h", "estacionamento gratuito"]
+
+
+def test_token_budget_keeps_the_first_and_skips_what_does_not_fit(monkeypatch):
+    monkeypatch.setattr(ExtractFromFile, "RAG_CONTEXT_TOKEN_BUDGET", 30)
+    long_chunk = "x" * 400
+    candidates = [(long_chunk, 1.0), ("y" * 200, 0.9), ("curto", 0.8)]
+    assert select_context(candidates, {}) == [long_chunk]
+
+    monkeypatch.setattr(ExtractFromFile, "RAG_CONTEXT_TOKEN_BUDGET", 110)
+    assert select_context(candidates, {}) == [long_chunk, "curto"]
+
+
+def test_selected_neighbours_are_joined():
+    candidates = [(A, 1.0), (B, 0.9), ("Estacionamento gratuito.", 0.1)]
+    assert select_context(candidates, {}) == [TEXT[0:240], "Estacionamento gratuito."]
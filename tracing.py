@@ -0,0 +1,173 @@
+# tracing.py
+
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app_logging import get_logger
+
+# ==============================================================================
+#  RASTREAMENTO (TRACING) DE REQUISIÇÕES
+#  Spans leves compatíveis com o modelo do OpenTelemetry: IDs no formato W3C
+#  (trace_id de 32 hex, span_id de 16 hex), propagados ao Gateway Node.js pelo
+#  header 'traceparent'. Configuração pelo ambiente:
+#    TRACE_EXPORTER=none | console | file
+#    TRACE_FILE=traces.jsonl          (usado pelo exportador 'file')
+#    TRACE_SAMPLE_RATE=1.0            (fração das requisições rastreadas)
+# ==============================================================================
+
+logger = get_logger("tracing")
+
+_current_span: ContextVar["Span"] = ContextVar("current_span", default=None)
+
+_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+_ENABLED = _EXPORTER in ("console", "file")
+
+
+def _sample_rate() -> float:
+    try:
+        return float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    except ValueError:
+        return 1.0
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes", "start", "end", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, sampled: bool = True, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes or {}
+        self.start = time.time_ns()
+        self.end = None
+        self.status = "OK"
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start,
+            "end_time_unix_nano": self.end,
+            "duration_ms": round((self.end - self.start) / 1e6, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# --- Exportação em segundo plano (não bloqueia a requisição) ---
+
+_export_queue = queue.SimpleQueue()
+_writer_started = False
+_writer_lock = threading.Lock()
+
+
+def _writer_loop():
+    trace_file = os.getenv("TRACE_FILE", "traces.jsonl")
+    while True:
+        span_dict = _export_queue.get()
+        line = json.dumps(span_dict, ensure_ascii=False, default=str)
+        if _EXPORTER == "file":
+            with open(trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            logger.info("🧵 [TRACE] %s", line)
+
+
+def _export(span: Span):
+    global _writer_started
+    if not _writer_started:
+        with _writer_lock:
+            if not _writer_started:
+                threading.Thread(target=_writer_loop, name="trace-exporter", daemon=True).start()
+                _writer_started = True
+    _export_queue.put(span.to_dict())
+
+
+# --- API pública ---
+
+def parse_traceparent(header: str):
+    """Extrai (trace_id, parent_span_id, sampled) de um header W3C 'traceparent'."""
+    try:
+        version, trace_id, span_id, flags = header.strip().split("-")
+        if len(trace_id) == 32 and len(span_id) == 16:
+            return trace_id, span_id, int(flags, 16) & 1 == 1
+    except (AttributeError, ValueError):
+        pass
+    return None
+
+
+@contextmanager
+def span(name: str, traceparent: str = None, **attributes):
+    """
+    Abre um span filho do span atual (ou a raiz de um novo trace). Exceções são
+    registradas no span e repassadas. Com o rastreamento desligado, não faz nada.
+    """
+    if not _ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        current = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    else:
+        incoming = parse_traceparent(traceparent) if traceparent else None
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = "%032x" % random.getrandbits(128), None, random.random() < _sample_rate()
+        current = Span(name, trace_id, parent_id, sampled, attributes)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = "ERROR"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end = time.time_ns()
+        if current.sampled:
+            _export(current)
+
+
+def traced(name: str = None):
+    """Decorator que envolve a função em um span (nome padrão: nome da função)."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject_trace_headers(headers: dict) -> dict:
+    """Adiciona o header 'traceparent' do span atual às chamadas para o Gateway."""
+    current = _current_span.get()
+    if current is not None:
+        headers["traceparent"] = f"00-{current.trace_id}-{current.span_id}-{'01' if current.sampled else '00'}"
+    return headers
+
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace_id if current is not None else None